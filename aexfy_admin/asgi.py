@@ -3,7 +3,14 @@
 from django.core.asgi import get_asgi_application
 
 # Configuracion ASGI para despliegue async; usa settings.py y es llamada por servidores ASGI.
+# Es el punto de entrada en produccion (render.yaml con workers de uvicorn) para que el SSE de
+# aexfy_admin/realtime.py no ocupe un worker por pestana abierta.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aexfy_admin.settings")
 
 # Crea la aplicacion ASGI que comparte configuracion con manage.py.
 application = get_asgi_application()
+
+# Precarga segmentos, regiones y roles para que los formularios no paguen RPC en la primera visita.
+from aexfy_admin.catalogos import precargar_catalogos
+
+precargar_catalogos()
@@ -0,0 +1,139 @@
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from empresas.services import listar_regiones_admin, listar_segmentos_admin
+from integraciones.eventos import asegurar_observador, suscribir
+from integraciones.lotes import LoteRPC
+
+# Logger para fallas al precargar catalogos.
+logger = logging.getLogger(__name__)
+
+# Prefijo de llaves en la cache de Django (LocMem por defecto, una por worker).
+PREFIJO_CACHE = "catalogo:"
+# Catalogos servidos por RPC; reciben lote=None como el resto de services.py.
+CARGADORES_RPC = {
+    "segmentos": listar_segmentos_admin,
+    "regiones": listar_regiones_admin,
+}
+# Tablas de public.realtime_events que invalidan cada catalogo (triggers en DB_Aexfy.db).
+TABLAS_INVALIDAN = {
+    "segmentos_industriales": "segmentos",
+    "regiones_chile": "regiones",
+}
+ROL_OWNER = ("AexfyOwner", "AexfyOwner")
+
+
+def _clave(nombre: str) -> str:
+    return f"{PREFIJO_CACHE}{nombre}"
+
+
+# TTL largo; los catalogos casi no cambian y los eventos realtime los invalidan antes.
+def _ttl() -> int:
+    return int(getattr(settings, "CATALOGOS_TTL_SEGUNDOS", 3600))
+
+
+# Lee roles.txt (lineas con ':' que representan roles) como tuplas (rol, rol) para choices.
+def _leer_roles() -> list[tuple[str, str]]:
+    ruta = Path("roles.txt")
+    if not ruta.exists():
+        return []
+
+    roles = []
+    for linea in ruta.read_text(encoding="utf-8").splitlines():
+        linea = linea.strip()
+        if not linea or linea.startswith("#"):
+            continue
+        if ":" in linea:
+            rol = linea.split(":", 1)[0].strip()
+            # Excluye encabezados que no son roles reales.
+            if rol.lower() in {"credenciales", "crea a", "contraseña", "aexfyowner"}:
+                continue
+            if rol:
+                roles.append((rol, rol))
+
+    # Elimina duplicados manteniendo orden.
+    vistos = set()
+    roles_unicos = []
+    for rol in roles:
+        if rol[0] not in vistos:
+            roles_unicos.append(rol)
+            vistos.add(rol[0])
+    return roles_unicos
+
+
+# Devuelve los catalogos pedidos; los que no estan en cache se piden juntos en un solo LoteRPC.
+def obtener_catalogos(*nombres: str) -> dict:
+    asegurar_observador()
+    en_cache = cache.get_many([_clave(nombre) for nombre in nombres])
+    catalogos = {nombre: en_cache.get(_clave(nombre)) for nombre in nombres}
+    faltantes = [nombre for nombre in nombres if catalogos[nombre] is None]
+    if not faltantes:
+        return catalogos
+
+    lote = LoteRPC()
+    diferidos = {
+        nombre: CARGADORES_RPC[nombre](lote=lote)
+        for nombre in faltantes
+        if nombre in CARGADORES_RPC
+    }
+    lote.ejecutar()
+    for nombre in faltantes:
+        if nombre in diferidos:
+            catalogos[nombre] = diferidos[nombre].valor() or []
+        else:
+            catalogos[nombre] = _leer_roles()
+    cache.set_many({_clave(nombre): catalogos[nombre] for nombre in faltantes}, _ttl())
+    return catalogos
+
+
+# Segmentos industriales para los selects de empresas.
+def obtener_segmentos() -> list[dict]:
+    return obtener_catalogos("segmentos")["segmentos"]
+
+
+# Regiones de Chile (con su zona) para los selects de empresas.
+def obtener_regiones() -> list[dict]:
+    return obtener_catalogos("regiones")["regiones"]
+
+
+# Roles de roles.txt para choices; AexfyOwner solo se agrega si se pide explicitamente.
+def obtener_roles_disponibles(include_owner: bool = False):
+    roles = obtener_catalogos("roles")["roles"]
+    # Evita lista vacia si el archivo no existe o tiene otro formato.
+    if not roles:
+        return [ROL_OWNER]
+    if include_owner and ROL_OWNER not in roles:
+        return [ROL_OWNER] + roles
+    return roles
+
+
+# Elimina catalogos cacheados; sin nombres elimina todos.
+def invalidar_catalogos(*nombres: str) -> None:
+    nombres = nombres or (*CARGADORES_RPC, "roles")
+    cache.delete_many([_clave(nombre) for nombre in nombres])
+
+
+# Carga los catalogos al iniciar el proceso (asgi.py/wsgi.py) en un hilo aparte.
+# Un error no detiene el arranque; la primera pagina que los use volvera a intentarlo.
+def precargar_catalogos() -> None:
+    def _precargar():
+        try:
+            obtener_catalogos(*CARGADORES_RPC, "roles")
+        except Exception as exc:
+            logger.warning("No se pudieron precargar los catalogos: %s", exc)
+
+    threading.Thread(target=_precargar, name="aexfy-catalogos", daemon=True).start()
+
+
+# Invalida el catalogo cuando public.realtime_events informa cambios en su tabla.
+def _al_recibir_evento(evento: dict) -> None:
+    nombre = TABLAS_INVALIDAN.get(evento.get("tabla"))
+    if nombre:
+        invalidar_catalogos(nombre)
+
+
+suscribir(_al_recibir_evento)
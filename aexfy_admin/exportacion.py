@@ -0,0 +1,56 @@
+import csv
+import logging
+
+from django.http import StreamingHttpResponse
+
+# Logger para fallas a mitad de una exportacion (la respuesta ya fue enviada parcialmente y se aborta).
+logger = logging.getLogger(__name__)
+
+# Filas pedidas por RPC en cada vuelta del cursor; acota la memoria de la exportacion.
+FILAS_POR_LOTE = 500
+# Lineas CSV acumuladas antes de entregar un trozo al servidor.
+LINEAS_POR_TROZO = 200
+
+
+# Buffer minimo para csv.writer; devuelve la linea en lugar de guardarla.
+class _Eco:
+    def write(self, valor):
+        return valor
+
+
+# Recorre un listar_*_admin por cursor (fecha, id) sin offset ni limite total de filas.
+# campo_fecha es la columna de orden de la RPC (creado_en, created_at o registrado_en).
+def recorrer_por_cursor(listar, filtros: dict, campo_fecha: str, por_lote: int = FILAS_POR_LOTE):
+    cursor = {}
+    while True:
+        filas = listar({**filtros, **cursor, "limit": por_lote, "offset": 0}) or []
+        yield from filas
+        if len(filas) < por_lote:
+            return
+        ultima = filas[-1]
+        cursor = {"cursor_creado_en": ultima.get(campo_fecha), "cursor_id": ultima.get("id")}
+
+
+# Respuesta CSV en streaming (BOM + ';' para Excel); la memoria no crece con la cantidad de filas.
+# fila_a_valores convierte cada registro en la lista de columnas del CSV.
+def respuesta_csv(nombre_archivo: str, encabezados: list[str], filas, fila_a_valores) -> StreamingHttpResponse:
+    def generar():
+        escritor = csv.writer(_Eco(), delimiter=";")
+        trozo = ["\ufeff", escritor.writerow(encabezados)]
+        try:
+            for fila in filas:
+                trozo.append(escritor.writerow(fila_a_valores(fila)))
+                if len(trozo) >= LINEAS_POR_TROZO:
+                    yield "".join(trozo)
+                    trozo = []
+        except Exception as exc:
+            # Las cabeceras ya salieron: se relanza para abortar la respuesta chunked y que el
+            # navegador marque la descarga como fallida en vez de guardar un CSV truncado.
+            logger.warning("Error al exportar %s: %s", nombre_archivo, exc)
+            raise
+        if trozo:
+            yield "".join(trozo)
+
+    respuesta = StreamingHttpResponse(generar(), content_type="text/csv; charset=utf-8")
+    respuesta["Content-Disposition"] = f"attachment; filename={nombre_archivo}"
+    return respuesta
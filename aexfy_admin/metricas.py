@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+from django.views.decorators.cache import never_cache
+
+from cuentas.decorators import sesion_requerida
+from integraciones.instrumentacion import (
+    histogramas_llamadas,
+    iniciar_medicion,
+    registrar_segmento,
+    terminar_medicion,
+)
+
+# Logger de tiempos por request; una linea JSON por request (warning si supera el umbral).
+logger = logging.getLogger(__name__)
+
+
+# Agrega Server-Timing a las respuestas; expone nombres de RPC, por defecto solo con DEBUG.
+def _server_timing_activo() -> bool:
+    return bool(getattr(settings, "METRICAS_SERVER_TIMING", settings.DEBUG))
+
+
+# Requests mas lentos que este umbral (ms) se registran como warning.
+def _umbral_lento_ms() -> float:
+    return float(getattr(settings, "METRICAS_REQUEST_LENTO_MS", 1000))
+
+
+# Agrupa las mediciones por nombre: cantidad, duracion sumada, bytes y errores.
+def _agrupar(mediciones: list[dict]) -> dict:
+    grupos = {}
+    for medicion in mediciones:
+        grupo = grupos.setdefault(
+            medicion["nombre"],
+            {"cantidad": 0, "ms": 0.0, "bytes_enviados": 0, "bytes_recibidos": 0, "errores": []},
+        )
+        grupo["cantidad"] += 1
+        grupo["ms"] += medicion["ms"]
+        grupo["bytes_enviados"] += medicion.get("bytes_enviados", 0)
+        grupo["bytes_recibidos"] += medicion.get("bytes_recibidos", 0)
+        if medicion.get("error"):
+            grupo["errores"].append(medicion["error"])
+    return grupos
+
+
+# Valor del header Server-Timing (rpc.listar_usuarios_admin;dur=12.3, plantilla;dur=4.1, total;dur=30).
+def _server_timing(grupos: dict, total_ms: float) -> str:
+    partes = []
+    for nombre, grupo in grupos.items():
+        parte = f"{nombre};dur={grupo['ms']:.1f}"
+        if grupo["cantidad"] > 1:
+            parte += f';desc="x{grupo["cantidad"]}"'
+        partes.append(parte)
+    partes.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(partes)
+
+
+# Cierra la medicion del request: header Server-Timing y linea de log estructurada.
+def _completar(request, response, mediciones: list[dict], inicio: float):
+    total_ms = (time.perf_counter() - inicio) * 1000
+    grupos = _agrupar(mediciones)
+    if _server_timing_activo():
+        response["Server-Timing"] = _server_timing(grupos, total_ms)
+
+    nivel = logging.WARNING if total_ms > _umbral_lento_ms() else logging.INFO
+    if logger.isEnabledFor(nivel):
+        logger.log(
+            nivel,
+            json.dumps(
+                {
+                    "metodo": request.method,
+                    "ruta": request.path,
+                    "estado": response.status_code,
+                    "total_ms": round(total_ms, 1),
+                    "llamadas": sum(1 for m in mediciones if m["tipo"] == "llamada"),
+                    "detalle": {
+                        nombre: {**grupo, "ms": round(grupo["ms"], 1)}
+                        for nombre, grupo in grupos.items()
+                    },
+                }
+            ),
+        )
+    return response
+
+
+# Middleware de tiempos por request; sincrono o async segun la cadena para no forzar hilos en ASGI.
+# Las llamadas las registra el transporte de integraciones/instrumentacion.py; en respuestas en
+# streaming (SSE, CSV) solo se mide hasta entregar las cabeceras.
+def metricas_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token = iniciar_medicion()
+            inicio = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                mediciones = terminar_medicion(token)
+            return _completar(request, response, mediciones, inicio)
+
+        markcoroutinefunction(middleware)
+        return middleware
+
+    def middleware(request):
+        token = iniciar_medicion()
+        inicio = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            mediciones = terminar_medicion(token)
+        return _completar(request, response, mediciones, inicio)
+
+    return middleware
+
+
+metricas_middleware.sync_capable = True
+metricas_middleware.async_capable = True
+
+
+# Plantilla que registra su tiempo de render como tramo "plantilla" del request.
+class _PlantillaMedida(Template):
+    def render(self, context=None, request=None):
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            registrar_segmento("plantilla", time.perf_counter() - inicio)
+
+
+# Backend de plantillas de Django con medicion de render (TEMPLATES en settings.py).
+class PlantillasMedidas(DjangoTemplates):
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name).template, self)
+
+
+# Histogramas de latencia por RPC del worker actual; deshabilitado salvo METRICAS_ENDPOINT.
+@sesion_requerida
+@never_cache
+def metricas_view(request):
+    if not getattr(settings, "METRICAS_ENDPOINT", False):
+        raise Http404("Metricas deshabilitadas.")
+    return JsonResponse({"pid": os.getpid(), "llamadas": histogramas_llamadas()})
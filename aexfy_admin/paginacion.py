@@ -0,0 +1,122 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+
+# Filas por pagina de los listados con cursor (usuarios y empresas).
+POR_PAGINA = 25
+
+
+# Pide a las RPC listar_*_admin el total en la misma llamada; exacto hasta el umbral de settings.py,
+# estimado por el planificador sobre el (ver aexfy.estimar_filas en DB_Aexfy.db).
+def filtros_conteo() -> dict:
+    return {
+        "contar": True,
+        "umbral_exacto": int(getattr(settings, "LISTADOS_CONTEO_EXACTO_MAX", 10000)),
+    }
+
+
+# Formatea el total con separador de miles; los estimados llevan prefijo ~.
+def _formatear_total(total, exacto) -> str:
+    if total is None:
+        return ""
+    texto = f"{int(total):,}".replace(",", ".")
+    return texto if exacto else f"~{texto}"
+
+
+# Resumen "desde-hasta de total" del listado a partir de total_filas/total_exacto de la primera fila.
+# Sin filas no hay total; la tabla ya muestra su mensaje de listado vacio.
+def resumen_total(filas: list[dict], desde: int = 1) -> dict:
+    filas = filas or []
+    primera = filas[0] if filas else {}
+    total = primera.get("total_filas")
+    exacto = bool(primera.get("total_exacto"))
+    return {
+        "desde": desde if filas else 0,
+        "hasta": desde + len(filas) - 1 if filas else 0,
+        "total": total,
+        "total_exacto": exacto,
+        "total_texto": _formatear_total(total, exacto),
+    }
+
+
+# Codifica la posicion (fecha, id) de una fila como token opaco para el querystring.
+# antes=True pide la pagina previa a esa fila (boton Anterior); campo_fecha es la columna de orden.
+def codificar_cursor(fila: dict, antes: bool = False, campo_fecha: str = "creado_en") -> str | None:
+    if not fila or not fila.get(campo_fecha) or not fila.get("id"):
+        return None
+    datos = {"c": str(fila[campo_fecha]), "i": str(fila["id"])}
+    if antes:
+        datos["a"] = 1
+    crudo = json.dumps(datos, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+# Decodifica un token de codificar_cursor; None si esta vacio o fue alterado.
+def decodificar_cursor(token: str | None) -> dict | None:
+    if not token:
+        return None
+    try:
+        crudo = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        datos = json.loads(crudo)
+        creado_en = datetime.fromisoformat(str(datos["c"]).replace("Z", "+00:00"))
+        registro_id = uuid.UUID(str(datos["i"]))
+    except (ValueError, TypeError, KeyError):
+        return None
+    return {
+        "cursor_creado_en": creado_en.isoformat(),
+        "cursor_id": str(registro_id),
+        "antes": bool(datos.get("a")),
+    }
+
+
+# Lee page y cursor del GET y devuelve (page, filtros); los filtros van al services.py del listado.
+# Se pide una fila extra para saber si existe otra pagina; el total llega en total_filas.
+def filtros_pagina(request, por_pagina: int = POR_PAGINA) -> tuple[int, dict]:
+    try:
+        page = int(request.GET.get("page", 1) or 1)
+    except ValueError:
+        page = 1
+    page = max(page, 1)
+    filtros = {"limit": por_pagina + 1, "offset": 0, **filtros_conteo()}
+    cursor = decodificar_cursor(request.GET.get("cursor"))
+    if cursor and page > 1:
+        filtros.update(cursor)
+    elif page > 1:
+        # Sin cursor valido se vuelve al inicio en lugar de recorrer con offset.
+        page = 1
+    return page, filtros
+
+
+# Recorta la fila extra y arma los tokens de navegacion a partir de las filas crudas de la RPC.
+# Devuelve (filas, contexto) con page, has_next, cursor_siguiente, cursor_anterior y el resumen del total.
+def resolver_pagina(
+    filas: list[dict],
+    page: int,
+    filtros: dict,
+    por_pagina: int = POR_PAGINA,
+    campo_fecha: str = "creado_en",
+):
+    filas = list(filas or [])
+    if filtros.get("antes"):
+        hay_previa = len(filas) > por_pagina
+        filas = filas[-por_pagina:]
+        has_next = True
+        if not hay_previa:
+            page = 1
+    else:
+        has_next = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+    contexto = {
+        "page": page,
+        "has_next": has_next and bool(filas),
+        "cursor_siguiente": codificar_cursor(filas[-1], campo_fecha=campo_fecha) if filas else None,
+        # La pagina 1 se pide sin cursor para incluir filas creadas despues.
+        "cursor_anterior": (
+            codificar_cursor(filas[0], antes=True, campo_fecha=campo_fecha) if filas and page > 2 else None
+        ),
+        **resumen_total(filas, (page - 1) * por_pagina + 1),
+    }
+    return filas, contexto
@@ -1,64 +1,277 @@
+import asyncio
 import json
+import queue
+import threading
 import time
+from collections import deque
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.http import StreamingHttpResponse
 
-from integraciones.supabase_client import get_supabase_service_client
+from integraciones.eventos import asegurar_observador, estado_observador, suscribir
 
+# Cada cuanto se envia un comentario para mantener viva la conexion en proxies.
+PING_SEGUNDOS = 15
+# Cada cuanto se confirma que la sesion sigue existiendo (logout en otra pestana o sesion unica).
+VERIFICAR_SESION_SEGUNDOS = 15
+# Eventos pendientes por conexion; si un cliente lento la llena se descartan los mas antiguos.
+MAX_COLA = 100
+# Eventos recientes del proceso; permiten reenviar lo perdido cuando el navegador reconecta con since.
+MAX_RECIENTES = 1000
 
-def _obtener_ultimo_evento_id(cliente):
-    try:
-        respuesta = (
-            cliente.schema("public")
-            .table("realtime_events")
-            .select("id")
-            .order("id", desc=True)
-            .limit(1)
-            .execute()
-        )
-        if respuesta.data:
-            return int(respuesta.data[0].get("id", 0))
-    except Exception:
-        return None
-    return None
+# Conexiones SSE abiertas en este proceso; las alimenta el observador de integraciones/eventos.py,
+# que hace una sola lectura de public.realtime_events por intervalo sin importar cuantas haya.
+_conexiones = set()
+_conexiones_lock = threading.Lock()
+_recientes = deque(maxlen=MAX_RECIENTES)
 
 
-def realtime_stream_view(request):
-    if not request.session.get("supabase_access_token"):
-        return StreamingHttpResponse(status=401)
+# Cola de una conexion SSE; asyncio.Queue bajo ASGI y queue.Queue en el respaldo WSGI.
+class _Conexion:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=MAX_COLA) if loop else queue.Queue(maxsize=MAX_COLA)
+
+    # Se llama desde el hilo observador; en ASGI el encolado se agenda en el loop de la conexion.
+    def entregar(self, evento: dict) -> None:
+        if self.loop is None:
+            self._encolar(evento)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._encolar, evento)
+        except RuntimeError:
+            # El loop ya se cerro; la conexion se desregistra al terminar su stream.
+            pass
+
+    # Encola sin bloquear; con la cola llena se descarta el evento mas antiguo.
+    def _encolar(self, evento: dict) -> None:
+        while True:
+            try:
+                self.cola.put_nowait(evento)
+                return
+            except (asyncio.QueueFull, queue.Full):
+                try:
+                    self.cola.get_nowait()
+                except (asyncio.QueueEmpty, queue.Empty):
+                    pass
+
+    # Vacia la cola sin esperar; se usa para agrupar rafagas de eventos en un solo mensaje.
+    def pendientes(self) -> list[dict]:
+        eventos = []
+        while True:
+            try:
+                eventos.append(self.cola.get_nowait())
+            except (asyncio.QueueEmpty, queue.Empty):
+                return eventos
+
+
+# Registra la conexion y garantiza que el observador del proceso este corriendo.
+def _registrar(conexion: _Conexion) -> None:
+    asegurar_observador()
+    with _conexiones_lock:
+        _conexiones.add(conexion)
+
+
+# Quita la conexion al cerrarse el stream (desconexion del navegador o logout).
+def _desregistrar(conexion: _Conexion) -> None:
+    with _conexiones_lock:
+        _conexiones.discard(conexion)
+
+
+# Suscriptor del observador; reparte cada evento a todas las conexiones del proceso.
+def _difundir(evento: dict) -> None:
+    evento = _tipar(evento)
+    with _conexiones_lock:
+        _recientes.append(evento)
+        conexiones = list(_conexiones)
+    for conexion in conexiones:
+        conexion.entregar(evento)
 
-    cliente = get_supabase_service_client()
-    since_param = request.GET.get("since", "")
+
+# Cantidad de conexiones SSE abiertas en el proceso (ver aexfy_admin/salud.py).
+def conexiones_abiertas() -> int:
+    return len(_conexiones)
+
+
+# Duracion maxima de un stream servido por WSGI; el navegador reconecta con since.
+def _duracion_maxima_wsgi() -> float:
+    return float(getattr(settings, "REALTIME_WSGI_MAX_SEGUNDOS", 60))
+
+
+# La sesion sigue vigente si su registro existe y conserva el token (logout la elimina).
+def _sesion_vigente(request, session_key) -> bool:
+    if not session_key:
+        return False
+    # Se lee una copia nueva; request.session queda cacheada desde el inicio del stream.
+    sesion = request.session.__class__(session_key)
+    return bool(sesion.get("supabase_access_token"))
+
+
+# Lee el ultimo id que ya vio el navegador (localStorage en realtime_sse.js).
+def _parsear_since(request):
     try:
-        last_id = int(since_param)
+        return int(request.GET.get("since", ""))
     except (TypeError, ValueError):
-        last_id = None
+        return None
 
-    def stream():
-        nonlocal last_id
-        ping_at = time.monotonic()
-        yield "retry: 3000\n\n"
 
-        while True:
-            if not request.session.get("supabase_access_token"):
-                yield "event: logout\ndata: {}\n\n"
-                break
+# Payload publico de un evento de public.realtime_events.
+def _tipar(evento: dict) -> dict:
+    entidad_id = evento.get("entidad_id")
+    return {
+        "id": int(evento.get("id") or 0),
+        "tabla": evento.get("tabla") or "",
+        "accion": evento.get("accion") or "",
+        "entidad_id": str(entidad_id) if entidad_id else None,
+    }
 
-            ultimo_id = _obtener_ultimo_evento_id(cliente)
-            if ultimo_id is not None:
-                if last_id is None or ultimo_id > last_id:
-                    last_id = ultimo_id
-                    payload = json.dumps({"id": last_id})
-                    yield f"data: {payload}\n\n"
 
-            ahora = time.monotonic()
-            if ahora - ping_at > 15:
-                ping_at = ahora
-                yield ": ping\n\n"
+# Tablas a las que se suscribe la pagina (?tablas=clientes,usuarios); None recibe todas.
+def _parsear_tablas(request):
+    if "tablas" not in request.GET:
+        return None
+    return {tabla.strip() for tabla in request.GET.get("tablas", "").split(",") if tabla.strip()}
+
 
-            time.sleep(2)
+# Eventos recientes con id mayor a since; None si el historial en memoria no alcanza a cubrirlos.
+def _eventos_desde(since: int):
+    with _conexiones_lock:
+        recientes = list(_recientes)
+    if not recientes or recientes[0]["id"] > since + 1:
+        return None
+    return [evento for evento in recientes if evento["id"] > since]
+
+
+# Mensaje SSE; sin nombre de evento es un cambio en una tabla, con nombre es control (cursor, resync).
+def _mensaje(payload: dict, evento: str | None = None) -> str:
+    cabecera = f"event: {evento}\n" if evento else ""
+    return f"{cabecera}data: {json.dumps(payload)}\n\n"
+
+
+# Posicion de una conexion en public.realtime_events y filtro de tablas de la pagina.
+# Traduce eventos del observador a mensajes SSE; lo comparten el stream ASGI y el WSGI.
+class _Cursor:
+    def __init__(self, last_id, tablas):
+        self.last_id = last_id
+        self.tablas = tablas
+        # Ids reenviados al conectar; tambien pueden llegar por la cola y no se repiten.
+        self.reenviados = set()
+
+    def _aplica(self, evento: dict) -> bool:
+        return self.tablas is None or evento["tabla"] in self.tablas
+
+    # Mensajes iniciales: fija el cursor o reenvia lo ocurrido desde since.
+    # Si el historial no cubre el hueco se envia resync y la pagina recarga completa.
+    def inicio(self) -> list[str]:
+        observado = estado_observador()["ultimo_id"]
+        if observado is None:
+            return []
+        observado = int(observado)
+        if self.last_id is None:
+            self.last_id = observado
+            return [_mensaje({"id": observado}, "cursor")]
+        if observado <= self.last_id:
+            return []
+        perdidos = _eventos_desde(self.last_id)
+        if perdidos is None:
+            self.last_id = observado
+            return [_mensaje({"id": observado}, "resync")]
+        self.reenviados = {evento["id"] for evento in perdidos}
+        self.last_id = max([observado, *self.reenviados])
+        return [_mensaje(evento) for evento in perdidos if self._aplica(evento)]
 
-    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    # Mensajes para una rafaga de eventos; los ya reenviados por inicio() se omiten.
+    def eventos(self, eventos: list[dict]) -> list[str]:
+        mensajes = []
+        for evento in eventos:
+            if evento["id"] in self.reenviados:
+                continue
+            if self.last_id is None or evento["id"] > self.last_id:
+                self.last_id = evento["id"]
+            if self._aplica(evento):
+                mensajes.append(_mensaje(evento))
+        return mensajes
+
+    # Sin eventos de la pagina: ping y cursor actualizado para que since no quede atrasado.
+    def inactividad(self) -> list[str]:
+        mensajes = [": ping\n\n"]
+        observado = estado_observador()["ultimo_id"]
+        if observado is not None and (self.last_id is None or int(observado) > self.last_id):
+            self.last_id = int(observado)
+            mensajes.append(_mensaje({"id": self.last_id}, "cursor"))
+        return mensajes
+
+
+# Respuesta SSE sin cache ni buffering en proxies.
+def _respuesta_sse(stream) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
     response["Cache-Control"] = "no-cache"
     response["X-Accel-Buffering"] = "no"
     return response
+
+
+# Stream async para ASGI; cada conexion inactiva solo ocupa una corrutina esperando su cola.
+async def _stream_async(request, session_key, cursor):
+    conexion = _Conexion(asyncio.get_running_loop())
+    _registrar(conexion)
+    try:
+        yield "retry: 3000\n\n"
+        for mensaje in cursor.inicio():
+            yield mensaje
+        verificado_at = time.monotonic()
+        while True:
+            try:
+                evento = await asyncio.wait_for(conexion.cola.get(), timeout=PING_SEGUNDOS)
+                mensajes = cursor.eventos([evento, *conexion.pendientes()])
+            except asyncio.TimeoutError:
+                mensajes = cursor.inactividad()
+            for mensaje in mensajes:
+                yield mensaje
+
+            ahora = time.monotonic()
+            if ahora - verificado_at > VERIFICAR_SESION_SEGUNDOS:
+                verificado_at = ahora
+                if not await sync_to_async(_sesion_vigente)(request, session_key):
+                    yield "event: logout\ndata: {}\n\n"
+                    break
+    finally:
+        _desregistrar(conexion)
+
+
+# Respaldo para runserver/WSGI; el stream se corta a los pocos segundos para liberar el worker.
+def _stream_wsgi(request, session_key, cursor):
+    conexion = _Conexion()
+    _registrar(conexion)
+    try:
+        inicio = time.monotonic()
+        yield "retry: 3000\n\n"
+        if not _sesion_vigente(request, session_key):
+            yield "event: logout\ndata: {}\n\n"
+            return
+        yield from cursor.inicio()
+        while time.monotonic() - inicio < _duracion_maxima_wsgi():
+            try:
+                evento = conexion.cola.get(timeout=PING_SEGUNDOS)
+                yield from cursor.eventos([evento, *conexion.pendientes()])
+            except queue.Empty:
+                yield from cursor.inactividad()
+    finally:
+        _desregistrar(conexion)
+
+
+# Endpoint SSE; bajo ASGI (asgi.py con uvicorn) usa el stream async, bajo WSGI el respaldo acotado.
+async def realtime_stream_view(request):
+    token = await sync_to_async(request.session.get)("supabase_access_token")
+    if not token:
+        return StreamingHttpResponse(status=401)
+
+    session_key = request.session.session_key
+    cursor = _Cursor(_parsear_since(request), _parsear_tablas(request))
+    if isinstance(request, ASGIRequest):
+        return _respuesta_sse(_stream_async(request, session_key, cursor))
+    return _respuesta_sse(_stream_wsgi(request, session_key, cursor))
+
+
+suscribir(_difundir)
@@ -0,0 +1,21 @@
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+
+from aexfy_admin.realtime import conexiones_abiertas
+from auditoria.escritor import estado_escritor_auditoria
+from integraciones.eventos import estado_observador
+from integraciones.politica import estado_politica
+from integraciones.supabase_client import estado_clientes_supabase
+
+
+# Health check del proceso; publico para balanceadores, con detalle solo para sesiones activas.
+@never_cache
+def salud_view(request):
+    respuesta = {"estado": "ok"}
+    if request.session.get("supabase_access_token"):
+        respuesta["supabase"] = estado_clientes_supabase()
+        respuesta["supabase_politica"] = estado_politica()
+        respuesta["realtime_observador"] = estado_observador()
+        respuesta["realtime_conexiones"] = conexiones_abiertas()
+        respuesta["auditoria_escritor"] = estado_escritor_auditoria()
+    return JsonResponse(respuesta)
@@ -1,6 +1,8 @@
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # BASE_DIR se comparte con settings.py, manage.py y cualquier app para rutas base.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
 
 # Middlewares base; trabajan junto a urls.py y las vistas que se agreguen luego.
 MIDDLEWARE = [
+    # Primero para que el total de Server-Timing cubra toda la cadena (aexfy_admin/metricas.py).
+    "aexfy_admin.metricas.metricas_middleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -62,7 +66,8 @@ ROOT_URLCONF = "aexfy_admin.urls"
 # Plantillas; se usaran en vistas de futuras apps y en el admin de Django.
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates con medicion del render para Server-Timing (aexfy_admin/metricas.py).
+        "BACKEND": "aexfy_admin.metricas.PlantillasMedidas",
         # Incluye templates globales como aexfy_admin/templates/base.html.
         "DIRS": [BASE_DIR / "aexfy_admin" / "templates"],
         "APP_DIRS": True,
@@ -128,3 +133,85 @@ SUPABASE_ANON_KEY = os.environ.get("SUPABASE_ANON_KEY", "")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
 # URL de redireccion para invitaciones; apunta a la vista de activacion de contrasena.
 SUPABASE_INVITE_REDIRECT_URL = os.environ.get("SUPABASE_INVITE_REDIRECT_URL", "")
+
+# Pool HTTP de los clientes Supabase compartidos por proceso (integraciones/supabase_client.py).
+# Timeout en segundos por request y limites de conexiones keep-alive por cliente.
+SUPABASE_HTTP_TIMEOUT = float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "10"))
+SUPABASE_POOL_MAX_CONEXIONES = int(os.environ.get("SUPABASE_POOL_MAX_CONEXIONES", "20"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+SUPABASE_POOL_KEEPALIVE_SEGUNDOS = float(os.environ.get("SUPABASE_POOL_KEEPALIVE_SEGUNDOS", "30"))
+# Politica de llamadas a PostgREST (integraciones/politica.py). Las lecturas (listar_*, obtener_*,
+# lotes y consultas GET) tienen timeout propio y reintentos con jitter dentro de ese mismo plazo;
+# las escrituras usan SUPABASE_HTTP_TIMEOUT y no se reintentan. Tras CIRCUITO_FALLAS fallas
+# consecutivas el circuito se abre: durante CIRCUITO_ESPERA_SEGUNDOS las llamadas fallan al instante
+# y las lecturas se sirven con la ultima respuesta correcta (hasta RESPALDO_SEGUNDOS de antiguedad).
+# El respaldo se acota por entradas y bytes totales; no guarda cuerpos mayores a RESPALDO_MAX_CUERPO
+# ni las paginas por cursor de las exportaciones.
+SUPABASE_TIMEOUT_LECTURA = float(os.environ.get("SUPABASE_TIMEOUT_LECTURA", "5"))
+# Timeouts en segundos por funcion; reemplazan al de lectura o escritura.
+SUPABASE_TIMEOUTS_RPC = {
+    "ejecutar_sql_admin": 30,
+    "eliminar_usuarios_masivo_admin": 30,
+    "registrar_eventos_auditoria_lote": 30,
+}
+SUPABASE_REINTENTOS_LECTURA = int(os.environ.get("SUPABASE_REINTENTOS_LECTURA", "2"))
+SUPABASE_REINTENTO_BASE_SEGUNDOS = float(os.environ.get("SUPABASE_REINTENTO_BASE_SEGUNDOS", "0.2"))
+SUPABASE_CIRCUITO_FALLAS = int(os.environ.get("SUPABASE_CIRCUITO_FALLAS", "5"))
+SUPABASE_CIRCUITO_ESPERA_SEGUNDOS = float(os.environ.get("SUPABASE_CIRCUITO_ESPERA_SEGUNDOS", "30"))
+SUPABASE_RESPALDO_MAX = int(os.environ.get("SUPABASE_RESPALDO_MAX", "500"))
+SUPABASE_RESPALDO_SEGUNDOS = float(os.environ.get("SUPABASE_RESPALDO_SEGUNDOS", "300"))
+SUPABASE_RESPALDO_MAX_BYTES = int(os.environ.get("SUPABASE_RESPALDO_MAX_BYTES", str(16 * 1024 * 1024)))
+SUPABASE_RESPALDO_MAX_CUERPO = int(os.environ.get("SUPABASE_RESPALDO_MAX_CUERPO", str(256 * 1024)))
+# Cliente Supabase en memoria (integraciones/supabase_falso.py) para medir y probar sin red.
+# Cada llamada espera LATENCIA_MS mas una variacion aleatoria de hasta VARIACION_MS; los datos se
+# siembran con SEMILLA y todos los usuarios inician sesion con SUPABASE_FALSO_PASSWORD.
+# Nunca habilitar en produccion: no aplica permisos ni persiste cambios. Solo se acepta con DEBUG
+# y con SUPABASE_FALSO_PASSWORD definida en el entorno (no hay contrasena por defecto).
+SUPABASE_FALSO = os.environ.get("SUPABASE_FALSO", "0") == "1"
+SUPABASE_FALSO_LATENCIA_MS = float(os.environ.get("SUPABASE_FALSO_LATENCIA_MS", "0"))
+SUPABASE_FALSO_VARIACION_MS = float(os.environ.get("SUPABASE_FALSO_VARIACION_MS", "0"))
+SUPABASE_FALSO_SEMILLA = int(os.environ.get("SUPABASE_FALSO_SEMILLA", "1"))
+SUPABASE_FALSO_USUARIOS = int(os.environ.get("SUPABASE_FALSO_USUARIOS", "2000"))
+SUPABASE_FALSO_EMPRESAS = int(os.environ.get("SUPABASE_FALSO_EMPRESAS", "500"))
+SUPABASE_FALSO_SOLICITUDES = int(os.environ.get("SUPABASE_FALSO_SOLICITUDES", "500"))
+SUPABASE_FALSO_AUDITORIA = int(os.environ.get("SUPABASE_FALSO_AUDITORIA", "5000"))
+SUPABASE_FALSO_PASSWORD = os.environ.get("SUPABASE_FALSO_PASSWORD", "")
+if SUPABASE_FALSO and not DEBUG:
+    raise ImproperlyConfigured("SUPABASE_FALSO solo se permite con DJANGO_DEBUG=1.")
+if SUPABASE_FALSO and not SUPABASE_FALSO_PASSWORD:
+    raise ImproperlyConfigured("SUPABASE_FALSO requiere definir SUPABASE_FALSO_PASSWORD.")
+
+# Cache del contexto de autorizacion (roles, session_key, zona) en cuentas/contexto.py.
+# Se invalida con public.realtime_events; el TTL acota la espera si el observador falla.
+AUTH_CONTEXTO_TTL_SEGUNDOS = int(os.environ.get("AUTH_CONTEXTO_TTL_SEGUNDOS", "30"))
+# Intervalo de lectura de public.realtime_events por proceso (integraciones/eventos.py).
+REALTIME_POLL_SEGUNDOS = float(os.environ.get("REALTIME_POLL_SEGUNDOS", "2"))
+# Conexion directa a Postgres (no PostgREST) para recibir public.realtime_events por LISTEN/NOTIFY.
+# Vacia mantiene el polling; en Supabase usar la conexion directa o el pooler en modo sesion,
+# porque el modo transaccion no conserva LISTEN. Para pruebas locales basta un Postgres con DB_Aexfy.db.
+REALTIME_DATABASE_URL = os.environ.get("REALTIME_DATABASE_URL", "")
+# Retencion de public.realtime_events para `manage.py purgar_realtime` (sin pg_cron).
+REALTIME_RETENCION_HORAS = float(os.environ.get("REALTIME_RETENCION_HORAS", "24"))
+# Duracion maxima del stream SSE cuando se sirve por WSGI (runserver); bajo ASGI no aplica.
+REALTIME_WSGI_MAX_SEGUNDOS = float(os.environ.get("REALTIME_WSGI_MAX_SEGUNDOS", "60"))
+# Totales de listados: conteo exacto hasta este numero de filas, estimacion del planificador sobre el.
+LISTADOS_CONTEO_EXACTO_MAX = int(os.environ.get("LISTADOS_CONTEO_EXACTO_MAX", "10000"))
+# Cache de catalogos (segmentos, regiones, roles) en aexfy_admin/catalogos.py; public.realtime_events
+# la invalida al cambiar segmentos_industriales o regiones_chile, el TTL es solo un respaldo.
+CATALOGOS_TTL_SEGUNDOS = int(os.environ.get("CATALOGOS_TTL_SEGUNDOS", "3600"))
+# Escritor de auditoria en segundo plano (auditoria/escritor.py): severidad baja y media se encolan
+# y se envian en lotes; alta y critica siguen en linea. El spool guarda lo encolado hasta enviarlo.
+AUDITORIA_ASINCRONA = os.environ.get("AUDITORIA_ASINCRONA", "1") == "1"
+AUDITORIA_COLA_MAX = int(os.environ.get("AUDITORIA_COLA_MAX", "10000"))
+AUDITORIA_LOTE_MAX = int(os.environ.get("AUDITORIA_LOTE_MAX", "200"))
+AUDITORIA_SPOOL_DIR = Path(os.environ.get("AUDITORIA_SPOOL_DIR", str(BASE_DIR / "auditoria_spool")))
+# Tiempos por request (aexfy_admin/metricas.py): header Server-Timing con cada RPC, sesion y plantilla;
+# por defecto solo con DEBUG porque expone nombres de funciones. El endpoint /metricas/ muestra
+# histogramas de latencia por RPC del worker y esta apagado salvo que se habilite.
+METRICAS_SERVER_TIMING = os.environ.get("METRICAS_SERVER_TIMING", "1" if DEBUG else "0") == "1"
+METRICAS_ENDPOINT = os.environ.get("METRICAS_ENDPOINT", "0") == "1"
+METRICAS_REQUEST_LENTO_MS = float(os.environ.get("METRICAS_REQUEST_LENTO_MS", "1000"))
+# Exportaciones en segundo plano (aexfy_admin/trabajos_exportacion.py): carpeta local y retencion.
+# En Render el disco es efimero; los archivos solo deben durar lo necesario para descargarlos.
+EXPORTACIONES_DIR = Path(os.environ.get("EXPORTACIONES_DIR", str(BASE_DIR / "exportaciones")))
+EXPORTACIONES_RETENCION_HORAS = float(os.environ.get("EXPORTACIONES_RETENCION_HORAS", "24"))
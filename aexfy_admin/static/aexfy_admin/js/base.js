@@ -57,25 +57,28 @@
   window.AexfyConfirm = abrirConfirmacion;
 
   // Asocia confirmaciones a elementos con data-confirm.
-  document.querySelectorAll("[data-confirm]").forEach((elemento) => {
-    elemento.addEventListener("click", (event) => {
-      const mensaje = elemento.getAttribute("data-confirm") || "¿Deseas continuar?";
-      event.preventDefault();
+  // Delegado en document para cubrir filas reemplazadas por realtime_sse.js.
+  document.addEventListener("click", (event) => {
+    const elemento = event.target.closest("[data-confirm]");
+    if (!elemento) {
+      return;
+    }
+    const mensaje = elemento.getAttribute("data-confirm") || "¿Deseas continuar?";
+    event.preventDefault();
 
-      abrirConfirmacion(mensaje, () => {
-        if (elemento.tagName === "A") {
-          window.location.href = elemento.getAttribute("href");
-          return;
-        }
-        const form = elemento.form;
-        if (form) {
-          if (typeof form.requestSubmit === "function") {
-            form.requestSubmit(elemento);
-          } else {
-            form.submit();
-          }
+    abrirConfirmacion(mensaje, () => {
+      if (elemento.tagName === "A") {
+        window.location.href = elemento.getAttribute("href");
+        return;
+      }
+      const form = elemento.form;
+      if (form) {
+        if (typeof form.requestSubmit === "function") {
+          form.requestSubmit(elemento);
+        } else {
+          form.submit();
         }
-      });
+      }
     });
   });
 })();
@@ -5,18 +5,25 @@
     return;
   }
 
+  // Tablas que muestra la pagina (bloque realtime_tablas en base.html); sin tablas no se recarga.
+  const tablas = (body.dataset.realtimeTablas || "")
+    .split(",")
+    .map((tabla) => tabla.trim())
+    .filter(Boolean);
+
   const lastKey = "aexfy_realtime_last_id";
   const lastId = window.localStorage.getItem(lastKey) || "";
   const url = new URL("/realtime/stream/", window.location.origin);
   if (lastId && /^[0-9]+$/.test(lastId)) {
     url.searchParams.set("since", lastId);
   }
+  url.searchParams.set("tablas", tablas.join(","));
 
   const source = new EventSource(url.toString());
   let recargaPendiente = null;
 
   const solicitarRecarga = () => {
-    if (recargaPendiente) {
+    if (recargaPendiente || !tablas.length) {
       return;
     }
     recargaPendiente = window.setTimeout(() => {
@@ -24,22 +31,168 @@
     }, 300);
   };
 
-  source.onmessage = (event) => {
-    if (event.data) {
-      try {
-        const payload = JSON.parse(event.data);
-        if (payload && payload.id) {
+  // Guarda el ultimo id visto para reconectar con since sin perder eventos.
+  const leerPayload = (event) => {
+    try {
+      const payload = JSON.parse(event.data || "{}");
+      if (payload && payload.id) {
+        const previo = Number(window.localStorage.getItem(lastKey) || 0);
+        if (Number(payload.id) > previo) {
           window.localStorage.setItem(lastKey, String(payload.id));
         }
-      } catch (error) {
-        if (/^[0-9]+$/.test(event.data)) {
-          window.localStorage.setItem(lastKey, event.data);
-        }
       }
+      return payload || {};
+    } catch (error) {
+      return {};
     }
-    solicitarRecarga();
   };
 
+  // Endpoint de fila (bloque realtime_fila_url); con el se parchean filas en vez de recargar.
+  const filaUrl = body.dataset.realtimeFilaUrl || "";
+  const idPlantilla = "00000000-0000-0000-0000-000000000000";
+  const maxFilasPendientes = 50;
+  const filasPendientes = new Map();
+  let parcheProgramado = null;
+
+  const buscarFila = (id) => document.querySelector(`[data-realtime-fila="${CSS.escape(id)}"]`);
+
+  // Aviso no intrusivo cuando hay filas nuevas que no se pueden ubicar en esta pagina.
+  const mostrarAviso = () => {
+    if (document.getElementById("realtime-aviso")) {
+      return;
+    }
+    const aviso = document.createElement("p");
+    aviso.id = "realtime-aviso";
+    aviso.className = "estado";
+    aviso.append("Hay registros nuevos. ");
+    const enlace = document.createElement("a");
+    enlace.href = window.location.href;
+    enlace.textContent = "Actualizar";
+    aviso.append(enlace);
+    const main = document.querySelector(".app-main");
+    if (main) {
+      main.prepend(aviso);
+    }
+  };
+
+  // Convierte el HTML del endpoint en un <tr>; cualquier otra respuesta (login, sin permisos) es null.
+  const parsearFila = (html) => {
+    const plantilla = document.createElement("template");
+    plantilla.innerHTML = `<table><tbody>${html}</tbody></table>`;
+    const fila = plantilla.content.querySelector("tr[data-realtime-fila]");
+    return fila || null;
+  };
+
+  // Reemplaza la fila conservando los checkboxes marcados de acciones masivas.
+  const reemplazarFila = (actual, nueva) => {
+    actual.querySelectorAll("input[type='checkbox']").forEach((checkbox) => {
+      const destino = nueva.querySelector(`input[type='checkbox'][name="${checkbox.name}"][value="${checkbox.value}"]`);
+      if (destino) {
+        destino.checked = checkbox.checked;
+      }
+    });
+    actual.replaceWith(nueva);
+  };
+
+  const insertarFila = (nueva) => {
+    const cuerpo = document.querySelector("tbody[data-realtime-insertar]");
+    if (!cuerpo) {
+      mostrarAviso();
+      return;
+    }
+    cuerpo.querySelectorAll("[data-realtime-vacio]").forEach((vacio) => vacio.remove());
+    cuerpo.prepend(nueva);
+  };
+
+  // Pide la fila al servidor: 200 reemplaza o inserta, 204 la quita, otro caso recarga.
+  const actualizarFila = async (id, accion) => {
+    const actual = buscarFila(id);
+    if (accion === "delete") {
+      if (actual) {
+        actual.remove();
+      }
+      return;
+    }
+    if (!actual && accion !== "insert") {
+      return;
+    }
+    const respuesta = await window.fetch(filaUrl.replace(idPlantilla, id), {
+      credentials: "same-origin",
+      headers: { "X-Requested-With": "XMLHttpRequest" },
+    });
+    if (respuesta.status === 204) {
+      if (actual) {
+        actual.remove();
+      }
+      return;
+    }
+    const nueva = respuesta.ok && !respuesta.redirected ? parsearFila(await respuesta.text()) : null;
+    if (!nueva) {
+      solicitarRecarga();
+      return;
+    }
+    const vigente = buscarFila(id);
+    if (vigente) {
+      reemplazarFila(vigente, nueva);
+    } else {
+      insertarFila(nueva);
+    }
+  };
+
+  // Agrupa rafagas: cada entidad se pide una sola vez con su ultima accion.
+  const programarParche = () => {
+    if (parcheProgramado) {
+      return;
+    }
+    parcheProgramado = window.setTimeout(() => {
+      parcheProgramado = null;
+      const lote = Array.from(filasPendientes.entries());
+      filasPendientes.clear();
+      lote.forEach(([id, accion]) => {
+        actualizarFila(id, accion).catch(() => solicitarRecarga());
+      });
+    }, 150);
+  };
+
+  const encolarFila = (payload) => {
+    // La primera tabla es la del listado; en las demas (p. ej. asignaciones de roles)
+    // entidad_id apunta a una fila existente y cualquier cambio se trata como update.
+    const accion = payload.tabla === tablas[0] ? payload.accion : "update";
+    const previa = filasPendientes.get(payload.entidad_id);
+    // Un insert seguido de updates sigue siendo una fila nueva para esta pagina.
+    filasPendientes.set(payload.entidad_id, previa === "insert" && accion === "update" ? "insert" : accion);
+    if (filasPendientes.size > maxFilasPendientes) {
+      filasPendientes.clear();
+      solicitarRecarga();
+      return;
+    }
+    programarParche();
+  };
+
+  // Cambio en una tabla: {id, tabla, accion, entidad_id}.
+  source.onmessage = (event) => {
+    const payload = leerPayload(event);
+    if (!tablas.includes(payload.tabla)) {
+      return;
+    }
+    if (filaUrl && payload.entidad_id) {
+      encolarFila(payload);
+    } else {
+      solicitarRecarga();
+    }
+  };
+
+  // Solo avanza el cursor; no hubo cambios en las tablas de esta pagina.
+  source.addEventListener("cursor", (event) => {
+    leerPayload(event);
+  });
+
+  // Se perdieron eventos sin detalle disponible; se recarga si la pagina muestra datos en vivo.
+  source.addEventListener("resync", (event) => {
+    leerPayload(event);
+    solicitarRecarga();
+  });
+
   source.addEventListener("logout", () => {
     window.location.reload();
   });
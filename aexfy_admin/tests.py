@@ -0,0 +1,162 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.test import RequestFactory, SimpleTestCase
+from django.test.utils import override_settings
+
+from aexfy_admin.exportacion import recorrer_por_cursor, respuesta_csv
+from aexfy_admin.paginacion import codificar_cursor, decodificar_cursor, filtros_pagina, resolver_pagina
+from integraciones.instrumentacion import histogramas_llamadas
+from integraciones.supabase_falso import reiniciar_cliente_falso
+from usuarios.services import listar_usuarios_admin
+
+# Cliente Supabase en memoria (integraciones/supabase_falso.py) con un dataset chico y sin latencia.
+CLIENTE_FALSO = override_settings(
+    DEBUG=True,
+    SUPABASE_FALSO=True,
+    SUPABASE_FALSO_PASSWORD="prueba",
+    SUPABASE_FALSO_LATENCIA_MS=0,
+    SUPABASE_FALSO_VARIACION_MS=0,
+    SUPABASE_FALSO_USUARIOS=250,
+    SUPABASE_FALSO_EMPRESAS=10,
+    SUPABASE_FALSO_SOLICITUDES=10,
+    SUPABASE_FALSO_AUDITORIA=10,
+)
+
+
+# Filas con fecha descendente como las devuelven las RPC listar_*_admin.
+def _filas(cantidad: int) -> list[dict]:
+    inicio = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"id": str(uuid.UUID(int=indice + 1)), "creado_en": (inicio - timedelta(minutes=indice)).isoformat()}
+        for indice in range(cantidad)
+    ]
+
+
+# Llamadas registradas para una RPC en los histogramas del proceso.
+def _llamadas(nombre: str) -> int:
+    return histogramas_llamadas().get(nombre, {}).get("llamadas", 0)
+
+
+class PaginacionTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_cursor_ida_y_vuelta(self):
+        fila = _filas(1)[0]
+        datos = decodificar_cursor(codificar_cursor(fila))
+        self.assertEqual(datos["cursor_id"], fila["id"])
+        self.assertEqual(datos["cursor_creado_en"], fila["creado_en"])
+        self.assertFalse(datos["antes"])
+        self.assertTrue(decodificar_cursor(codificar_cursor(fila, antes=True))["antes"])
+
+    def test_cursor_con_otro_campo_de_fecha(self):
+        fila = {"id": str(uuid.uuid4()), "registrado_en": "2026-03-01T10:00:00+00:00"}
+        self.assertIsNone(codificar_cursor(fila))
+        datos = decodificar_cursor(codificar_cursor(fila, campo_fecha="registrado_en"))
+        self.assertEqual(datos["cursor_creado_en"], fila["registrado_en"])
+
+    def test_cursor_alterado_se_descarta(self):
+        valido = codificar_cursor(_filas(1)[0])
+        alterados = [
+            "",
+            None,
+            "no-es-base64!",
+            valido[:-3],
+            base64.urlsafe_b64encode(b'{"c":"2026-01-01","i":"no-uuid"}').decode(),
+            base64.urlsafe_b64encode(b'{"c":"ayer","i":"%s"}' % str(uuid.uuid4()).encode()).decode(),
+            base64.urlsafe_b64encode(json.dumps({"i": str(uuid.uuid4())}).encode()).decode(),
+        ]
+        for token in alterados:
+            with self.subTest(token=token):
+                self.assertIsNone(decodificar_cursor(token))
+
+    def test_filtros_pagina_sin_cursor_valido_vuelve_al_inicio(self):
+        page, filtros = filtros_pagina(self.factory.get("/usuarios/", {"page": 3, "cursor": "alterado"}))
+        self.assertEqual(page, 1)
+        self.assertNotIn("cursor_id", filtros)
+        self.assertEqual(filtros["limit"], 26)
+
+    def test_filtros_pagina_con_cursor(self):
+        token = codificar_cursor(_filas(1)[0])
+        page, filtros = filtros_pagina(self.factory.get("/usuarios/", {"page": 2, "cursor": token}))
+        self.assertEqual(page, 2)
+        self.assertEqual(filtros["cursor_id"], _filas(1)[0]["id"])
+        self.assertFalse(filtros["antes"])
+
+    def test_resolver_pagina_hacia_adelante(self):
+        filas = _filas(26)
+        visibles, contexto = resolver_pagina(filas, 2, {})
+        self.assertEqual(visibles, filas[:25])
+        self.assertTrue(contexto["has_next"])
+        self.assertEqual(decodificar_cursor(contexto["cursor_siguiente"])["cursor_id"], filas[24]["id"])
+        # En la pagina 2 el boton Anterior pide la pagina 1 sin cursor.
+        self.assertIsNone(contexto["cursor_anterior"])
+        self.assertEqual((contexto["desde"], contexto["hasta"]), (26, 50))
+
+    def test_resolver_ultima_pagina(self):
+        visibles, contexto = resolver_pagina(_filas(7), 3, {})
+        self.assertEqual(len(visibles), 7)
+        self.assertFalse(contexto["has_next"])
+        cursor_anterior = decodificar_cursor(contexto["cursor_anterior"])
+        self.assertTrue(cursor_anterior["antes"])
+        self.assertEqual(cursor_anterior["cursor_id"], visibles[0]["id"])
+
+    def test_resolver_pagina_antes(self):
+        filas = _filas(26)
+        visibles, contexto = resolver_pagina(filas, 4, {"antes": True})
+        self.assertEqual(visibles, filas[-25:])
+        self.assertEqual(contexto["page"], 4)
+        self.assertTrue(contexto["has_next"])
+
+    def test_resolver_pagina_antes_sin_pagina_previa_vuelve_a_la_primera(self):
+        _, contexto = resolver_pagina(_filas(10), 3, {"antes": True})
+        self.assertEqual(contexto["page"], 1)
+        self.assertIsNone(contexto["cursor_anterior"])
+
+
+@CLIENTE_FALSO
+class ExportacionTests(SimpleTestCase):
+    def setUp(self):
+        reiniciar_cliente_falso()
+
+    def tearDown(self):
+        reiniciar_cliente_falso()
+
+    def test_recorrer_por_cursor_entrega_todas_las_filas_una_vez(self):
+        antes = _llamadas("rpc.listar_usuarios_admin")
+        filas = list(recorrer_por_cursor(listar_usuarios_admin, {}, "creado_en", por_lote=100))
+        self.assertEqual(len(filas), 250)
+        self.assertEqual(len({fila["id"] for fila in filas}), 250)
+        claves = [(fila["creado_en"], fila["id"]) for fila in filas]
+        self.assertEqual(claves, sorted(claves, reverse=True))
+        # 100 + 100 + 50: la vuelta corta termina el recorrido sin una llamada vacia.
+        self.assertEqual(_llamadas("rpc.listar_usuarios_admin") - antes, 3)
+
+    def test_recorrer_por_cursor_lote_exacto_termina_con_llamada_vacia(self):
+        antes = _llamadas("rpc.listar_usuarios_admin")
+        filas = list(recorrer_por_cursor(listar_usuarios_admin, {}, "creado_en", por_lote=125))
+        self.assertEqual(len(filas), 250)
+        self.assertEqual(_llamadas("rpc.listar_usuarios_admin") - antes, 3)
+
+    def test_recorrer_por_cursor_respeta_filtros(self):
+        filas = list(recorrer_por_cursor(listar_usuarios_admin, {"zona": "NG"}, "creado_en", por_lote=20))
+        self.assertTrue(filas)
+        self.assertTrue(all(fila["zona"] == "NG" for fila in filas))
+
+    def test_respuesta_csv_aborta_si_falla_a_mitad(self):
+        def filas():
+            yield {"id": "1"}
+            raise RuntimeError("Supabase no responde")
+
+        respuesta = respuesta_csv("usuarios.csv", ["ID"], filas(), lambda fila: [fila["id"]])
+        with self.assertLogs("aexfy_admin.exportacion", "WARNING"), self.assertRaises(RuntimeError):
+            b"".join(respuesta.streaming_content)
+
+    def test_respuesta_csv_completa(self):
+        respuesta = respuesta_csv("usuarios.csv", ["ID"], iter([{"id": "1"}, {"id": "2"}]), lambda fila: [fila["id"]])
+        contenido = b"".join(respuesta.streaming_content).decode("utf-8")
+        self.assertEqual(contenido, "\ufeffID\r\n1\r\n2\r\n")
+        self.assertIn("usuarios.csv", respuesta["Content-Disposition"])
@@ -0,0 +1,238 @@
+import csv
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect, render
+from django.views.decorators.cache import never_cache
+
+from cuentas.decorators import sesion_requerida
+from cuentas.permisos import tiene_permiso
+
+# Logger para fallas de los trabajos de exportacion en segundo plano.
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo; pendiente y procesando hacen que la pagina de estado se recargue.
+ESTADOS_EN_CURSO = {"pendiente", "procesando"}
+# Cada cuantas filas se actualiza el avance visible en la pagina de estado.
+FILAS_POR_AVANCE = 1000
+
+# Exportadores registrados por cada app en su views.py: tipo -> encabezados, filas y valores.
+_exportadores = {}
+# Cola local del proceso; el estado de cada trabajo vive en disco para que cualquier worker lo lea.
+_cola = queue.Queue()
+_lock = threading.Lock()
+_estado = {"pid": None, "hilo": None}
+
+
+# Registra como exportar un tipo (usuarios, empresas, ...); filas(filtros, roles) devuelve un iterable.
+def registrar_exportacion(tipo: str, encabezados: list[str], filas, valores) -> None:
+    _exportadores[tipo] = {"encabezados": encabezados, "filas": filas, "valores": valores}
+
+
+# Carpeta local de trabajos y archivos generados (EXPORTACIONES_DIR en settings.py).
+def _directorio() -> Path:
+    directorio = Path(getattr(settings, "EXPORTACIONES_DIR", settings.BASE_DIR / "exportaciones"))
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def _ruta_estado(trabajo_id: str) -> Path:
+    return _directorio() / f"{trabajo_id}.json"
+
+
+def _ruta_archivo(trabajo_id: str) -> Path:
+    return _directorio() / f"{trabajo_id}.csv.gz"
+
+
+# Escribe el estado de forma atomica; la pagina de estado nunca lee un JSON a medias.
+def _guardar(trabajo: dict) -> None:
+    ruta = _ruta_estado(trabajo["id"])
+    temporal = ruta.with_suffix(".json.tmp")
+    temporal.write_text(json.dumps(trabajo), encoding="utf-8")
+    os.replace(temporal, ruta)
+
+
+# Lee un trabajo por id; None si el id no es un uuid o el archivo ya no existe.
+def obtener_trabajo(trabajo_id) -> dict | None:
+    try:
+        trabajo_id = str(uuid.UUID(str(trabajo_id)))
+    except ValueError:
+        return None
+    try:
+        return json.loads(_ruta_estado(trabajo_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+# El proceso que tomo el trabajo sigue vivo; si murio (reinicio del worker) el trabajo no terminara.
+def _proceso_vivo(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+# Horas que se conservan trabajos y archivos (EXPORTACIONES_RETENCION_HORAS en settings.py).
+def _retencion_segundos() -> float:
+    return float(getattr(settings, "EXPORTACIONES_RETENCION_HORAS", 24)) * 3600
+
+
+# Elimina trabajos y archivos vencidos; se ejecuta antes de cada trabajo nuevo.
+def _purgar_vencidos() -> None:
+    limite = time.time() - _retencion_segundos()
+    for ruta in _directorio().iterdir():
+        try:
+            if ruta.stat().st_mtime < limite:
+                ruta.unlink()
+        except OSError:
+            pass
+
+
+# Genera el CSV comprimido del trabajo; el archivo final aparece solo cuando esta completo.
+def _ejecutar(trabajo_id: str) -> None:
+    trabajo = obtener_trabajo(trabajo_id)
+    if not trabajo:
+        return
+    exportador = _exportadores.get(trabajo["tipo"])
+    trabajo.update({"estado": "procesando", "iniciado_en": time.time()})
+    _guardar(trabajo)
+
+    ruta = _ruta_archivo(trabajo_id)
+    temporal = ruta.with_suffix(".gz.tmp")
+    try:
+        if exportador is None:
+            raise ValueError(f"Exportacion no registrada: {trabajo['tipo']}")
+        with gzip.open(temporal, "wt", encoding="utf-8", newline="") as archivo:
+            # Mismo formato que la descarga directa: BOM y ';' para Excel.
+            archivo.write("\ufeff")
+            escritor = csv.writer(archivo, delimiter=";")
+            escritor.writerow(exportador["encabezados"])
+            for fila in exportador["filas"](trabajo["filtros"], trabajo["roles"]):
+                escritor.writerow(exportador["valores"](fila))
+                trabajo["filas"] += 1
+                if trabajo["filas"] % FILAS_POR_AVANCE == 0:
+                    _guardar(trabajo)
+        os.replace(temporal, ruta)
+        trabajo.update({"estado": "listo", "terminado_en": time.time(), "bytes": ruta.stat().st_size})
+    except Exception as exc:
+        logger.warning("Error en exportacion %s (%s): %s", trabajo_id, trabajo["tipo"], exc)
+        temporal.unlink(missing_ok=True)
+        trabajo.update({"estado": "error", "terminado_en": time.time(), "error": str(exc)})
+    _guardar(trabajo)
+
+
+# Bucle del hilo de exportaciones; procesa un trabajo a la vez por proceso.
+def _bucle() -> None:
+    while True:
+        trabajo_id = _cola.get()
+        try:
+            _purgar_vencidos()
+            _ejecutar(trabajo_id)
+        except Exception:
+            logger.exception("Error inesperado en el hilo de exportaciones.")
+
+
+# Inicia el hilo de exportaciones del proceso si aun no corre (igual que integraciones/eventos.py).
+def asegurar_trabajador() -> None:
+    pid = os.getpid()
+    hilo = _estado["hilo"]
+    if _estado["pid"] == pid and hilo is not None and hilo.is_alive():
+        return
+    with _lock:
+        hilo = _estado["hilo"]
+        if _estado["pid"] == pid and hilo is not None and hilo.is_alive():
+            return
+        _estado["pid"] = pid
+        _estado["hilo"] = threading.Thread(target=_bucle, name="aexfy-exportaciones", daemon=True)
+        _estado["hilo"].start()
+
+
+# Encola una exportacion con los filtros ya resueltos (incluida la zona de la sesion).
+# roles se guarda para aplicar las mismas reglas de visibilidad que el listado al generar filas.
+def crear_trabajo_exportacion(tipo: str, filtros: dict, usuario: dict, roles: list[str]) -> dict:
+    trabajo = {
+        "id": str(uuid.uuid4()),
+        "tipo": tipo,
+        "estado": "pendiente",
+        "usuario_id": str((usuario or {}).get("id") or ""),
+        "filtros": filtros,
+        "roles": list(roles or []),
+        "pid": os.getpid(),
+        "creado_en": time.time(),
+        "filas": 0,
+        "error": None,
+    }
+    _guardar(trabajo)
+    asegurar_trabajador()
+    _cola.put(trabajo["id"])
+    return trabajo
+
+
+# Encola desde la vista de exportacion de cada app (POST) y redirige a la pagina de estado.
+# La vista que llama ya valido sesion y permiso; filtros debe ser serializable a JSON.
+def encolar_exportacion(request, tipo: str, filtros: dict):
+    if request.method != "POST":
+        return redirect(f"{tipo}_listado")
+    trabajo = crear_trabajo_exportacion(
+        tipo,
+        filtros,
+        request.session.get("usuario") or {},
+        request.session.get("roles") or [],
+    )
+    return redirect("exportacion_estado", trabajo_id=trabajo["id"])
+
+
+# Trabajo visible para la sesion: solo quien lo creo y con permiso sobre el modulo exportado.
+def _trabajo_de_sesion(request, trabajo_id) -> dict:
+    trabajo = obtener_trabajo(trabajo_id)
+    usuario_id = str((request.session.get("usuario") or {}).get("id") or "")
+    roles = request.session.get("roles") or []
+    if not trabajo or not usuario_id or trabajo.get("usuario_id") != usuario_id:
+        raise Http404("Exportacion no encontrada.")
+    if not tiene_permiso(roles, trabajo["tipo"]):
+        raise Http404("Exportacion no encontrada.")
+    return trabajo
+
+
+# Estado de una exportacion; la pagina se recarga sola mientras el trabajo sigue en curso.
+@sesion_requerida
+@never_cache
+def exportacion_estado_view(request, trabajo_id):
+    trabajo = _trabajo_de_sesion(request, trabajo_id)
+    if trabajo["estado"] in ESTADOS_EN_CURSO and not _proceso_vivo(trabajo.get("pid")):
+        trabajo.update({"estado": "error", "error": "El proceso que generaba la exportacion se reinicio."})
+        _guardar(trabajo)
+    return render(
+        request,
+        "exportacion_estado.html",
+        {
+            "trabajo": trabajo,
+            "en_curso": trabajo["estado"] in ESTADOS_EN_CURSO,
+        },
+    )
+
+
+# Descarga el CSV comprimido de un trabajo terminado.
+@sesion_requerida
+@never_cache
+def exportacion_descargar_view(request, trabajo_id):
+    trabajo = _trabajo_de_sesion(request, trabajo_id)
+    ruta = _ruta_archivo(trabajo["id"])
+    if trabajo["estado"] != "listo" or not ruta.exists():
+        raise Http404("La exportacion aun no esta disponible.")
+    return FileResponse(
+        open(ruta, "rb"),
+        as_attachment=True,
+        filename=f"{trabajo['tipo']}.csv.gz",
+        content_type="application/gzip",
+    )
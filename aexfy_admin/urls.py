@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from aexfy_admin.metricas import metricas_view
 from aexfy_admin.realtime import realtime_stream_view
+from aexfy_admin.salud import salud_view
+from aexfy_admin.trabajos_exportacion import exportacion_descargar_view, exportacion_estado_view
 
 # Rutas base del proyecto; se conecta con admin y con vistas futuras de apps.
 urlpatterns = [
@@ -9,6 +12,13 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     # Endpoint SSE para actualizaciones en tiempo real.
     path("realtime/stream/", realtime_stream_view, name="realtime_stream"),
+    # Health check y estado del pool de clientes Supabase del worker.
+    path("salud/", salud_view, name="salud"),
+    # Histogramas de latencia por RPC del worker (METRICAS_ENDPOINT en settings.py).
+    path("metricas/", metricas_view, name="metricas"),
+    # Estado y descarga de exportaciones en segundo plano (CSV comprimido).
+    path("exportaciones/<uuid:trabajo_id>/", exportacion_estado_view, name="exportacion_estado"),
+    path("exportaciones/<uuid:trabajo_id>/descargar/", exportacion_descargar_view, name="exportacion_descargar"),
     # Rutas de cuentas; maneja login e inicio del sistema.
     path("", include("cuentas.urls")),
     # Rutas del modulo de personal; creacion de staff.
@@ -20,3 +20,8 @@ if os.environ.get("DJANGO_AUTO_MIGRATE", "1") == "1":
 # Crea la aplicacion WSGI que comparte configuracion con manage.py.
 application = get_wsgi_application()
 
+# Precarga segmentos, regiones y roles para que los formularios no paguen RPC en la primera visita.
+from aexfy_admin.catalogos import precargar_catalogos
+
+precargar_catalogos()
+
@@ -0,0 +1,273 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from django.conf import settings
+
+from integraciones.supabase_client import get_supabase_service_client
+
+# Logger para fallas del escritor de auditoria en segundo plano.
+logger = logging.getLogger(__name__)
+
+# Espera maxima entre reintentos cuando la RPC de lote falla (la base no responde).
+MAX_ESPERA_REINTENTO = 30
+# Tiempo maximo que se espera al vaciar la cola cuando el proceso termina.
+SEGUNDOS_VACIADO_SALIDA = 5
+# Codigos PostgREST de conexion o pool agotado (HTTP 503/504); la base no respondio.
+CODIGOS_TRANSITORIOS = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+# Clases SQLSTATE transitorias: conexion, serializacion/deadlock, recursos, cancelacion y sistema.
+CLASES_SQLSTATE_TRANSITORIAS = ("08", "40", "53", "57", "58", "XX")
+
+_lock = threading.Lock()
+# Estado del escritor del proceso actual; se reinicia tras fork.
+_estado = {
+    "pid": None,
+    "hilo": None,
+    "cola": None,
+    "spool": None,
+    "en_vuelo": 0,
+    "enviados": 0,
+    "lotes": 0,
+    "errores": 0,
+    "descartados": 0,
+    "ultimo_error": None,
+    "ultimo_envio_en": None,
+}
+
+
+# Eventos maximos en memoria; con la cola llena el evento se escribe en linea (contrapresion).
+def _cola_max() -> int:
+    return int(getattr(settings, "AUDITORIA_COLA_MAX", 10000))
+
+
+# Eventos por llamada a registrar_eventos_auditoria_lote.
+def _lote_max() -> int:
+    return int(getattr(settings, "AUDITORIA_LOTE_MAX", 200))
+
+
+# Carpeta de los archivos spool (AUDITORIA_SPOOL_DIR en settings.py).
+def _directorio() -> Path:
+    directorio = Path(getattr(settings, "AUDITORIA_SPOOL_DIR", settings.BASE_DIR / "auditoria_spool"))
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+# Un spool por proceso; guarda cada evento antes de encolarlo para reenviarlo si el proceso muere.
+def _ruta_spool(pid: int) -> Path:
+    return _directorio() / f"pendientes-{pid}.jsonl"
+
+
+# El proceso duenio de un spool sigue vivo; si murio, sus eventos se reenvian.
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+# Archivo de lotes rechazados por la base (uno por proceso); no se reenvian solos.
+def _ruta_descartados(pid: int) -> Path:
+    return _directorio() / f"descartados-{pid}.jsonl"
+
+
+# Inserta un lote con la RPC de DB_Aexfy.db; el id de cada evento evita duplicados al reenviar.
+def _insertar_lote(eventos: list[dict]) -> None:
+    cliente = get_supabase_service_client()
+    cliente.rpc("registrar_eventos_auditoria_lote", {"p_eventos": eventos}).execute()
+
+
+# Indica si vale la pena reintentar: fallas de red o del servidor (5xx, 429 y errores de conexion
+# de Postgres). Un error del request (RPC inexistente PGRST202, evento mal formado) es permanente.
+def _es_transitorio(exc: Exception) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    codigo = getattr(exc, "code", None)
+    if codigo is None:
+        return False
+    codigo = str(codigo)
+    if codigo.isdigit():
+        # postgrest usa el estado HTTP como codigo cuando la respuesta no es JSON (p. ej. un 502).
+        return int(codigo) >= 500 or int(codigo) == 429
+    return codigo in CODIGOS_TRANSITORIOS or codigo.startswith(CLASES_SQLSTATE_TRANSITORIAS)
+
+
+# Guarda un lote rechazado con su error, una linea por evento, para revisarlo y reenviarlo a mano.
+def _descartar(eventos: list[dict], exc: Exception) -> None:
+    error = str(exc)
+    with open(_ruta_descartados(os.getpid()), "a", encoding="utf-8") as archivo:
+        for evento in eventos:
+            archivo.write(json.dumps({"error": error, "evento": evento}, default=str) + "\n")
+    _estado["descartados"] += len(eventos)
+    logger.error(
+        "Lote de %s eventos de auditoria rechazado por la base; guardado en %s: %s",
+        len(eventos),
+        _ruta_descartados(os.getpid()).name,
+        exc,
+    )
+
+
+# Envia un lote reintentando con espera creciente solo ante fallas transitorias; los eventos
+# siguen en el spool mientras tanto. Un rechazo permanente va a descartados y libera el hilo.
+def _enviar(eventos: list[dict]) -> None:
+    espera = 1
+    while True:
+        try:
+            _insertar_lote(eventos)
+        except Exception as exc:
+            _estado["errores"] += 1
+            _estado["ultimo_error"] = str(exc)
+            if not _es_transitorio(exc):
+                _descartar(eventos, exc)
+                return
+            logger.warning("Error al enviar %s eventos de auditoria: %s", len(eventos), exc)
+            time.sleep(espera)
+            espera = min(espera * 2, MAX_ESPERA_REINTENTO)
+            continue
+        _estado["enviados"] += len(eventos)
+        _estado["lotes"] += 1
+        _estado["ultimo_envio_en"] = time.time()
+        return
+
+
+# Reenvia spools de procesos terminados (reinicio o caida del worker) y los elimina.
+# Renombrar el archivo lo reserva; si otro worker lo tomo primero, el rename falla y se omite.
+def _recuperar_spools() -> None:
+    pid_actual = os.getpid()
+    for ruta in _directorio().glob("pendientes-*.jsonl"):
+        try:
+            pid = int(ruta.stem.split("-")[1])
+        except (IndexError, ValueError):
+            continue
+        if ruta == _ruta_spool(pid_actual) or (pid != pid_actual and _proceso_vivo(pid)):
+            continue
+        reservada = ruta.with_name(f"recuperando-{pid_actual}-{pid}.jsonl")
+        try:
+            os.replace(ruta, reservada)
+        except OSError:
+            continue
+        eventos = []
+        for linea in reservada.read_text(encoding="utf-8").splitlines():
+            try:
+                eventos.append(json.loads(linea))
+            except ValueError:
+                # Ultima linea cortada por la caida; el resto del archivo sigue siendo valido.
+                logger.warning("Linea invalida en spool de auditoria %s.", ruta.name)
+        for inicio in range(0, len(eventos), _lote_max()):
+            _enviar(eventos[inicio:inicio + _lote_max()])
+        if eventos:
+            logger.info("Reenviados %s eventos de auditoria de %s.", len(eventos), ruta.name)
+        reservada.unlink(missing_ok=True)
+
+
+# Confirma un lote enviado; si ya no queda nada pendiente, el spool se vacia.
+def _confirmar(cantidad: int) -> None:
+    with _lock:
+        _estado["en_vuelo"] -= cantidad
+        if _estado["en_vuelo"] == 0 and _estado["spool"] is not None:
+            _estado["spool"].seek(0)
+            _estado["spool"].truncate()
+
+
+# Bucle del hilo escritor; espera el primer evento y agrupa lo que ya este en la cola.
+def _bucle(cola: queue.Queue) -> None:
+    try:
+        _recuperar_spools()
+    except Exception:
+        logger.exception("Error al recuperar spools de auditoria.")
+    while True:
+        lote = [cola.get()]
+        while len(lote) < _lote_max():
+            try:
+                lote.append(cola.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _enviar(lote)
+        except Exception:
+            logger.exception("Error inesperado en el escritor de auditoria.")
+        _confirmar(len(lote))
+
+
+# Inicia el hilo escritor y abre el spool del proceso si aun no existen (una vez por worker).
+def asegurar_escritor() -> None:
+    pid = os.getpid()
+    hilo = _estado["hilo"]
+    if _estado["pid"] == pid and hilo is not None and hilo.is_alive():
+        return
+    with _lock:
+        hilo = _estado["hilo"]
+        if _estado["pid"] == pid and hilo is not None and hilo.is_alive():
+            return
+        # Tras un fork la cola y el spool del padre no sirven al hijo; se parte desde cero.
+        ruta = _ruta_spool(pid)
+        if ruta.exists():
+            # Spool de un proceso anterior con el mismo pid; lo reenvia _recuperar_spools.
+            os.replace(ruta, ruta.with_name(f"pendientes-{pid}-{int(time.time() * 1000)}.jsonl"))
+        cola = queue.Queue(maxsize=_cola_max())
+        _estado.update(
+            {
+                "pid": pid,
+                "cola": cola,
+                "spool": open(ruta, "a", encoding="utf-8"),
+                "en_vuelo": 0,
+                "hilo": threading.Thread(
+                    target=_bucle,
+                    args=(cola,),
+                    name="aexfy-auditoria-escritor",
+                    daemon=True,
+                ),
+            }
+        )
+        _estado["hilo"].start()
+
+
+# Encola un evento ya armado; False si la cola esta llena y el llamador debe escribirlo en linea.
+def encolar_evento_auditoria(evento: dict) -> bool:
+    asegurar_escritor()
+    linea = json.dumps(evento, default=str)
+    with _lock:
+        if _estado["cola"].full():
+            return False
+        # Primero el spool y luego la cola; un evento encolado siempre esta en disco.
+        _estado["spool"].write(linea + "\n")
+        _estado["spool"].flush()
+        _estado["en_vuelo"] += 1
+        _estado["cola"].put_nowait(json.loads(linea))
+    return True
+
+
+# Al terminar el proceso espera unos segundos a que el hilo vacie la cola.
+# Lo que no alcance a salir queda en el spool y lo reenvia el siguiente worker.
+def _vaciar_al_salir() -> None:
+    if _estado["pid"] != os.getpid() or _estado["cola"] is None:
+        return
+    limite = time.monotonic() + SEGUNDOS_VACIADO_SALIDA
+    while _estado["en_vuelo"] > 0 and time.monotonic() < limite:
+        time.sleep(0.1)
+
+
+# Estado del escritor para monitoreo (ver aexfy_admin/salud.py).
+def estado_escritor_auditoria() -> dict:
+    hilo = _estado["hilo"]
+    cola = _estado["cola"]
+    return {
+        "activo": bool(hilo is not None and hilo.is_alive() and _estado["pid"] == os.getpid()),
+        "en_cola": cola.qsize() if cola is not None else 0,
+        "pendientes": _estado["en_vuelo"],
+        "enviados": _estado["enviados"],
+        "lotes": _estado["lotes"],
+        "errores": _estado["errores"],
+        "descartados": _estado["descartados"],
+        "ultimo_error": _estado["ultimo_error"],
+        "ultimo_envio_en": _estado["ultimo_envio_en"],
+    }
+
+
+atexit.register(_vaciar_al_salir)
@@ -1,4 +1,13 @@
-﻿from integraciones.supabase_client import get_supabase_service_client
+﻿import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from auditoria.escritor import encolar_evento_auditoria
+from integraciones.supabase_client import get_supabase_service_client
+
+# Severidades que se escriben en linea; la respuesta no sale hasta que el evento esta guardado.
+SEVERIDADES_SINCRONAS = {"alta", "critica"}
 
 
 # Normaliza la data de una RPC para evitar None.
@@ -6,11 +15,29 @@ def _normalizar_data(respuesta):
     return getattr(respuesta, "data", None)
 
 
-# Registra un evento de auditoria en la base de datos.
+# Registra un evento de auditoria; baja y media se encolan en auditoria/escritor.py y se envian
+# en lotes, alta y critica (o con la cola llena) se escriben en linea con la RPC individual.
 def registrar_evento_auditoria(actor: dict, accion: str, tabla: str | None, id_objetivo: str | None, severidad: str = "media", metadatos: dict | None = None):
     if not actor:
         return None
 
+    asincrona = getattr(settings, "AUDITORIA_ASINCRONA", True)
+    if asincrona and severidad not in SEVERIDADES_SINCRONAS:
+        evento = {
+            # id y fecha se fijan al encolar; el reenvio desde el spool no duplica ni reordena.
+            "id": str(uuid.uuid4()),
+            "actor_id": actor.get("id"),
+            "actor_email": actor.get("email"),
+            "accion": accion,
+            "tabla_objetivo": tabla,
+            "id_objetivo": id_objetivo,
+            "registrado_en": datetime.now(timezone.utc).isoformat(),
+            "severidad": severidad,
+            "metadatos": metadatos or {},
+        }
+        if encolar_evento_auditoria(evento):
+            return {"evento_id": evento["id"]}
+
     cliente = get_supabase_service_client()
     respuesta = cliente.rpc(
         "registrar_evento_auditoria",
@@ -45,6 +72,12 @@ def listar_auditoria_admin(filtros: dict):
             "p_fecha_hasta": fecha_hasta,
             "p_limit": filtros.get("limit", 100),
             "p_offset": filtros.get("offset", 0),
+            # Total opcional en la misma llamada (aexfy_admin/paginacion.py filtros_conteo).
+            "p_contar": bool(filtros.get("contar")),
+            "p_umbral_exacto": filtros.get("umbral_exacto"),
+            # Cursor (registrado_en, id) de aexfy_admin/exportacion.py; sin cursor se parte desde el inicio.
+            "p_cursor_registrado_en": filtros.get("cursor_creado_en"),
+            "p_cursor_id": filtros.get("cursor_id"),
         },
     ).execute()
     return _normalizar_data(respuesta) or []
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from postgrest.exceptions import APIError
+
+from auditoria import escritor
+from integraciones.supabase_falso import obtener_cliente_falso, reiniciar_cliente_falso
+
+# Pid que no corresponde a ningun proceso vivo; su spool se considera de un worker caido.
+PID_TERMINADO = 999999999
+
+
+# Evento con la forma que arma auditoria/services.py antes de encolarlo.
+def _evento(accion: str = "usuario_editado") -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "actor_id": None,
+        "actor_email": "prueba@aexfy.cl",
+        "accion": accion,
+        "tabla_objetivo": "usuarios",
+        "id_objetivo": str(uuid.uuid4()),
+        "registrado_en": datetime.now(timezone.utc).isoformat(),
+        "severidad": "media",
+        "metadatos": {},
+    }
+
+
+class EscritorAuditoriaTests(SimpleTestCase):
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp(prefix="aexfy-spool-"))
+        configuracion = override_settings(
+            DEBUG=True,
+            SUPABASE_FALSO=True,
+            SUPABASE_FALSO_PASSWORD="prueba",
+            SUPABASE_FALSO_LATENCIA_MS=0,
+            SUPABASE_FALSO_VARIACION_MS=0,
+            SUPABASE_FALSO_USUARIOS=10,
+            SUPABASE_FALSO_EMPRESAS=5,
+            SUPABASE_FALSO_SOLICITUDES=5,
+            SUPABASE_FALSO_AUDITORIA=5,
+            AUDITORIA_SPOOL_DIR=self.directorio,
+            AUDITORIA_LOTE_MAX=2,
+        )
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        reiniciar_cliente_falso()
+        self.addCleanup(reiniciar_cliente_falso)
+        # El escritor registra cada falla; se silencia para no ensuciar la salida de las pruebas.
+        nivel = escritor.logger.level
+        escritor.logger.setLevel(logging.CRITICAL)
+        self.addCleanup(escritor.logger.setLevel, nivel)
+
+    def _escribir_spool(self, pid: int, eventos: list[dict], cola: str = "") -> Path:
+        ruta = self.directorio / f"pendientes-{pid}.jsonl"
+        lineas = "".join(json.dumps(evento) + "\n" for evento in eventos)
+        ruta.write_text(lineas + cola, encoding="utf-8")
+        return ruta
+
+    def _descartados(self) -> list[dict]:
+        ruta = self.directorio / f"descartados-{os.getpid()}.jsonl"
+        if not ruta.exists():
+            return []
+        return [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()]
+
+    def test_recupera_spool_de_proceso_terminado(self):
+        eventos = [_evento() for _ in range(5)]
+        # La ultima linea quedo cortada por la caida del worker.
+        ruta = self._escribir_spool(PID_TERMINADO, eventos, cola='{"id": "cortado')
+        escritor._recuperar_spools()
+        auditoria = obtener_cliente_falso().base.auditoria
+        for evento in eventos:
+            self.assertIn(evento["id"], auditoria)
+        self.assertFalse(ruta.exists())
+        self.assertEqual(list(self.directorio.glob("recuperando-*")), [])
+
+    def test_no_toca_spool_de_proceso_vivo(self):
+        ruta = self._escribir_spool(os.getppid(), [_evento()])
+        escritor._recuperar_spools()
+        self.assertTrue(ruta.exists())
+
+    def test_reenviar_dos_veces_no_duplica(self):
+        eventos = [_evento() for _ in range(3)]
+        self._escribir_spool(PID_TERMINADO, eventos)
+        escritor._recuperar_spools()
+        total = len(obtener_cliente_falso().base.auditoria)
+        self._escribir_spool(PID_TERMINADO, eventos)
+        escritor._recuperar_spools()
+        self.assertEqual(len(obtener_cliente_falso().base.auditoria), total)
+
+    def test_spool_rechazado_va_a_descartados_sin_bloquear(self):
+        eventos = [_evento() for _ in range(3)]
+        ruta = self._escribir_spool(PID_TERMINADO, eventos)
+        error = APIError({"code": "PGRST202", "message": "Could not find the function"})
+        with mock.patch.object(escritor, "_insertar_lote", side_effect=error), mock.patch.object(
+            escritor.time, "sleep"
+        ) as dormir:
+            escritor._recuperar_spools()
+        dormir.assert_not_called()
+        self.assertFalse(ruta.exists())
+        descartados = self._descartados()
+        self.assertEqual([linea["evento"]["id"] for linea in descartados], [evento["id"] for evento in eventos])
+        self.assertIn("Could not find the function", descartados[0]["error"])
+
+    def test_reintenta_solo_errores_transitorios(self):
+        fallas = [httpx.ConnectError("sin red"), APIError({"code": 503, "message": "JSON could not be generated"}), None]
+        with mock.patch.object(escritor, "_insertar_lote", side_effect=fallas) as insertar, mock.patch.object(
+            escritor.time, "sleep"
+        ) as dormir:
+            escritor._enviar([_evento()])
+        self.assertEqual(insertar.call_count, 3)
+        self.assertEqual(dormir.call_count, 2)
+        self.assertEqual(self._descartados(), [])
+
+    def test_clasificacion_de_errores(self):
+        transitorios = [
+            httpx.ReadTimeout("lento"),
+            APIError({"code": "PGRST003", "message": "Timed out acquiring connection"}),
+            APIError({"code": "57014", "message": "canceling statement due to statement timeout"}),
+            APIError({"code": 502, "message": "JSON could not be generated"}),
+        ]
+        permanentes = [
+            APIError({"code": "PGRST202", "message": "Could not find the function"}),
+            APIError({"code": "22P02", "message": "invalid input syntax for type uuid"}),
+            APIError({"code": 400, "message": "JSON could not be generated"}),
+            ValueError("evento invalido"),
+        ]
+        for error in transitorios:
+            with self.subTest(error=error):
+                self.assertTrue(escritor._es_transitorio(error))
+        for error in permanentes:
+            with self.subTest(error=error):
+                self.assertFalse(escritor._es_transitorio(error))
@@ -6,5 +6,7 @@ from auditoria import views
 urlpatterns = [
     path("auditoria/", views.auditoria_listado_view, name="auditoria_listado"),
     path("auditoria/exportar/", views.auditoria_exportar_view, name="auditoria_exportar"),
+    path("auditoria/exportar/trabajo/", views.auditoria_exportar_trabajo_view, name="auditoria_exportar_trabajo"),
     path("auditoria/<uuid:evento_id>/", views.auditoria_detalle_view, name="auditoria_detalle"),
+    path("auditoria/<uuid:evento_id>/fila/", views.auditoria_fila_view, name="auditoria_fila"),
 ]
@@ -1,9 +1,12 @@
-﻿import csv
-import logging
+﻿import logging
 
 from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
 
+from aexfy_admin.exportacion import recorrer_por_cursor, respuesta_csv
+from aexfy_admin.trabajos_exportacion import encolar_exportacion, registrar_exportacion
+from aexfy_admin.paginacion import filtros_conteo, resumen_total
 from cuentas.decorators import permiso_requerido, sesion_requerida
 from auditoria.forms import AuditoriaFiltroForm
 from auditoria.services import listar_auditoria_admin, obtener_auditoria_admin
@@ -12,49 +15,56 @@ from auditoria.services import listar_auditoria_admin, obtener_auditoria_admin
 logger = logging.getLogger(__name__)
 
 
-# Exporta eventos de auditoria a CSV.
-@sesion_requerida
-@permiso_requerido("auditoria")
-def auditoria_exportar_view(request):
+# Columnas del CSV de auditoria; las comparten la descarga directa y la exportacion en segundo plano.
+ENCABEZADOS_EXPORTACION = ["Fecha", "Actor", "Accion", "Entidad", "Entidad ID", "Severidad"]
+
+
+# Filtros de exportacion; las fechas se guardan en ISO para poder encolarlas como JSON.
+def _filtros_exportacion(request) -> dict:
     form = AuditoriaFiltroForm(request.GET or None)
     filtros = {"busqueda": "", "severidad": "", "fecha_desde": None, "fecha_hasta": None}
     if form.is_valid():
         filtros.update(form.cleaned_data)
+    for campo in ("fecha_desde", "fecha_hasta"):
+        if hasattr(filtros[campo], "isoformat"):
+            filtros[campo] = filtros[campo].isoformat()
+    return filtros
 
-    eventos = []
-    try:
-        eventos = listar_auditoria_admin(filtros)
-    except Exception as exc:
-        logger.warning("Error al listar auditoria para exportar: %s", exc)
-
-    respuesta = HttpResponse(content_type="text/csv; charset=utf-8")
-    respuesta["Content-Disposition"] = "attachment; filename=auditoria.csv"
-    respuesta.write("﻿")
-
-    writer = csv.writer(respuesta, delimiter=';')
-    writer.writerow(
-        [
-            "Fecha",
-            "Actor",
-            "Accion",
-            "Entidad",
-            "Entidad ID",
-            "Severidad",
-        ]
+
+# Recorre todas las paginas por cursor (registrado_en, id).
+def _filas_exportacion(filtros: dict, roles_sesion: list[str]):
+    return recorrer_por_cursor(listar_auditoria_admin, filtros, "registrado_en")
+
+
+def _valores_exportacion(evento: dict) -> list:
+    return [
+        evento.get("registrado_en"),
+        evento.get("actor_email"),
+        evento.get("accion"),
+        evento.get("tabla_objetivo"),
+        evento.get("id_objetivo"),
+        evento.get("severidad"),
+    ]
+
+
+# Exporta eventos de auditoria a CSV.
+@sesion_requerida
+@permiso_requerido("auditoria")
+def auditoria_exportar_view(request):
+    roles_sesion = request.session.get("roles") or []
+    return respuesta_csv(
+        "auditoria.csv",
+        ENCABEZADOS_EXPORTACION,
+        _filas_exportacion(_filtros_exportacion(request), roles_sesion),
+        _valores_exportacion,
     )
-    for evento in eventos:
-        writer.writerow(
-            [
-                evento.get("created_at"),
-                evento.get("actor_email"),
-                evento.get("action"),
-                evento.get("entity"),
-                evento.get("entity_id"),
-                evento.get("severity"),
-            ]
-        )
 
-    return respuesta
+
+# Encola la exportacion en segundo plano (CSV comprimido) para listados muy grandes.
+@sesion_requerida
+@permiso_requerido("auditoria")
+def auditoria_exportar_trabajo_view(request):
+    return encolar_exportacion(request, "auditoria", _filtros_exportacion(request))
 
 
 # Listado de eventos de auditoria con filtros basicos.
@@ -62,7 +72,7 @@ def auditoria_exportar_view(request):
 @permiso_requerido("auditoria")
 def auditoria_listado_view(request):
     form = AuditoriaFiltroForm(request.GET or None)
-    filtros = {"busqueda": "", "severidad": "", "fecha_desde": None, "fecha_hasta": None}
+    filtros = {"busqueda": "", "severidad": "", "fecha_desde": None, "fecha_hasta": None, **filtros_conteo()}
     if form.is_valid():
         filtros.update(form.cleaned_data)
 
@@ -78,10 +88,27 @@ def auditoria_listado_view(request):
         {
             "form_filtros": form,
             "eventos": eventos,
+            **resumen_total(eventos),
         },
     )
 
 
+# Fila del listado para actualizaciones en vivo (realtime_sse.js); una sola RPC por evento.
+@sesion_requerida
+@permiso_requerido("auditoria")
+@never_cache
+def auditoria_fila_view(request, evento_id):
+    try:
+        evento = obtener_auditoria_admin(str(evento_id))
+    except Exception as exc:
+        logger.warning("Error al obtener fila de auditoria: %s", exc)
+        return HttpResponse(status=503)
+
+    if not evento:
+        return HttpResponse(status=204)
+    return render(request, "auditoria/_fila.html", {"evento": evento})
+
+
 # Detalle de un evento de auditoria (incluye masivos).
 @sesion_requerida
 @permiso_requerido("auditoria")
@@ -117,3 +144,6 @@ def auditoria_detalle_view(request, evento_id):
             "omitidos": omitidos,
         },
     )
+
+
+registrar_exportacion("auditoria", ENCABEZADOS_EXPORTACION, _filas_exportacion, _valores_exportacion)
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from cuentas.services import obtener_contexto_sesion_admin
+from integraciones.eventos import asegurar_observador, suscribir
+
+# Prefijo de llaves en la cache de Django (LocMem por defecto, una por worker).
+PREFIJO_CACHE = "auth_contexto:"
+# Tablas de public.realtime_events cuyo entidad_id es un usuario y cambian roles, zona o sesion.
+TABLAS_INVALIDAN = {"usuarios", "asignaciones_roles_usuarios"}
+
+
+def _clave(usuario_id: str) -> str:
+    return f"{PREFIJO_CACHE}{usuario_id}"
+
+
+# TTL corto; acota la desactualizacion si el observador de eventos no esta disponible.
+def _ttl() -> int:
+    return int(getattr(settings, "AUTH_CONTEXTO_TTL_SEGUNDOS", 30))
+
+
+# Carga roles, session_key, zona y estado con la RPC contexto_sesion_admin y los deja en cache.
+# Si el usuario ya no existe, estado queda en None y el decorador cierra la sesion.
+def cargar_contexto_sesion(usuario_id: str) -> dict:
+    registro = obtener_contexto_sesion_admin(usuario_id) or {}
+    contexto = {
+        "roles": registro.get("roles") or [],
+        "session_key": registro.get("session_key") or "",
+        "zona": registro.get("zona"),
+        "estado": registro.get("estado"),
+    }
+    cache.set(_clave(usuario_id), contexto, _ttl())
+    return contexto
+
+
+# Devuelve el contexto de autorizacion; en cache caliente no hace RPC.
+def obtener_contexto_sesion(usuario_id: str, session_key_actual: str | None) -> dict:
+    asegurar_observador()
+    contexto = cache.get(_clave(usuario_id))
+    # Una session_key distinta puede ser un login reciente en otro worker; se confirma en BD
+    # antes de cerrar la sesion o registrar una nueva.
+    if contexto is not None and contexto.get("session_key") == session_key_actual:
+        return contexto
+    return cargar_contexto_sesion(usuario_id)
+
+
+# Elimina el contexto cacheado de un usuario.
+def invalidar_contexto_sesion(usuario_id: str) -> None:
+    if usuario_id:
+        cache.delete(_clave(str(usuario_id)))
+
+
+# Invalida el contexto cuando public.realtime_events informa cambios del usuario o de sus roles.
+def _al_recibir_evento(evento: dict) -> None:
+    if evento.get("tabla") in TABLAS_INVALIDAN and evento.get("entidad_id"):
+        invalidar_contexto_sesion(str(evento["entidad_id"]))
+
+
+suscribir(_al_recibir_evento)
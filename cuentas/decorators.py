@@ -1,18 +1,20 @@
+import time
 from functools import wraps
 
 from django.shortcuts import redirect, render
 
+from cuentas.contexto import invalidar_contexto_sesion, obtener_contexto_sesion
 from cuentas.permisos import descripcion_permiso, tiene_permiso
 from cuentas.sesiones import limpiar_sesion
-from cuentas.services import obtener_sesion_usuario_admin, registrar_sesion_usuario_admin
-from empresas.services import obtener_roles_usuario_admin
-from usuarios.services import obtener_usuario_admin
+from cuentas.services import registrar_sesion_usuario_admin
+from integraciones.instrumentacion import registrar_segmento
 
 # Decorador para proteger vistas; verifica sesion de Supabase en Django.
 def sesion_requerida(vista_func):
     # wraps mantiene metadatos de la vista original.
     @wraps(vista_func)
     def _envuelto(request, *args, **kwargs):
+        inicio = time.perf_counter()
         # Si no hay token, envia al login definido en cuentas/urls.py.
         if not request.session.get("supabase_access_token"):
             return redirect("login")
@@ -20,19 +22,28 @@ def sesion_requerida(vista_func):
         if not request.session.session_key:
             request.session.save()
 
-        # Obtiene roles desde BD en cada request para evitar sesiones desactualizadas.
-        # Usa empresas/services.py -> RPC obtener_roles_usuario_admin en DB_Aexfy.db.
+        # Obtiene roles, session_key, zona y estado desde cuentas/contexto.py (una sola RPC).
+        # El contexto se cachea con TTL corto y se invalida con public.realtime_events,
+        # asi una revocacion de rol se refleja en segundos sin consultar BD en cada request.
         # Esto alimenta permisos (cuentas/permisos.py) y visibilidad (usuarios/views.py).
         usuario = request.session.get("usuario") or {}
         usuario_id = usuario.get("id")
-        roles = obtener_roles_usuario_admin(usuario_id) if usuario_id else []
+        contexto = (
+            obtener_contexto_sesion(str(usuario_id), request.session.session_key)
+            if usuario_id
+            else {}
+        )
+        # Rechaza usuarios desactivados o eliminados despues de iniciar sesion.
+        if usuario_id and contexto.get("estado") != "activo":
+            limpiar_sesion(request, limpiar_remota=False)
+            return redirect("login")
+        roles = contexto.get("roles") or []
         request.session["roles"] = roles
 
         # Valida sesion unica contra la session_key registrada en BD.
         if usuario_id:
             try:
-                sesion_db = obtener_sesion_usuario_admin(str(usuario_id)) or {}
-                session_key_db = sesion_db.get("session_key") or ""
+                session_key_db = contexto.get("session_key") or ""
                 if session_key_db and session_key_db != request.session.session_key:
                     limpiar_sesion(request, limpiar_remota=False)
                     return redirect("login")
@@ -43,6 +54,7 @@ def sesion_requerida(vista_func):
                         request.META.get("REMOTE_ADDR"),
                         request.META.get("HTTP_USER_AGENT"),
                     )
+                    invalidar_contexto_sesion(str(usuario_id))
             except Exception:
                 # Si falla la validacion remota, no bloquea el acceso.
                 pass
@@ -56,11 +68,10 @@ def sesion_requerida(vista_func):
         # Refresca zona en sesion si aun no existe.
         # Refresca zona desde BD si la sesion viene de versiones anteriores sin este dato.
         if "usuario" in request.session and not request.session["usuario"].get("zona") and not ignorar_zona:
-            usuario_id = (request.session.get("usuario") or {}).get("id")
-            if usuario_id:
-                usuario_db = obtener_usuario_admin(str(usuario_id))
-                if usuario_db:
-                    request.session["usuario"]["zona"] = usuario_db.get("zona")
+            if contexto.get("zona"):
+                request.session["usuario"]["zona"] = contexto.get("zona")
+        # Tiempo de validacion de sesion (tramo "sesion" en Server-Timing, aexfy_admin/metricas.py).
+        registrar_segmento("sesion", time.perf_counter() - inicio)
         # Ejecuta la vista original si la sesion existe.
         return vista_func(request, *args, **kwargs)
 
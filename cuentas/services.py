@@ -1,4 +1,5 @@
 from integraciones.supabase_client import (
+    get_supabase_auth_client,
     get_supabase_client,
     get_supabase_service_client,
 )
@@ -9,6 +10,14 @@ def _normalizar_data(respuesta):
     return data
 
 
+# Normaliza RPC que devuelven una fila; se usa directo o desde integraciones/lotes.py.
+def _normalizar_registro(respuesta):
+    data = _normalizar_data(respuesta)
+    if isinstance(data, list):
+        return data[0] if data else None
+    return data
+
+
 # Consulta el usuario en la vista publica de login; se usa desde cuentas/views.py.
 def obtener_usuario_por_rut(rut: str) -> dict | None:
     # Usa el cliente anonimo para consultar la vista publica en schema public.
@@ -31,8 +40,8 @@ def obtener_usuario_por_rut(rut: str) -> dict | None:
 
 # Inicia sesion en Supabase Auth con email y password; se usa desde cuentas/views.py.
 def iniciar_sesion_supabase(email: str, password: str):
-    # Usa el cliente anonimo para autenticar al usuario final.
-    cliente = get_supabase_client()
+    # Usa un cliente anonimo dedicado; el compartido no debe quedar con la sesion del usuario.
+    cliente = get_supabase_auth_client()
     return cliente.auth.sign_in_with_password({"email": email, "password": password})
 
 
@@ -54,13 +63,22 @@ def registrar_sesion_usuario_admin(
 
 
 # Obtiene la session_key registrada para validar sesion unica.
-def obtener_sesion_usuario_admin(usuario_id: str) -> dict | None:
+# Con lote se encola la RPC y se devuelve un resultado diferido (integraciones/lotes.py).
+def obtener_sesion_usuario_admin(usuario_id: str, lote=None) -> dict | None:
+    parametros = {"p_usuario_id": usuario_id}
+    if lote is not None:
+        return lote.rpc("obtener_sesion_usuario_admin", parametros, _normalizar_registro)
     cliente = get_supabase_service_client()
-    respuesta = cliente.rpc(
-        "obtener_sesion_usuario_admin",
-        {"p_usuario_id": usuario_id},
-    ).execute()
-    data = _normalizar_data(respuesta)
-    if isinstance(data, list):
-        return data[0] if data else None
-    return data
+    respuesta = cliente.rpc("obtener_sesion_usuario_admin", parametros).execute()
+    return _normalizar_registro(respuesta)
+
+
+# Obtiene roles, session_key, zona y estado del usuario en una sola consulta.
+# Reemplaza las tres lecturas separadas que hacia cuentas/decorators.py por request.
+def obtener_contexto_sesion_admin(usuario_id: str, lote=None) -> dict | None:
+    parametros = {"p_usuario_id": usuario_id}
+    if lote is not None:
+        return lote.rpc("contexto_sesion_admin", parametros, _normalizar_registro)
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("contexto_sesion_admin", parametros).execute()
+    return _normalizar_registro(respuesta)
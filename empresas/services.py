@@ -6,38 +6,85 @@ def _normalizar_data(respuesta):
     return getattr(respuesta, "data", None)
 
 
-# Lista empresas con filtros desde el backend.
-def listar_empresas_admin(filtros: dict):
-    cliente = get_supabase_service_client()
-    respuesta = cliente.rpc(
-        "listar_empresas_admin",
-        {
-            "p_busqueda": filtros.get("busqueda"),
-            "p_estado": filtros.get("estado"),
-            "p_plan": filtros.get("plan"),
-            "p_zona": filtros.get("zona"),
-            "p_limit": filtros.get("limit", 100),
-            "p_offset": filtros.get("offset", 0),
-        },
-    ).execute()
+# Normaliza listas de RPC; se usa directo o como normalizador de integraciones/lotes.py.
+def _normalizar_lista(respuesta):
     return _normalizar_data(respuesta) or []
 
 
-# Obtiene una empresa especifica por id.
-def obtener_empresa_admin(empresa_id: str):
-    cliente = get_supabase_service_client()
-    respuesta = cliente.rpc(
-        "obtener_empresa_admin",
-        {
-            "p_empresa_id": empresa_id,
-        },
-    ).execute()
+# Normaliza RPC que devuelven una fila; retorna el primer registro o None.
+def _normalizar_registro(respuesta):
     data = _normalizar_data(respuesta)
     if isinstance(data, list):
         return data[0] if data else None
     return data
 
 
+# Extrae la lista de roles desde la respuesta de obtener_roles_usuario_admin.
+def _extraer_roles(respuesta):
+    data = _normalizar_data(respuesta)
+    if isinstance(data, list) and data:
+        return data[0].get("roles") or []
+    if isinstance(data, dict):
+        return data.get("roles") or []
+    return []
+
+
+# Lista empresas con filtros y paginacion por cursor desde el backend.
+# Con lote se encola la RPC y se devuelve un resultado diferido (integraciones/lotes.py).
+def listar_empresas_admin(filtros: dict, lote=None):
+    parametros = {
+        "p_busqueda": filtros.get("busqueda"),
+        "p_estado": filtros.get("estado"),
+        "p_plan": filtros.get("plan"),
+        "p_zona": filtros.get("zona"),
+        "p_limit": filtros.get("limit", 100),
+        "p_offset": filtros.get("offset", 0),
+        # Cursor (creado_en, id) de aexfy_admin/paginacion.py; sin cursor se parte desde el inicio.
+        "p_cursor_creado_en": filtros.get("cursor_creado_en"),
+        "p_cursor_id": filtros.get("cursor_id"),
+        "p_antes": bool(filtros.get("antes")),
+        # Total opcional en la misma llamada (aexfy_admin/paginacion.py filtros_conteo).
+        "p_contar": bool(filtros.get("contar")),
+        "p_umbral_exacto": filtros.get("umbral_exacto"),
+    }
+    if lote is not None:
+        return lote.rpc("listar_empresas_admin", parametros, _normalizar_lista)
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("listar_empresas_admin", parametros).execute()
+    return _normalizar_lista(respuesta)
+
+
+# Obtiene una empresa especifica por id.
+def obtener_empresa_admin(empresa_id: str, lote=None):
+    parametros = {
+        "p_empresa_id": empresa_id,
+    }
+    if lote is not None:
+        return lote.rpc("obtener_empresa_admin", parametros, _normalizar_registro)
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("obtener_empresa_admin", parametros).execute()
+    return _normalizar_registro(respuesta)
+
+
+# Indexa por id (str) las filas de una RPC en bloque.
+def _indexar_por_id(respuesta):
+    return {str(fila.get("id")): fila for fila in _normalizar_lista(respuesta)}
+
+
+# Obtiene varias empresas en una sola RPC; devuelve un dict por id (str) con las encontradas.
+def obtener_empresas_admin(empresa_ids: list[str], lote=None) -> dict:
+    parametros = {
+        "p_empresa_ids": [str(empresa_id) for empresa_id in empresa_ids if empresa_id],
+    }
+    if lote is not None:
+        return lote.rpc("obtener_empresas_admin", parametros, _indexar_por_id)
+    if not parametros["p_empresa_ids"]:
+        return {}
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("obtener_empresas_admin", parametros).execute()
+    return _indexar_por_id(respuesta)
+
+
 # Crea una empresa usando la RPC publica.
 def crear_empresa_admin(datos: dict):
     cliente = get_supabase_service_client()
@@ -88,40 +135,39 @@ def eliminar_empresa_admin(empresa_id: str):
 
 
 # Lista segmentos industriales para poblar selects en el formulario.
-def listar_segmentos_admin():
+def listar_segmentos_admin(lote=None):
+    if lote is not None:
+        return lote.rpc("listar_segmentos_admin", {}, _normalizar_lista)
     cliente = get_supabase_service_client()
     respuesta = cliente.rpc(
         "listar_segmentos_admin",
         {},
     ).execute()
-    return _normalizar_data(respuesta) or []
+    return _normalizar_lista(respuesta)
 
 
 # Lista regiones de Chile para poblar selects en el formulario.
-def listar_regiones_admin():
+def listar_regiones_admin(lote=None):
+    if lote is not None:
+        return lote.rpc("listar_regiones_admin", {}, _normalizar_lista)
     cliente = get_supabase_service_client()
     respuesta = cliente.rpc(
         "listar_regiones_admin",
         {},
     ).execute()
-    return _normalizar_data(respuesta) or []
+    return _normalizar_lista(respuesta)
 
 
 # Obtiene roles del usuario actual para validar autorizacion.
-def obtener_roles_usuario_admin(usuario_id: str):
+def obtener_roles_usuario_admin(usuario_id: str, lote=None):
+    parametros = {
+        "p_usuario_id": usuario_id,
+    }
+    if lote is not None:
+        return lote.rpc("obtener_roles_usuario_admin", parametros, _extraer_roles)
     cliente = get_supabase_service_client()
-    respuesta = cliente.rpc(
-        "obtener_roles_usuario_admin",
-        {
-            "p_usuario_id": usuario_id,
-        },
-    ).execute()
-    data = _normalizar_data(respuesta)
-    if isinstance(data, list) and data:
-        return data[0].get("roles") or []
-    if isinstance(data, dict):
-        return data.get("roles") or []
-    return []
+    respuesta = cliente.rpc("obtener_roles_usuario_admin", parametros).execute()
+    return _extraer_roles(respuesta)
 
 
 # Crea una solicitud de empresa cuando se requiere autorizacion.
@@ -2,7 +2,8 @@
 // Usa el modal global definido en aexfy_admin/static/aexfy_admin/js/base.js.
 (() => {
   const selectorTodos = document.getElementById("seleccionar_todos");
-  const checkboxes = document.querySelectorAll("input[name='empresas_seleccionadas']");
+  // Se consulta en cada uso porque realtime_sse.js reemplaza filas del listado.
+  const checkboxes = () => document.querySelectorAll("input[name='empresas_seleccionadas']");
   const accion = document.getElementById("accion_masiva");
   const valorEstado = document.getElementById("valor_estado");
   const valorPlan = document.getElementById("valor_plan");
@@ -12,7 +13,7 @@
 
   if (selectorTodos) {
     selectorTodos.addEventListener("change", () => {
-      checkboxes.forEach((checkbox) => {
+      checkboxes().forEach((checkbox) => {
         checkbox.checked = selectorTodos.checked;
       });
     });
@@ -9,5 +9,7 @@ urlpatterns = [
     path("empresas/creado/", views.empresas_creado_view, name="empresas_creado"),
     path("empresas/<uuid:empresa_id>/editar/", views.empresas_editar_view, name="empresas_editar"),
     path("empresas/<uuid:empresa_id>/eliminar/", views.empresas_eliminar_view, name="empresas_eliminar"),
+    path("empresas/<uuid:empresa_id>/fila/", views.empresas_fila_view, name="empresas_fila"),
     path("empresas/exportar/", views.empresas_exportar_view, name="empresas_exportar"),
+    path("empresas/exportar/trabajo/", views.empresas_exportar_trabajo_view, name="empresas_exportar_trabajo"),
 ]
@@ -1,10 +1,13 @@
-import csv
 import logging
 
 from django.http import HttpResponse
 from django.views.decorators.cache import never_cache
 from django.shortcuts import redirect, render
 
+from aexfy_admin.catalogos import obtener_catalogos
+from aexfy_admin.exportacion import recorrer_por_cursor, respuesta_csv
+from aexfy_admin.trabajos_exportacion import encolar_exportacion, registrar_exportacion
+from aexfy_admin.paginacion import filtros_pagina, resolver_pagina
 from cuentas.decorators import permiso_requerido, sesion_requerida
 from cuentas.permisos import (
     puede_accion_masiva_empresas,
@@ -23,9 +26,8 @@ from empresas.services import (
     crear_solicitud_empresa_admin,
     eliminar_empresa_admin,
     listar_empresas_admin,
-    listar_regiones_admin,
-    listar_segmentos_admin,
     obtener_empresa_admin,
+    obtener_empresas_admin,
     obtener_roles_usuario_admin,
 )
 
@@ -108,8 +110,9 @@ def empresas_listado_view(request):
             try:
                 detalles = []
                 seleccionados_validos = []
+                empresas_por_id = obtener_empresas_admin(seleccionados)
                 for empresa_id in seleccionados:
-                    empresa = obtener_empresa_admin(str(empresa_id))
+                    empresa = empresas_por_id.get(str(empresa_id))
                     if not empresa:
                         continue
                     detalles.append(_resumen_empresa_auditoria(empresa))
@@ -152,15 +155,9 @@ def empresas_listado_view(request):
     if form_filtros.is_valid():
         filtros.update(form_filtros.cleaned_data)
 
-    # Paginacion simple para reducir carga.
-    per_page = 25
-    try:
-        page = int(request.GET.get("page", 1) or 1)
-    except ValueError:
-        page = 1
-    page = max(page, 1)
-    filtros["limit"] = per_page
-    filtros["offset"] = (page - 1) * per_page
+    # Paginacion por cursor (creado_en, id); la pagina 400 cuesta lo mismo que la 1.
+    page, filtros_cursor = filtros_pagina(request)
+    filtros.update(filtros_cursor)
 
     # Limita el listado a la zona del usuario si su rol lo exige.
     roles_sesion = request.session.get("roles") or []
@@ -170,10 +167,10 @@ def empresas_listado_view(request):
             filtros["zona"] = zona_sesion
             aplicar_zona_formulario(form_filtros, zona_sesion)
 
-    empresas = listar_empresas_admin(filtros)
-    has_next = len(empresas) >= per_page
+    empresas, paginacion = resolver_pagina(listar_empresas_admin(filtros), page, filtros)
     qs_base = request.GET.copy()
     qs_base.pop("page", None)
+    qs_base.pop("cursor", None)
 
     return render(
         request,
@@ -182,25 +179,47 @@ def empresas_listado_view(request):
             "form_filtros": form_filtros,
             "empresas": empresas,
             "mensaje": mensaje,
-            "page": page,
-            "has_next": has_next,
+            **paginacion,
             "qs_base": qs_base,
         },
     )
 
 
-# Exporta empresas a CSV respetando filtros y restricciones de zona.
+# Fila del listado para actualizaciones en vivo (realtime_sse.js); una sola RPC por evento.
+# Responde 204 si la empresa ya no existe o esta fuera de la zona de la sesion.
 @sesion_requerida
 @permiso_requerido("empresas")
-def empresas_exportar_view(request):
+@never_cache
+def empresas_fila_view(request, empresa_id):
+    try:
+        empresa = obtener_empresa_admin(str(empresa_id))
+    except Exception as exc:
+        logger.warning("Error al obtener fila de empresa: %s", exc)
+        return HttpResponse(status=503)
+
+    if not empresa:
+        return HttpResponse(status=204)
+    roles_sesion = request.session.get("roles") or []
+    if requiere_restriccion_zona(roles_sesion):
+        zona_sesion = obtener_zona_sesion(request.session)
+        if zona_sesion and empresa.get("zona") != zona_sesion:
+            return HttpResponse(status=204)
+
+    return render(request, "empresas/_fila.html", {"empresa": empresa})
+
+
+# Columnas del CSV de empresas; las comparten la descarga directa y la exportacion en segundo plano.
+ENCABEZADOS_EXPORTACION = ["RUT", "Codigo", "Razon social", "Nombre fantasia", "Email", "Telefono", "Estado", "Plan", "Zona"]
+
+
+# Filtros de exportacion: los mismos del listado mas la zona de la sesion si su rol la exige.
+def _filtros_exportacion(request) -> dict:
     form_filtros = EmpresasFiltroForm(request.GET or None)
     filtros = {
         "busqueda": "",
         "estado": "",
         "plan": "",
         "zona": "",
-        "limit": 5000,
-        "offset": 0,
     }
     if form_filtros.is_valid():
         filtros.update(form_filtros.cleaned_data)
@@ -211,51 +230,56 @@ def empresas_exportar_view(request):
         zona_sesion = obtener_zona_sesion(request.session)
         if zona_sesion:
             filtros["zona"] = zona_sesion
+    return filtros
 
-    empresas = listar_empresas_admin(filtros)
-
-    respuesta = HttpResponse(content_type="text/csv; charset=utf-8")
-    respuesta["Content-Disposition"] = "attachment; filename=empresas.csv"
-    respuesta.write("\ufeff")
-
-    writer = csv.writer(respuesta, delimiter=';')
-    writer.writerow(
-        [
-            "RUT",
-            "Codigo",
-            "Razon social",
-            "Nombre fantasia",
-            "Email",
-            "Telefono",
-            "Estado",
-            "Plan",
-            "Zona",
-        ]
+
+# Recorre todas las paginas por cursor; la zona ya viene en los filtros.
+def _filas_exportacion(filtros: dict, roles_sesion: list[str]):
+    return recorrer_por_cursor(listar_empresas_admin, filtros, "creado_en")
+
+
+def _valores_exportacion(empresa: dict) -> list:
+    return [
+        empresa.get("rut"),
+        empresa.get("company_code"),
+        empresa.get("razon_social"),
+        empresa.get("nombre_fantasia"),
+        empresa.get("email"),
+        empresa.get("telefono"),
+        empresa.get("estado"),
+        empresa.get("plan"),
+        empresa.get("zona"),
+    ]
+
+
+# Exporta empresas a CSV respetando filtros y restricciones de zona.
+@sesion_requerida
+@permiso_requerido("empresas")
+def empresas_exportar_view(request):
+    roles_sesion = request.session.get("roles") or []
+    return respuesta_csv(
+        "empresas.csv",
+        ENCABEZADOS_EXPORTACION,
+        _filas_exportacion(_filtros_exportacion(request), roles_sesion),
+        _valores_exportacion,
     )
-    for empresa in empresas:
-        writer.writerow(
-            [
-                empresa.get("rut"),
-                empresa.get("company_code"),
-                empresa.get("razon_social"),
-                empresa.get("nombre_fantasia"),
-                empresa.get("email"),
-                empresa.get("telefono"),
-                empresa.get("estado"),
-                empresa.get("plan"),
-                empresa.get("zona"),
-            ]
-        )
 
-    return respuesta
+
+# Encola la exportacion en segundo plano (CSV comprimido) para listados muy grandes.
+@sesion_requerida
+@permiso_requerido("empresas")
+def empresas_exportar_trabajo_view(request):
+    return encolar_exportacion(request, "empresas", _filtros_exportacion(request))
 
 
 # Crea una nueva empresa con codigo interno automatico.
 @sesion_requerida
 @permiso_requerido("empresas")
 def empresas_crear_view(request):
-    segmentos = listar_segmentos_admin()
-    regiones = listar_regiones_admin()
+    # Catalogos compartidos (aexfy_admin/catalogos.py); en cache caliente no hay RPC.
+    catalogos = obtener_catalogos("segmentos", "regiones")
+    segmentos = catalogos["segmentos"]
+    regiones = catalogos["regiones"]
     regiones_map = {str(r.get("id")): r.get("nombre") for r in regiones}
 
     if request.method == "POST":
@@ -457,8 +481,10 @@ def empresas_editar_view(request, empresa_id):
             {"permiso": "Editar empresas", "roles": roles_sesion},
         )
 
-    segmentos = listar_segmentos_admin()
-    regiones = listar_regiones_admin()
+    # Catalogos compartidos (aexfy_admin/catalogos.py); en cache caliente no hay RPC.
+    catalogos = obtener_catalogos("segmentos", "regiones")
+    segmentos = catalogos["segmentos"]
+    regiones = catalogos["regiones"]
     regiones_map = {str(r.get("id")): r.get("nombre") for r in regiones}
 
     if request.method == "POST":
@@ -580,3 +606,6 @@ def empresas_eliminar_view(request, empresa_id):
         request.session["empresa_mensaje"] = "No se pudo eliminar la empresa."
 
     return redirect("empresas_listado")
+
+
+registrar_exportacion("empresas", ENCABEZADOS_EXPORTACION, _filas_exportacion, _valores_exportacion)
@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from integraciones.supabase_client import get_supabase_service_client
+
+try:
+    import psycopg
+except ImportError:
+    # psycopg es opcional; sin el, el observador siempre usa polling via PostgREST.
+    psycopg = None
+
+# Logger para fallas del observador de eventos en tiempo real.
+logger = logging.getLogger(__name__)
+
+# Maximo de eventos leidos por consulta; si se llena, se vuelve a leer sin esperar.
+LIMITE_EVENTOS = 500
+# Canal de pg_notify usado por public.emit_realtime_event() en DB_Aexfy.db.
+CANAL_NOTIFY = "aexfy_realtime"
+
+# Callbacks registrados; reciben dicts con id, tabla, accion y entidad_id de public.realtime_events.
+_suscriptores = []
+_lock = threading.Lock()
+# Estado del observador del proceso actual; se reinicia tras fork.
+_estado = {
+    "pid": None,
+    "modo": None,
+    "hilo": None,
+    "detener": None,
+    "ultimo_id": None,
+    "eventos": 0,
+    "errores": 0,
+    "ultimo_error": None,
+    "ultima_lectura_en": None,
+}
+
+
+# Registra un callback para los eventos nuevos; es idempotente.
+def suscribir(callback) -> None:
+    with _lock:
+        if callback not in _suscriptores:
+            _suscriptores.append(callback)
+
+
+# Quita un callback registrado con suscribir().
+def desuscribir(callback) -> None:
+    with _lock:
+        if callback in _suscriptores:
+            _suscriptores.remove(callback)
+
+
+# Intervalo de lectura en segundos; define la latencia del cache de auth y del SSE (aexfy_admin/realtime.py).
+def _intervalo() -> float:
+    return float(getattr(settings, "REALTIME_POLL_SEGUNDOS", 2))
+
+
+# URL de conexion directa a Postgres para LISTEN; vacia mantiene el modo polling.
+def _url_listen() -> str:
+    return getattr(settings, "REALTIME_DATABASE_URL", "") or ""
+
+
+# Elige el transporte: LISTEN/NOTIFY con conexion directa o polling de realtime_events.
+def _modo() -> str:
+    if not _url_listen():
+        return "polling"
+    if psycopg is None:
+        logger.warning("REALTIME_DATABASE_URL definido pero psycopg no esta instalado; se usa polling.")
+        return "polling"
+    return "listen"
+
+
+# Obtiene el ultimo id existente para no reprocesar el historial al iniciar.
+def _leer_ultimo_id(cliente) -> int:
+    respuesta = (
+        cliente.schema("public")
+        .table("realtime_events")
+        .select("id")
+        .order("id", desc=True)
+        .limit(1)
+        .execute()
+    )
+    if respuesta.data:
+        return int(respuesta.data[0].get("id", 0))
+    return 0
+
+
+# Lee eventos posteriores a ultimo_id en orden ascendente.
+def _leer_eventos(cliente, ultimo_id: int) -> list[dict]:
+    respuesta = (
+        cliente.schema("public")
+        .table("realtime_events")
+        .select("id, tabla, accion, entidad_id")
+        .gt("id", ultimo_id)
+        .order("id")
+        .limit(LIMITE_EVENTOS)
+        .execute()
+    )
+    return respuesta.data or []
+
+
+# Entrega un evento a cada suscriptor; un callback con error no detiene a los demas.
+def _despachar(evento: dict) -> None:
+    with _lock:
+        suscriptores = list(_suscriptores)
+    for callback in suscriptores:
+        try:
+            callback(evento)
+        except Exception:
+            logger.exception("Error en suscriptor de eventos realtime.")
+
+
+# Actualiza el ultimo id visto y entrega el evento; el id nunca retrocede.
+def _procesar(evento: dict) -> None:
+    evento_id = int(evento.get("id") or 0)
+    if _estado["ultimo_id"] is None or evento_id > _estado["ultimo_id"]:
+        _estado["ultimo_id"] = evento_id
+    _estado["eventos"] += 1
+    _despachar(evento)
+
+
+# Contabiliza fallas de lectura o conexion; el hilo sigue corriendo y reintenta.
+def _registrar_error(exc: Exception) -> None:
+    _estado["errores"] += 1
+    _estado["ultimo_error"] = str(exc)
+    logger.warning("Error al leer realtime_events: %s", exc)
+
+
+# Bucle de polling; una sola consulta por intervalo sin importar cuantos suscriptores existan.
+def _bucle_polling(detener: threading.Event) -> None:
+    while not detener.is_set():
+        lleno = False
+        try:
+            cliente = get_supabase_service_client()
+            if _estado["ultimo_id"] is None:
+                _estado["ultimo_id"] = _leer_ultimo_id(cliente)
+            else:
+                eventos = _leer_eventos(cliente, _estado["ultimo_id"])
+                for evento in eventos:
+                    _procesar(evento)
+                lleno = len(eventos) >= LIMITE_EVENTOS
+            _estado["ultima_lectura_en"] = time.time()
+        except Exception as exc:
+            _registrar_error(exc)
+        if not lleno:
+            detener.wait(_intervalo())
+
+
+# Lee por SQL directo los eventos que no llegaron por NOTIFY (arranque o reconexion).
+def _ponerse_al_dia(conexion) -> None:
+    if _estado["ultimo_id"] is None:
+        fila = conexion.execute("select coalesce(max(id), 0) from public.realtime_events").fetchone()
+        _estado["ultimo_id"] = int(fila[0])
+        return
+    while True:
+        filas = conexion.execute(
+            "select id, tabla, accion, entidad_id::text "
+            "from public.realtime_events where id > %s order by id limit %s",
+            (_estado["ultimo_id"], LIMITE_EVENTOS),
+        ).fetchall()
+        for evento_id, tabla, accion, entidad_id in filas:
+            _procesar({"id": evento_id, "tabla": tabla, "accion": accion, "entidad_id": entidad_id})
+        if len(filas) < LIMITE_EVENTOS:
+            return
+
+
+# Bucle LISTEN; los avisos llegan al confirmar cada transaccion, sin consultas periodicas.
+# Un aviso repetido durante la puesta al dia se entrega dos veces; los suscriptores son idempotentes.
+def _bucle_listen(detener: threading.Event) -> None:
+    while not detener.is_set():
+        try:
+            with psycopg.connect(_url_listen(), autocommit=True, connect_timeout=10) as conexion:
+                conexion.execute(f"listen {CANAL_NOTIFY}")
+                _ponerse_al_dia(conexion)
+                while not detener.is_set():
+                    # El timeout permite revisar detener sin perder avisos (psycopg >= 3.2).
+                    for aviso in conexion.notifies(timeout=_intervalo()):
+                        try:
+                            _procesar(json.loads(aviso.payload))
+                        except ValueError:
+                            logger.warning("Aviso invalido en %s: %s", CANAL_NOTIFY, aviso.payload)
+                    _estado["ultima_lectura_en"] = time.time()
+        except Exception as exc:
+            _registrar_error(exc)
+            detener.wait(_intervalo())
+
+
+# Punto de entrada del hilo observador segun el modo configurado.
+def _bucle(detener: threading.Event) -> None:
+    if _estado["modo"] == "listen":
+        _bucle_listen(detener)
+    else:
+        _bucle_polling(detener)
+
+
+# Inicia el hilo observador del proceso si aun no corre (una vez por worker).
+def asegurar_observador() -> None:
+    pid = os.getpid()
+    hilo = _estado["hilo"]
+    if _estado["pid"] == pid and hilo is not None and hilo.is_alive():
+        return
+    with _lock:
+        hilo = _estado["hilo"]
+        if _estado["pid"] == pid and hilo is not None and hilo.is_alive():
+            return
+        # Tras un fork el hilo del padre no existe en el hijo; se parte desde cero.
+        detener = threading.Event()
+        _estado.update(
+            {
+                "pid": pid,
+                "modo": _modo(),
+                "detener": detener,
+                "ultimo_id": None,
+                "hilo": threading.Thread(
+                    target=_bucle,
+                    args=(detener,),
+                    name="aexfy-realtime-observador",
+                    daemon=True,
+                ),
+            }
+        )
+        _estado["hilo"].start()
+
+
+# Detiene el observador del proceso actual; se usa en comandos y pruebas manuales.
+def detener_observador() -> None:
+    detener = _estado["detener"]
+    if detener is not None:
+        detener.set()
+
+
+# Estado del observador para monitoreo (ver aexfy_admin/salud.py).
+def estado_observador() -> dict:
+    hilo = _estado["hilo"]
+    return {
+        "activo": bool(hilo is not None and hilo.is_alive() and _estado["pid"] == os.getpid()),
+        "modo": _estado["modo"],
+        "ultimo_id": _estado["ultimo_id"],
+        "eventos": _estado["eventos"],
+        "errores": _estado["errores"],
+        "ultimo_error": _estado["ultimo_error"],
+        "ultima_lectura_en": _estado["ultima_lectura_en"],
+        "suscriptores": len(_suscriptores),
+    }
@@ -0,0 +1,165 @@
+import contextvars
+import statistics
+import threading
+import time
+
+import httpx
+
+# Limites superiores (ms) de los buckets de latencia; el ultimo bucket acumula lo que los supera.
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Mediciones del request en curso; la abre y la cierra el middleware de aexfy_admin/metricas.py.
+# Fuera de un request (hilos de eventos, auditoria o exportaciones) solo se actualizan los histogramas.
+_medicion = contextvars.ContextVar("aexfy_medicion", default=None)
+_lock = threading.Lock()
+# Histogramas del proceso por nombre de llamada (rpc.<funcion>, tabla.<tabla>, auth, http).
+_histogramas = {}
+
+
+# Nombre de la llamada segun la ruta de Supabase; las RPC llevan el nombre de la funcion.
+def _nombre_llamada(request: httpx.Request) -> str:
+    ruta = request.url.path
+    if "/rest/v1/rpc/" in ruta:
+        return f"rpc.{ruta.rsplit('/', 1)[-1]}"
+    if "/rest/v1/" in ruta:
+        return f"tabla.{ruta.split('/rest/v1/', 1)[1].split('/', 1)[0]}"
+    if "/auth/v1/" in ruta:
+        return "auth"
+    return "http"
+
+
+# Abre la medicion de un request; devuelve el token para cerrarla con terminar_medicion.
+def iniciar_medicion():
+    return _medicion.set([])
+
+
+# Cierra la medicion y devuelve las entradas registradas durante el request.
+def terminar_medicion(token) -> list[dict]:
+    mediciones = _medicion.get() or []
+    _medicion.reset(token)
+    return mediciones
+
+
+# Registra un tramo del request que no es una llamada HTTP (sesion, plantilla).
+def registrar_segmento(nombre: str, segundos: float) -> None:
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.append({"nombre": nombre, "ms": segundos * 1000, "tipo": "segmento"})
+
+
+# Registra una llamada a Supabase en el histograma del proceso y en la medicion del request.
+def registrar_llamada(nombre: str, segundos: float, bytes_enviados: int, bytes_recibidos: int, error: str | None = None) -> None:
+    ms = segundos * 1000
+    with _lock:
+        histograma = _histogramas.get(nombre)
+        if histograma is None:
+            histograma = _histogramas[nombre] = {
+                "llamadas": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "bytes_enviados": 0,
+                "bytes_recibidos": 0,
+                "errores": {},
+                "buckets": [0] * (len(LIMITES_MS) + 1),
+            }
+        histograma["llamadas"] += 1
+        histograma["total_ms"] += ms
+        histograma["max_ms"] = max(histograma["max_ms"], ms)
+        histograma["bytes_enviados"] += bytes_enviados
+        histograma["bytes_recibidos"] += bytes_recibidos
+        if error:
+            histograma["errores"][error] = histograma["errores"].get(error, 0) + 1
+        indice = next((i for i, limite in enumerate(LIMITES_MS) if ms <= limite), len(LIMITES_MS))
+        histograma["buckets"][indice] += 1
+
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.append(
+            {
+                "nombre": nombre,
+                "ms": ms,
+                "tipo": "llamada",
+                "bytes_enviados": bytes_enviados,
+                "bytes_recibidos": bytes_recibidos,
+                "error": error,
+            }
+        )
+
+
+# Copia de los histogramas del proceso para el endpoint de metricas.
+def histogramas_llamadas() -> dict:
+    with _lock:
+        return {
+            nombre: {
+                **histograma,
+                "errores": dict(histograma["errores"]),
+                "buckets": dict(zip([*map(str, LIMITES_MS), "+inf"], histograma["buckets"])),
+                "promedio_ms": round(histograma["total_ms"] / histograma["llamadas"], 2),
+            }
+            for nombre, histograma in _histogramas.items()
+        }
+
+
+# Percentiles p50/p95/p99 de una lista de duraciones en ms (al menos dos muestras).
+# Los usan los comandos bench y bench_realtime para reportar y comparar corridas.
+def percentiles(muestras: list[float]) -> dict:
+    cortes = statistics.quantiles(muestras, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cortes[49], 2),
+        "p95_ms": round(cortes[94], 2),
+        "p99_ms": round(cortes[98], 2),
+    }
+
+
+# Cuerpo de la respuesta que cuenta bytes; la llamada se registra al terminar de leerlo.
+class _FlujoMedido(httpx.SyncByteStream):
+    def __init__(self, flujo, al_cerrar):
+        self._flujo = flujo
+        self._al_cerrar = al_cerrar
+        self._bytes = 0
+        self._cerrado = False
+
+    def __iter__(self):
+        for trozo in self._flujo:
+            self._bytes += len(trozo)
+            yield trozo
+
+    def close(self) -> None:
+        try:
+            self._flujo.close()
+        finally:
+            if not self._cerrado:
+                self._cerrado = True
+                self._al_cerrar(self._bytes)
+
+
+# Transporte httpx que mide cada llamada del cliente Supabase (integraciones/supabase_client.py).
+# La duracion cubre envio, espera y lectura completa del cuerpo; el error es la clase de la
+# excepcion o HTTP<codigo> cuando PostgREST responde con error.
+class TransporteMedido(httpx.BaseTransport):
+    def __init__(self, transporte: httpx.BaseTransport):
+        self._transporte = transporte
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        nombre = _nombre_llamada(request)
+        enviados = int(request.headers.get("content-length") or 0)
+        inicio = time.perf_counter()
+        try:
+            respuesta = self._transporte.handle_request(request)
+        except Exception as exc:
+            registrar_llamada(nombre, time.perf_counter() - inicio, enviados, 0, type(exc).__name__)
+            raise
+        error = f"HTTP{respuesta.status_code}" if respuesta.status_code >= 400 else None
+
+        def _al_cerrar(recibidos: int) -> None:
+            registrar_llamada(nombre, time.perf_counter() - inicio, enviados, recibidos, error)
+
+        if respuesta.is_closed:
+            # Cuerpo ya leido por el transporte; no habra lectura ni cierre posterior.
+            _al_cerrar(len(respuesta.content))
+        else:
+            respuesta.stream = _FlujoMedido(respuesta.stream, _al_cerrar)
+        return respuesta
+
+    def close(self) -> None:
+        self._transporte.close()
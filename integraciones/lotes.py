@@ -0,0 +1,120 @@
+from integraciones.supabase_client import get_supabase_service_client
+
+# Codigo PostgREST cuando la funcion no existe (DB_Aexfy.db aun sin ejecutar_lote_admin).
+_CODIGO_FUNCION_INEXISTENTE = "PGRST202"
+
+
+# Error de una llamada individual dentro del lote; conserva el mensaje de la RPC.
+class ErrorLoteRPC(Exception):
+    pass
+
+
+# Respuesta minima con atributo data; imita la respuesta de postgrest para reutilizar normalizadores.
+class _RespuestaLote:
+    def __init__(self, data):
+        self.data = data
+
+
+# Resultado diferido de una RPC encolada; se resuelve al ejecutar el lote.
+class ResultadoDiferido:
+    def __init__(self, lote, normalizar):
+        self._lote = lote
+        self._normalizar = normalizar
+        self._listo = False
+        self._valor = None
+        self._error = None
+
+    # Indica si el lote ya fue enviado y este resultado tiene valor o error.
+    @property
+    def listo(self) -> bool:
+        return self._listo
+
+    # Devuelve el valor normalizado; ejecuta el lote si aun esta pendiente.
+    def valor(self):
+        if not self._listo:
+            self._lote.ejecutar()
+        if self._error is not None:
+            raise self._error
+        return self._valor
+
+    def _resolver(self, data):
+        try:
+            self._valor = self._normalizar(_RespuestaLote(data)) if self._normalizar else data
+        except Exception as exc:
+            self._error = exc
+        self._listo = True
+
+    def _fallar(self, error: Exception):
+        self._error = error
+        self._listo = True
+
+
+# Agrupa RPCs de lectura independientes y las envia en una sola llamada a public.ejecutar_lote_admin.
+# Uso: lote = LoteRPC(); r = obtener_usuario_admin(id, lote=lote); lote.ejecutar(); r.valor()
+class LoteRPC:
+    def __init__(self, cliente=None):
+        self._cliente = cliente
+        self._pendientes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.ejecutar()
+        return False
+
+    # Encola una RPC y devuelve su resultado diferido.
+    def rpc(self, nombre: str, parametros: dict | None = None, normalizar=None) -> ResultadoDiferido:
+        resultado = ResultadoDiferido(self, normalizar)
+        self._pendientes.append((nombre, parametros or {}, resultado))
+        return resultado
+
+    # Envia las RPC pendientes; con una sola llamada se evita el despachador.
+    def ejecutar(self) -> None:
+        pendientes, self._pendientes = self._pendientes, []
+        if not pendientes:
+            return
+        cliente = self._cliente or get_supabase_service_client()
+        if len(pendientes) == 1:
+            self._ejecutar_secuencial(cliente, pendientes)
+            return
+
+        try:
+            respuesta = cliente.rpc(
+                "ejecutar_lote_admin",
+                {
+                    "p_llamadas": [
+                        {"funcion": nombre, "parametros": parametros}
+                        for nombre, parametros, _ in pendientes
+                    ]
+                },
+            ).execute()
+        except Exception as exc:
+            # Si la BD aun no tiene el despachador, se mantiene el comportamiento anterior.
+            if getattr(exc, "code", None) == _CODIGO_FUNCION_INEXISTENTE:
+                self._ejecutar_secuencial(cliente, pendientes)
+                return
+            for _, _, resultado in pendientes:
+                resultado._fallar(exc)
+            return
+
+        salidas = getattr(respuesta, "data", None) or []
+        for indice, (nombre, _, resultado) in enumerate(pendientes):
+            salida = salidas[indice] if indice < len(salidas) else None
+            if not isinstance(salida, dict):
+                resultado._fallar(ErrorLoteRPC(f"{nombre}: sin respuesta en el lote."))
+            elif not salida.get("ok"):
+                resultado._fallar(ErrorLoteRPC(f"{nombre}: {salida.get('error')}"))
+            else:
+                resultado._resolver(salida.get("data"))
+
+    @staticmethod
+    def _ejecutar_secuencial(cliente, pendientes):
+        for nombre, parametros, resultado in pendientes:
+            try:
+                respuesta = cliente.rpc(nombre, parametros).execute()
+            except Exception as exc:
+                resultado._fallar(exc)
+                continue
+            resultado._resolver(getattr(respuesta, "data", None))
@@ -0,0 +1 @@
+# Comandos de administracion del app integraciones (manage.py).
@@ -0,0 +1 @@
+# Comandos disponibles: purgar_realtime.
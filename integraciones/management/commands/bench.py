@@ -0,0 +1,327 @@
+import json
+import logging
+import secrets
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from auditoria.escritor import estado_escritor_auditoria
+from integraciones.instrumentacion import histogramas_llamadas, percentiles
+from integraciones.supabase_falso import RUT_OWNER, obtener_cliente_falso, reiniciar_cliente_falso
+
+# Llamadas de hilos en segundo plano (observador realtime, escritor de auditoria); no se
+# atribuyen al request medido aunque ocurran mientras corre.
+LLAMADAS_FONDO = {"tabla.realtime_events", "rpc.registrar_eventos_auditoria_lote"}
+# Filas seleccionadas en las acciones masivas, como una pagina marcada completa.
+SELECCION_MASIVA = 50
+# Script de la terminal; el cliente falso solo resuelve select * from aexfy.<tabla>.
+SQL_TERMINAL = "select * from aexfy.usuarios limit 100"
+# Diferencia minima (ms) para considerar regresion de latencia; evita fallar por ruido.
+PISO_RUIDO_MS = 2.0
+# Espera maxima para que el escritor de auditoria vacie su cola al cambiar de dataset.
+SEGUNDOS_ESPERA_AUDITORIA = 30
+
+
+# Total de llamadas a Supabase registradas en el proceso, sin las de hilos de fondo.
+def _total_llamadas() -> int:
+    return sum(
+        histograma["llamadas"]
+        for nombre, histograma in histogramas_llamadas().items()
+        if nombre not in LLAMADAS_FONDO
+    )
+
+
+# Lee el cuerpo completo; las exportaciones CSV son streaming y trabajan al iterarse.
+def _consumir(response) -> int:
+    if response.streaming:
+        tamano = sum(len(trozo) for trozo in response.streaming_content)
+    else:
+        tamano = len(response.content)
+    response.close()
+    return tamano
+
+
+# Ejecuta las vistas de administracion contra el cliente falso con un dataset sembrado.
+# Cada escenario es un request completo por el test client de Django (middleware, sesion,
+# vista y plantilla); el login deja la sesion que usan los escenarios siguientes.
+class _Banco:
+    def __init__(self):
+        self.cliente = None
+        base = obtener_cliente_falso().base
+        with base.lock:
+            self.usuario_ids = [
+                usuario_id
+                for usuario_id, usuario in sorted(base.usuarios.items())
+                if usuario["rut"] != RUT_OWNER
+            ][:SELECCION_MASIVA]
+            self.empresa_ids = sorted(base.empresas)[:SELECCION_MASIVA]
+
+    # El login registra una session_key nueva e invalida la anterior (sesion unica).
+    def login(self):
+        cliente = Client()
+        response = cliente.post("/login/", {"rut": RUT_OWNER, "password": settings.SUPABASE_FALSO_PASSWORD})
+        self.cliente = cliente
+        return response
+
+    def usuarios_listado(self):
+        return self.cliente.get("/usuarios/")
+
+    def empresas_listado(self):
+        return self.cliente.get("/empresas/")
+
+    def usuarios_masivo(self):
+        return self.cliente.post(
+            "/usuarios/",
+            {"usuarios_seleccionados": self.usuario_ids, "accion_masiva": "estado", "valor_masivo": "activo"},
+        )
+
+    def empresas_masivo(self):
+        return self.cliente.post(
+            "/empresas/",
+            {"empresas_seleccionadas": self.empresa_ids, "accion_masiva": "estado", "valor_masivo": "activo"},
+        )
+
+    def usuarios_exportar(self):
+        return self.cliente.get("/usuarios/exportar/")
+
+    def empresas_exportar(self):
+        return self.cliente.get("/empresas/exportar/")
+
+    def reportes(self):
+        return self.cliente.get("/reportes/")
+
+    def terminal_sql(self):
+        return self.cliente.post("/terminal/", {"sql": SQL_TERMINAL})
+
+
+# Escenarios en orden de ejecucion; login va primero porque deja la sesion del resto.
+ESCENARIOS = (
+    "login",
+    "usuarios_listado",
+    "empresas_listado",
+    "usuarios_masivo",
+    "empresas_masivo",
+    "usuarios_exportar",
+    "empresas_exportar",
+    "reportes",
+    "terminal_sql",
+)
+
+
+# Benchmark de punta a punta de las vistas de administracion sin red (SUPABASE_FALSO).
+# Reporta p50/p95/p99, llamadas a Supabase por request y memoria maxima por escenario, y
+# compara contra una linea base guardada: una regresion termina con error.
+class Command(BaseCommand):
+    help = "Mide las vistas de administracion contra el cliente Supabase en memoria y compara con la linea base."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanos",
+            default="1000,10000",
+            help="Usuarios y empresas sembrados por corrida, separados por coma (p. ej. 1000,10000,100000).",
+        )
+        parser.add_argument(
+            "--escenarios",
+            default=",".join(ESCENARIOS),
+            help="Escenarios a medir, separados por coma.",
+        )
+        parser.add_argument("--iteraciones", type=int, default=20, help="Requests medidos por escenario.")
+        parser.add_argument("--calentamiento", type=int, default=2, help="Requests previos sin medir.")
+        parser.add_argument(
+            "--latencia-ms",
+            type=float,
+            default=float(getattr(settings, "SUPABASE_FALSO_LATENCIA_MS", 0)),
+            help="Latencia inyectada por llamada a Supabase (por defecto SUPABASE_FALSO_LATENCIA_MS).",
+        )
+        parser.add_argument(
+            "--variacion-ms",
+            type=float,
+            default=float(getattr(settings, "SUPABASE_FALSO_VARIACION_MS", 0)),
+            help="Variacion aleatoria sumada a la latencia (por defecto SUPABASE_FALSO_VARIACION_MS).",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(settings.BASE_DIR / "bench_baseline.json"),
+            help="Archivo JSON con la linea base (por defecto bench_baseline.json junto a manage.py).",
+        )
+        parser.add_argument("--guardar", action="store_true", help="Guarda los resultados como nueva linea base.")
+        parser.add_argument(
+            "--requerir-baseline",
+            action="store_true",
+            help="Termina con error si no existe la linea base (para CI).",
+        )
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=0.2,
+            help="Aumento permitido de p95 y memoria sobre la linea base (0.2 = 20%%).",
+        )
+
+    def handle(self, *args, **opciones):
+        if not settings.DEBUG:
+            raise CommandError("El benchmark usa SUPABASE_FALSO, que solo se permite con DJANGO_DEBUG=1.")
+        if opciones["iteraciones"] < 2:
+            raise CommandError("--iteraciones debe ser al menos 2.")
+        try:
+            tamanos = [int(valor) for valor in opciones["tamanos"].split(",") if valor.strip()]
+        except ValueError:
+            raise CommandError("--tamanos debe ser una lista de enteros separados por coma.")
+        escenarios = [nombre.strip() for nombre in opciones["escenarios"].split(",") if nombre.strip()]
+        desconocidos = set(escenarios) - set(ESCENARIOS)
+        if desconocidos:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}.")
+        if "login" not in escenarios:
+            # Los demas escenarios necesitan sesion; el login se ejecuta igual pero no se reporta.
+            escenarios = ["login", *escenarios]
+            reportar_login = False
+        else:
+            reportar_login = True
+
+        configuracion = {
+            "latencia_ms": opciones["latencia_ms"],
+            "variacion_ms": opciones["variacion_ms"],
+            "iteraciones": opciones["iteraciones"],
+        }
+        # Una linea JSON por request en aexfy_admin/metricas.py; se silencia durante la medicion.
+        logger_metricas = logging.getLogger("aexfy_admin.metricas")
+        nivel_anterior = logger_metricas.level
+        logger_metricas.setLevel(logging.ERROR)
+        resultados = {}
+        try:
+            for tamano in tamanos:
+                resultados[str(tamano)] = self._medir_tamano(tamano, escenarios, opciones)
+                if not reportar_login:
+                    resultados[str(tamano)].pop("login", None)
+        finally:
+            logger_metricas.setLevel(nivel_anterior)
+
+        ruta = Path(opciones["baseline"])
+        if opciones["guardar"]:
+            ruta.write_text(
+                json.dumps({"configuracion": configuracion, "resultados": resultados}, indent=2, sort_keys=True),
+                encoding="utf-8",
+            )
+            self.stdout.write(self.style.SUCCESS(f"Linea base guardada en {ruta}."))
+            return
+        if not ruta.exists():
+            if opciones["requerir_baseline"]:
+                raise CommandError(f"Sin linea base en {ruta}; crearla con --guardar o indicar --baseline.")
+            self.stdout.write(f"Sin linea base en {ruta}; usa --guardar para crearla.")
+            return
+        self._comparar(json.loads(ruta.read_text(encoding="utf-8")), configuracion, resultados, opciones["tolerancia"])
+
+    # Siembra el dataset y mide cada escenario; cache y cliente falso parten vacios por tamano.
+    def _medir_tamano(self, tamano: int, escenarios: list[str], opciones: dict) -> dict:
+        with override_settings(
+            SUPABASE_FALSO=True,
+            SUPABASE_FALSO_USUARIOS=tamano,
+            SUPABASE_FALSO_EMPRESAS=tamano,
+            SUPABASE_FALSO_LATENCIA_MS=opciones["latencia_ms"],
+            SUPABASE_FALSO_VARIACION_MS=opciones["variacion_ms"],
+            # Contrasena de un solo uso para el login del escenario; no queda en settings.
+            SUPABASE_FALSO_PASSWORD=secrets.token_urlsafe(16),
+            # Sesiones en cache para no depender de la base SQLite local ni de migraciones.
+            SESSION_ENGINE="django.contrib.sessions.backends.cache",
+            ALLOWED_HOSTS=["testserver"],
+        ):
+            reiniciar_cliente_falso()
+            cache.clear()
+            inicio = time.perf_counter()
+            banco = _Banco()
+            self.stdout.write(
+                f"\n{tamano} usuarios/empresas (siembra {time.perf_counter() - inicio:.1f}s, "
+                f"latencia {opciones['latencia_ms']:g}+{opciones['variacion_ms']:g} ms)"
+            )
+            self.stdout.write(f"{'escenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rpc':>8}{'mem KB':>10}")
+            resultados = {}
+            for nombre in escenarios:
+                resultados[nombre] = self._medir_escenario(banco, nombre, opciones)
+                fila = resultados[nombre]
+                self.stdout.write(
+                    f"{nombre:<20}{fila['p50_ms']:>10.1f}{fila['p95_ms']:>10.1f}{fila['p99_ms']:>10.1f}"
+                    f"{fila['rpc']:>8}{fila['memoria_kb']:>10}"
+                )
+            self._esperar_auditoria()
+        return resultados
+
+    # Mide un escenario: latencia por request, llamadas por request (mediana) y memoria maxima.
+    def _medir_escenario(self, banco: _Banco, nombre: str, opciones: dict) -> dict:
+        ejecutar = getattr(banco, nombre)
+        # El login exitoso redirige al inicio; en el resto un 302 seria la sesion perdida.
+        esperado = 302 if nombre == "login" else 200
+
+        def _request():
+            response = ejecutar()
+            if response.status_code != esperado:
+                raise CommandError(f"{nombre} respondio {response.status_code} (se esperaba {esperado}).")
+            _consumir(response)
+
+        for _ in range(opciones["calentamiento"]):
+            _request()
+
+        duraciones = []
+        llamadas = []
+        for _ in range(opciones["iteraciones"]):
+            antes = _total_llamadas()
+            inicio = time.perf_counter()
+            _request()
+            duraciones.append((time.perf_counter() - inicio) * 1000)
+            llamadas.append(_total_llamadas() - antes)
+
+        # tracemalloc ralentiza cada asignacion; la memoria se mide en un request aparte.
+        tracemalloc.start()
+        try:
+            _request()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            **percentiles(duraciones),
+            "rpc": int(statistics.median(llamadas)),
+            "memoria_kb": pico // 1024,
+        }
+
+    # Espera a que el escritor de auditoria envie lo encolado mientras el cliente falso sigue activo.
+    def _esperar_auditoria(self) -> None:
+        limite = time.monotonic() + SEGUNDOS_ESPERA_AUDITORIA
+        while estado_escritor_auditoria()["pendientes"] > 0 and time.monotonic() < limite:
+            time.sleep(0.1)
+
+    # Compara contra la linea base: mas llamadas por request siempre es regresion; p95 y
+    # memoria solo si superan la tolerancia (y el piso de ruido en el caso de la latencia).
+    def _comparar(self, linea_base: dict, configuracion: dict, resultados: dict, tolerancia: float) -> None:
+        if linea_base.get("configuracion", {}).get("latencia_ms") != configuracion["latencia_ms"]:
+            self.stdout.write(
+                self.style.WARNING("La linea base se midio con otra latencia; las latencias no son comparables.")
+            )
+            comparar_latencia = False
+        else:
+            comparar_latencia = True
+
+        regresiones = []
+        for tamano, escenarios in resultados.items():
+            for nombre, actual in escenarios.items():
+                base = linea_base.get("resultados", {}).get(tamano, {}).get(nombre)
+                if not base:
+                    continue
+                if actual["rpc"] > base["rpc"]:
+                    regresiones.append(f"{tamano}/{nombre}: rpc {base['rpc']} -> {actual['rpc']}")
+                if (
+                    comparar_latencia
+                    and actual["p95_ms"] > base["p95_ms"] * (1 + tolerancia)
+                    and actual["p95_ms"] - base["p95_ms"] > PISO_RUIDO_MS
+                ):
+                    regresiones.append(f"{tamano}/{nombre}: p95 {base['p95_ms']} -> {actual['p95_ms']} ms")
+                if actual["memoria_kb"] > base["memoria_kb"] * (1 + tolerancia):
+                    regresiones.append(f"{tamano}/{nombre}: memoria {base['memoria_kb']} -> {actual['memoria_kb']} KB")
+
+        if regresiones:
+            raise CommandError("Regresiones contra la linea base:\n  " + "\n  ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS("Sin regresiones contra la linea base."))
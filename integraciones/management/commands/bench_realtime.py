@@ -0,0 +1,343 @@
+import asyncio
+import itertools
+import json
+import logging
+import secrets
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from integraciones.eventos import detener_observador
+from integraciones.instrumentacion import histogramas_llamadas, percentiles
+from integraciones.supabase_falso import RUT_OWNER, obtener_cliente_falso, reiniciar_cliente_falso
+
+try:
+    import resource
+except ImportError:
+    # resource no existe en Windows; sin el no se reporta la memoria residente maxima.
+    resource = None
+
+# Filtros de tablas que se reparten entre las conexiones, como las paginas de listado reales.
+FILTROS_TABLAS = (("usuarios",), ("clientes",), None)
+# Escrituras que generan eventos (tabla de realtime_events, RPC y parametros del cliente falso).
+ESCRITURAS = (
+    ("usuarios", "cambios_masivos_usuarios", "p_usuario_ids"),
+    ("clientes", "cambios_masivos_empresas", "p_empresa_ids"),
+)
+# Intervalo del monitor del event loop; el retraso sobre este valor es tiempo de loop ocupado.
+MONITOR_SEGUNDOS = 0.05
+
+
+# Una conexion SSE simulada: request ASGI al endpoint con su propia sesion y filtro de tablas.
+# Registra el tiempo hasta el primer byte y la llegada de cada evento de tabla por id.
+class _ConexionSSE:
+    def __init__(self, indice: int, session_key: str, tablas):
+        self.indice = indice
+        self.session_key = session_key
+        self.tablas = tablas
+        self.cerrar = asyncio.Event()
+        self.inicio = None
+        self.primer_byte = None
+        self.estado = None
+        self.llegadas = []
+        self._resto = ""
+        self._cuerpo_enviado = False
+
+    def _scope(self) -> dict:
+        consulta = f"tablas={','.join(self.tablas)}" if self.tablas else ""
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/realtime/stream/",
+            "raw_path": b"/realtime/stream/",
+            "query_string": consulta.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"accept", b"text/event-stream"),
+                (b"cookie", f"{settings.SESSION_COOKIE_NAME}={self.session_key}".encode()),
+            ],
+            "client": ("127.0.0.1", 10000 + self.indice % 50000),
+            "server": ("testserver", 80),
+        }
+
+    # Primero el cuerpo vacio del GET; despues queda esperando hasta que la prueba cierre la conexion.
+    async def _recibir(self):
+        if not self._cuerpo_enviado:
+            self._cuerpo_enviado = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.cerrar.wait()
+        return {"type": "http.disconnect"}
+
+    async def _enviar(self, mensaje: dict) -> None:
+        if mensaje["type"] == "http.response.start":
+            self.estado = mensaje["status"]
+            return
+        if mensaje["type"] != "http.response.body":
+            return
+        ahora = time.monotonic()
+        if self.primer_byte is None:
+            self.primer_byte = ahora - self.inicio
+        self._resto += mensaje.get("body", b"").decode()
+        *bloques, self._resto = self._resto.split("\n\n")
+        for bloque in bloques:
+            # Solo los mensajes sin nombre de evento son cambios de tabla (cursor y ping se ignoran).
+            if bloque.startswith("data: "):
+                self.llegadas.append((json.loads(bloque[6:])["id"], ahora))
+
+    async def ejecutar(self, aplicacion) -> None:
+        self.inicio = time.monotonic()
+        await aplicacion(self._scope(), self._recibir, self._enviar)
+
+
+# Prueba de carga y resistencia del endpoint SSE contra el cliente Supabase en memoria.
+# Abre muchas conexiones en un solo proceso ASGI, genera escrituras que emiten eventos y mide
+# la latencia de entrega, la memoria por conexion, la ocupacion del worker y las consultas por segundo.
+class Command(BaseCommand):
+    help = "Abre conexiones SSE concurrentes a /realtime/stream/ y mide la entrega de eventos realtime."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conexiones", type=int, default=1000, help="Conexiones SSE concurrentes.")
+        parser.add_argument(
+            "--duracion",
+            type=float,
+            default=60,
+            help="Segundos de escrituras con todas las conexiones abiertas.",
+        )
+        parser.add_argument("--rampa", type=float, default=5, help="Segundos para abrir todas las conexiones.")
+        parser.add_argument("--escrituras", type=float, default=5, help="Escrituras por segundo.")
+        parser.add_argument(
+            "--poll-segundos",
+            type=float,
+            default=float(getattr(settings, "REALTIME_POLL_SEGUNDOS", 2)),
+            help="Intervalo del observador (por defecto REALTIME_POLL_SEGUNDOS).",
+        )
+        parser.add_argument(
+            "--latencia-ms",
+            type=float,
+            default=float(getattr(settings, "SUPABASE_FALSO_LATENCIA_MS", 0)),
+            help="Latencia inyectada por llamada a Supabase (por defecto SUPABASE_FALSO_LATENCIA_MS).",
+        )
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+
+    def handle(self, *args, **opciones):
+        if not settings.DEBUG:
+            raise CommandError("La prueba usa SUPABASE_FALSO, que solo se permite con DJANGO_DEBUG=1.")
+        if opciones["conexiones"] < 1 or opciones["duracion"] <= 0 or opciones["escrituras"] <= 0:
+            raise CommandError("--conexiones, --duracion y --escrituras deben ser mayores a 0.")
+        with override_settings(
+            SUPABASE_FALSO=True,
+            SUPABASE_FALSO_LATENCIA_MS=opciones["latencia_ms"],
+            SUPABASE_FALSO_VARIACION_MS=0,
+            # Las sesiones se crean directo en la cache; la contrasena solo habilita el cliente falso.
+            SUPABASE_FALSO_PASSWORD=secrets.token_urlsafe(16),
+            REALTIME_POLL_SEGUNDOS=opciones["poll_segundos"],
+            # LISTEN/NOTIFY necesita Postgres real; el cliente falso solo se lee por polling.
+            REALTIME_DATABASE_URL="",
+            # Sesiones en una cache propia con espacio para todas las conexiones.
+            SESSION_ENGINE="django.contrib.sessions.backends.cache",
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "aexfy-bench-realtime",
+                    "OPTIONS": {"MAX_ENTRIES": opciones["conexiones"] * 2 + 1000},
+                }
+            },
+            ALLOWED_HOSTS=["testserver"],
+        ):
+            reiniciar_cliente_falso()
+            # aexfy_admin/metricas.py escribe una linea por stream al cerrarse; se silencia durante la prueba.
+            logger_metricas = logging.getLogger("aexfy_admin.metricas")
+            nivel_anterior = logger_metricas.level
+            logger_metricas.setLevel(logging.ERROR)
+            try:
+                resultados = asyncio.run(self._ejecutar(opciones, self._crear_sesiones(opciones["conexiones"])))
+            finally:
+                logger_metricas.setLevel(nivel_anterior)
+                detener_observador()
+
+        self._reportar(resultados)
+        if opciones["salida"]:
+            Path(opciones["salida"]).write_text(json.dumps(resultados, indent=2, sort_keys=True), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {opciones['salida']}."))
+
+    # Una sesion valida por conexion, como la que deja login_view (token y usuario).
+    def _crear_sesiones(self, cantidad: int) -> list[str]:
+        base = obtener_cliente_falso().base
+        with base.lock:
+            owner = next(usuario for usuario in base.usuarios.values() if usuario["rut"] == RUT_OWNER)
+        claves = []
+        for _ in range(cantidad):
+            sesion = SessionStore()
+            sesion["supabase_access_token"] = "bench"
+            sesion["usuario"] = {"id": owner["id"], "email": owner["email"], "rut": owner["rut"]}
+            sesion.create()
+            claves.append(sesion.session_key)
+        return claves
+
+    async def _ejecutar(self, opciones: dict, sesiones: list[str]) -> dict:
+        aplicacion = get_asgi_application()
+        filtros = itertools.cycle(FILTROS_TABLAS)
+        conexiones = [_ConexionSSE(i, clave, next(filtros)) for i, clave in enumerate(sesiones)]
+        monitor = {"retrasos": [], "hilos_max": 0, "activo": True}
+        tarea_monitor = asyncio.create_task(self._monitorear(monitor))
+
+        # Rampa: abre las conexiones en tandas y mide la memoria que retienen ya establecidas.
+        tracemalloc.start()
+        memoria_inicial = tracemalloc.get_traced_memory()[0]
+        tareas = []
+        por_tanda = max(1, len(conexiones) // max(1, int(opciones["rampa"] * 10)))
+        for inicio in range(0, len(conexiones), por_tanda):
+            for conexion in conexiones[inicio:inicio + por_tanda]:
+                tareas.append(asyncio.create_task(conexion.ejecutar(aplicacion)))
+            await asyncio.sleep(0.1)
+        limite = time.monotonic() + 30
+        while any(c.primer_byte is None for c in conexiones) and not any(t.done() for t in tareas):
+            if time.monotonic() > limite:
+                break
+            await asyncio.sleep(0.1)
+        # Deja pasar una lectura del observador para que todas reciban el cursor inicial.
+        await asyncio.sleep(opciones["poll_segundos"])
+        memoria_conexiones = tracemalloc.get_traced_memory()[0] - memoria_inicial
+        tracemalloc.stop()
+        abiertas = sum(1 for c in conexiones if c.estado == 200 and c.primer_byte is not None)
+
+        # Resistencia: escrituras a ritmo constante con todas las conexiones abiertas.
+        llamadas_antes = histogramas_llamadas()
+        cpu_antes, reloj_antes = time.process_time(), time.monotonic()
+        escritos = {}
+        await self._escribir(escritos, opciones)
+        # Espera la ultima lectura del observador antes de cerrar.
+        await asyncio.sleep(opciones["poll_segundos"] * 2 + 1)
+        segundos = time.monotonic() - reloj_antes
+        cpu = time.process_time() - cpu_antes
+        llamadas_despues = histogramas_llamadas()
+
+        for conexion in conexiones:
+            conexion.cerrar.set()
+        await asyncio.wait(tareas, timeout=30)
+        monitor["activo"] = False
+        await tarea_monitor
+
+        return self._resumir(
+            opciones, conexiones, abiertas, escritos, memoria_conexiones, monitor,
+            cpu / segundos, segundos, llamadas_antes, llamadas_despues,
+        )
+
+    # Genera escrituras alternando tablas; guarda el instante de cada evento emitido por id.
+    async def _escribir(self, escritos: dict, opciones: dict) -> None:
+        cliente = obtener_cliente_falso()
+        base = cliente.base
+        with base.lock:
+            ids = {"usuarios": sorted(base.usuarios)[:100], "clientes": sorted(base.empresas)[:100]}
+        ciclo = itertools.cycle(ESCRITURAS)
+        intervalo = 1 / opciones["escrituras"]
+        fin = time.monotonic() + opciones["duracion"]
+
+        def _escribir_una(tabla, funcion, parametro, objetivo):
+            with base.lock:
+                ultimo = base.realtime[-1]["id"] if base.realtime else 0
+            cliente.rpc(funcion, {parametro: [objetivo], "p_accion": "estado", "p_valor": "activo"}).execute()
+            ahora = time.monotonic()
+            with base.lock:
+                for evento in base.realtime:
+                    if evento["id"] > ultimo:
+                        escritos[evento["id"]] = (evento["tabla"], ahora)
+
+        numero = 0
+        while time.monotonic() < fin:
+            tabla, funcion, parametro = next(ciclo)
+            objetivo = ids[tabla][numero % len(ids[tabla])]
+            numero += 1
+            # La escritura corre en un hilo; la latencia inyectada no debe bloquear el loop.
+            await asyncio.to_thread(_escribir_una, tabla, funcion, parametro, objetivo)
+            await asyncio.sleep(intervalo)
+
+    # Retraso del event loop (tiempo ocupado sin atender conexiones) y maximo de hilos vivos.
+    async def _monitorear(self, monitor: dict) -> None:
+        while monitor["activo"]:
+            antes = time.monotonic()
+            await asyncio.sleep(MONITOR_SEGUNDOS)
+            monitor["retrasos"].append((time.monotonic() - antes - MONITOR_SEGUNDOS) * 1000)
+            monitor["hilos_max"] = max(monitor["hilos_max"], threading.active_count())
+
+    def _resumir(self, opciones, conexiones, abiertas, escritos, memoria, monitor, cpu, segundos, antes, despues) -> dict:
+        latencias = []
+        esperadas = 0
+        for conexion in conexiones:
+            recibidos = {}
+            for evento_id, llegada in conexion.llegadas:
+                recibidos.setdefault(evento_id, llegada)
+            for evento_id, (tabla, escrito_en) in escritos.items():
+                if conexion.tablas is not None and tabla not in conexion.tablas:
+                    continue
+                esperadas += 1
+                if evento_id in recibidos:
+                    latencias.append((recibidos[evento_id] - escrito_en) * 1000)
+        primeros = [c.primer_byte * 1000 for c in conexiones if c.primer_byte is not None]
+        llamadas = {
+            nombre: round((histograma["llamadas"] - antes.get(nombre, {}).get("llamadas", 0)) / segundos, 2)
+            for nombre, histograma in despues.items()
+            if histograma["llamadas"] > antes.get(nombre, {}).get("llamadas", 0)
+        }
+        return {
+            "configuracion": {
+                "conexiones": opciones["conexiones"],
+                "duracion": opciones["duracion"],
+                "escrituras_por_segundo": opciones["escrituras"],
+                "poll_segundos": opciones["poll_segundos"],
+                "latencia_ms": opciones["latencia_ms"],
+            },
+            "conexiones_abiertas": abiertas,
+            "primer_byte": percentiles(primeros) if len(primeros) > 1 else None,
+            "eventos_escritos": len(escritos),
+            "entregas_esperadas": esperadas,
+            "entregas_recibidas": len(latencias),
+            "latencia_entrega": percentiles(latencias) if len(latencias) > 1 else None,
+            "latencia_entrega_max_ms": round(max(latencias), 2) if latencias else None,
+            "memoria_por_conexion_kb": round(memoria / max(abiertas, 1) / 1024, 2),
+            "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+            "loop_retraso": percentiles(monitor["retrasos"]) if len(monitor["retrasos"]) > 1 else None,
+            "loop_retraso_max_ms": round(max(monitor["retrasos"]), 2) if monitor["retrasos"] else None,
+            "cpu_porcentaje": round(cpu * 100, 1),
+            "hilos_max": monitor["hilos_max"],
+            "llamadas_por_segundo": llamadas,
+            "llamadas_por_segundo_total": round(sum(llamadas.values()), 2),
+        }
+
+    def _reportar(self, r: dict) -> None:
+        def _p(valores):
+            if not valores:
+                return "-"
+            return f"p50 {valores['p50_ms']:.1f} / p95 {valores['p95_ms']:.1f} / p99 {valores['p99_ms']:.1f} ms"
+
+        perdidas = r["entregas_esperadas"] - r["entregas_recibidas"]
+        self.stdout.write(f"Conexiones abiertas: {r['conexiones_abiertas']}/{r['configuracion']['conexiones']}")
+        self.stdout.write(f"Primer byte: {_p(r['primer_byte'])}")
+        self.stdout.write(
+            f"Eventos escritos: {r['eventos_escritos']}; entregas {r['entregas_recibidas']}/{r['entregas_esperadas']}"
+            f" (perdidas {perdidas})"
+        )
+        self.stdout.write(f"Latencia de entrega: {_p(r['latencia_entrega'])}; max {r['latencia_entrega_max_ms']} ms")
+        self.stdout.write(
+            f"Memoria por conexion: {r['memoria_por_conexion_kb']} KB; RSS max: {r['rss_max_mb'] or '-'} MB"
+        )
+        self.stdout.write(
+            f"Event loop: retraso {_p(r['loop_retraso'])}; max {r['loop_retraso_max_ms']} ms;"
+            f" CPU {r['cpu_porcentaje']}%; hilos max {r['hilos_max']}"
+        )
+        self.stdout.write(f"Llamadas a Supabase por segundo: {r['llamadas_por_segundo_total']}")
+        for nombre, valor in sorted(r["llamadas_por_segundo"].items()):
+            self.stdout.write(f"  {nombre:<40}{valor:>10}")
+        if perdidas:
+            self.stdout.write(self.style.WARNING(f"Se perdieron {perdidas} entregas."))
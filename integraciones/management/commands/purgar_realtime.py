@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from integraciones.supabase_client import get_supabase_service_client
+
+
+# Purga public.realtime_events por antiguedad con la RPC purgar_realtime_events (DB_Aexfy.db).
+# Pensado para un cron job de Render cuando la base no tiene pg_cron.
+class Command(BaseCommand):
+    help = "Elimina eventos de public.realtime_events mas antiguos que la retencion configurada."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=float,
+            default=float(getattr(settings, "REALTIME_RETENCION_HORAS", 24)),
+            help="Retencion en horas (por defecto REALTIME_RETENCION_HORAS).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=10000,
+            help="Filas borradas por sentencia.",
+        )
+
+    def handle(self, *args, **opciones):
+        if opciones["horas"] <= 0:
+            raise CommandError("--horas debe ser mayor a 0.")
+        # PostgREST recibe el interval como texto ISO 8601 (p. ej. PT24H).
+        segundos = int(timedelta(hours=opciones["horas"]).total_seconds())
+        cliente = get_supabase_service_client()
+        respuesta = cliente.rpc(
+            "purgar_realtime_events",
+            {"p_retencion": f"PT{segundos}S", "p_lote": opciones["lote"]},
+        ).execute()
+        borrados = respuesta.data if isinstance(respuesta.data, int) else 0
+        self.stdout.write(self.style.SUCCESS(f"Eventos purgados: {borrados}"))
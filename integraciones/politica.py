@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from django.conf import settings
+
+# Logger para cambios de estado del circuito y lecturas servidas desde el respaldo.
+logger = logging.getLogger(__name__)
+
+# Prefijos de RPC de solo lectura; se reintentan y su ultima respuesta sirve de respaldo.
+PREFIJOS_LECTURA = ("listar_", "obtener_", "contexto_", "resumen_", "buscar_", "validar_")
+# Despachador de lotes; solo acepta funciones de lectura (lista permitida en DB_Aexfy.db).
+RPC_LECTURA = {"ejecutar_lote_admin"}
+# Lecturas que se reintentan pero nunca se sirven desde el respaldo: sesion, permisos y login
+# (una respuesta vieja podria mantener una sesion cerrada, un rol quitado o un usuario suspendido)
+# y public.realtime_events, que el observador lee como cola.
+SIN_RESPALDO = (
+    "contexto_sesion_admin",
+    "obtener_sesion_usuario_admin",
+    "obtener_roles_usuario_admin",
+    "v_usuarios_login",
+    "realtime_events",
+)
+# Codigos HTTP que indican falla de Supabase (no del request) y cuentan para el circuito.
+ESTADOS_FALLA = {500, 502, 503, 504}
+# Codigos que se reintentan en lecturas; 429 es limite de tasa y no abre el circuito.
+ESTADOS_REINTENTO = ESTADOS_FALLA | {429}
+# Header agregado a las respuestas servidas desde el respaldo mientras Supabase falla.
+HEADER_DEGRADADO = "X-Aexfy-Degradado"
+
+_lock = threading.Lock()
+# Circuito del proceso: cerrado (normal), abierto (falla rapido) o semiabierto (una prueba en curso).
+_circuito = {
+    "estado": "cerrado",
+    "fallas_consecutivas": 0,
+    "abierto_en": None,
+    "prueba_en_curso": False,
+    "aperturas": 0,
+    "ultimo_error": None,
+}
+# Contadores de la politica para monitoreo.
+_contadores = {"reintentos": 0, "rechazos": 0, "degradadas": 0, "timeouts": 0}
+# Ultima respuesta correcta de cada lectura (metodo, url y cuerpo); acotada por cantidad, bytes y edad.
+_respaldo = OrderedDict()
+# Bytes de cuerpo guardados en _respaldo; se acota con SUPABASE_RESPALDO_MAX_BYTES.
+_respaldo_uso = {"bytes": 0}
+
+
+# Falla rapida mientras el circuito esta abierto; las vistas la tratan como cualquier error de Supabase.
+class CircuitoAbierto(httpx.TransportError):
+    pass
+
+
+def _reintentos_lectura() -> int:
+    return int(getattr(settings, "SUPABASE_REINTENTOS_LECTURA", 2))
+
+
+def _espera_base() -> float:
+    return float(getattr(settings, "SUPABASE_REINTENTO_BASE_SEGUNDOS", 0.2))
+
+
+def _fallas_para_abrir() -> int:
+    return int(getattr(settings, "SUPABASE_CIRCUITO_FALLAS", 5))
+
+
+def _espera_circuito() -> float:
+    return float(getattr(settings, "SUPABASE_CIRCUITO_ESPERA_SEGUNDOS", 30))
+
+
+def _respaldo_max() -> int:
+    return int(getattr(settings, "SUPABASE_RESPALDO_MAX", 500))
+
+
+def _respaldo_segundos() -> float:
+    return float(getattr(settings, "SUPABASE_RESPALDO_SEGUNDOS", 300))
+
+
+def _respaldo_max_bytes() -> int:
+    return int(getattr(settings, "SUPABASE_RESPALDO_MAX_BYTES", 16 * 1024 * 1024))
+
+
+def _respaldo_max_cuerpo() -> int:
+    return int(getattr(settings, "SUPABASE_RESPALDO_MAX_CUERPO", 256 * 1024))
+
+
+# Nombre de la RPC de una ruta PostgREST; None para tablas, vistas o Auth.
+def _nombre_rpc(request: httpx.Request) -> str | None:
+    ruta = request.url.path
+    if "/rest/v1/rpc/" in ruta:
+        return ruta.rsplit("/", 1)[-1]
+    return None
+
+
+# Lecturas idempotentes: consultas GET a tablas/vistas y RPC listar_*, obtener_*, etc.
+def _es_lectura(request: httpx.Request) -> bool:
+    if request.method in ("GET", "HEAD"):
+        return True
+    nombre = _nombre_rpc(request)
+    return bool(nombre) and (nombre in RPC_LECTURA or nombre.startswith(PREFIJOS_LECTURA))
+
+
+# Timeout de la llamada: SUPABASE_TIMEOUTS_RPC por funcion, luego lectura o escritura.
+def _timeout(request: httpx.Request, lectura: bool) -> float:
+    por_rpc = getattr(settings, "SUPABASE_TIMEOUTS_RPC", {}) or {}
+    nombre = _nombre_rpc(request)
+    if nombre in por_rpc:
+        return float(por_rpc[nombre])
+    if lectura:
+        return float(getattr(settings, "SUPABASE_TIMEOUT_LECTURA", 5))
+    return float(getattr(settings, "SUPABASE_HTTP_TIMEOUT", 10))
+
+
+# Pagina de un recorrido por cursor (p_cursor_id); las exportaciones de aexfy_admin/exportacion.py
+# piden asi todo el listado y guardar cada lote retendria el dataset completo en memoria.
+def _es_pagina_cursor(cuerpo: bytes) -> bool:
+    if b"p_cursor_id" not in cuerpo:
+        return False
+    try:
+        parametros = json.loads(cuerpo)
+    except ValueError:
+        return False
+    return isinstance(parametros, dict) and parametros.get("p_cursor_id") is not None
+
+
+# Llave del respaldo; None si la lectura no debe servirse vieja (sesion y permisos, tambien dentro de
+# lotes) o si es una pagina posterior de un recorrido por cursor.
+def _clave_respaldo(request: httpx.Request):
+    cuerpo = request.content
+    if any(nombre.encode() in cuerpo or nombre in request.url.path for nombre in SIN_RESPALDO):
+        return None
+    if _es_pagina_cursor(cuerpo):
+        return None
+    return (request.method, str(request.url), cuerpo)
+
+
+# Guarda la respuesta si su cuerpo no supera SUPABASE_RESPALDO_MAX_CUERPO; descarta las mas antiguas
+# hasta volver bajo SUPABASE_RESPALDO_MAX entradas y SUPABASE_RESPALDO_MAX_BYTES en total.
+def _guardar_respaldo(clave, respuesta: httpx.Response) -> None:
+    contenido = respuesta.content
+    with _lock:
+        anterior = _respaldo.pop(clave, None)
+        if anterior is not None:
+            _respaldo_uso["bytes"] -= len(anterior[3])
+        if len(contenido) > _respaldo_max_cuerpo():
+            return
+        _respaldo[clave] = (time.monotonic(), respuesta.status_code, dict(respuesta.headers), contenido)
+        _respaldo_uso["bytes"] += len(contenido)
+        while _respaldo and (len(_respaldo) > _respaldo_max() or _respaldo_uso["bytes"] > _respaldo_max_bytes()):
+            _, entrada = _respaldo.popitem(last=False)
+            _respaldo_uso["bytes"] -= len(entrada[3])
+
+
+# Respuesta guardada para la lectura, marcada como degradada; None si no hay o ya vencio.
+def _leer_respaldo(clave, request: httpx.Request) -> httpx.Response | None:
+    with _lock:
+        entrada = _respaldo.get(clave)
+        if entrada is None or time.monotonic() - entrada[0] > _respaldo_segundos():
+            return None
+        _contadores["degradadas"] += 1
+    _, estado, headers, contenido = entrada
+    headers = dict(headers)
+    headers.pop("content-encoding", None)
+    headers.pop("content-length", None)
+    headers[HEADER_DEGRADADO] = "1"
+    return httpx.Response(estado, headers=headers, content=contenido, request=request)
+
+
+# Cuerpo anunciado mayor al limite del respaldo; evita leerlo por adelantado solo para descartarlo.
+def _excede_cuerpo(respuesta: httpx.Response) -> bool:
+    largo = respuesta.headers.get("content-length")
+    return bool(largo and largo.isdigit() and int(largo) > _respaldo_max_cuerpo())
+
+
+# Indica si se puede llamar a Supabase; en semiabierto deja pasar una sola prueba a la vez.
+def _permitir() -> bool:
+    with _lock:
+        if _circuito["estado"] == "cerrado":
+            return True
+        if _circuito["estado"] == "abierto":
+            if time.monotonic() - _circuito["abierto_en"] < _espera_circuito():
+                _contadores["rechazos"] += 1
+                return False
+            _circuito["estado"] = "semiabierto"
+            _circuito["prueba_en_curso"] = False
+        if _circuito["prueba_en_curso"]:
+            _contadores["rechazos"] += 1
+            return False
+        _circuito["prueba_en_curso"] = True
+        return True
+
+
+def _registrar_exito() -> None:
+    with _lock:
+        if _circuito["estado"] != "cerrado":
+            logger.warning("Circuito Supabase cerrado; el servicio respondio.")
+        _circuito.update({"estado": "cerrado", "fallas_consecutivas": 0, "prueba_en_curso": False})
+
+
+# Cuenta una falla; abre el circuito al llegar al umbral o si falla la prueba en semiabierto.
+def _registrar_falla(error: str) -> None:
+    with _lock:
+        _circuito["fallas_consecutivas"] += 1
+        _circuito["ultimo_error"] = error
+        _circuito["prueba_en_curso"] = False
+        if _circuito["estado"] == "semiabierto" or (
+            _circuito["estado"] == "cerrado" and _circuito["fallas_consecutivas"] >= _fallas_para_abrir()
+        ):
+            _circuito.update({"estado": "abierto", "abierto_en": time.monotonic()})
+            _circuito["aperturas"] += 1
+            logger.warning(
+                "Circuito Supabase abierto tras %s fallas consecutivas: %s",
+                _circuito["fallas_consecutivas"],
+                error,
+            )
+
+
+# Espera antes del reintento n (desde 0): exponencial con jitter completo.
+def _espera_reintento(intento: int) -> float:
+    return random.uniform(0, _espera_base() * (2 ** intento))
+
+
+# Transporte httpx con la politica de llamadas a Supabase (integraciones/supabase_client.py):
+# timeout por RPC, reintentos con jitter solo para lecturas, circuito por proceso y respaldo de
+# la ultima lectura correcta mientras Supabase no responde. Envuelve al transporte medido, asi
+# cada intento queda en los histogramas de integraciones/instrumentacion.py.
+class TransportePolitica(httpx.BaseTransport):
+    def __init__(self, transporte: httpx.BaseTransport):
+        self._transporte = transporte
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        lectura = _es_lectura(request)
+        clave = _clave_respaldo(request) if lectura else None
+        # Presupuesto total de la llamada; los reintentos no alargan la espera del worker.
+        limite = time.monotonic() + _timeout(request, lectura)
+        intentos = 1 + (_reintentos_lectura() if lectura else 0)
+        respuesta = None
+        error = None
+
+        for intento in range(intentos):
+            if intento:
+                espera = _espera_reintento(intento - 1)
+                if time.monotonic() + espera + 0.1 >= limite:
+                    break
+                with _lock:
+                    _contadores["reintentos"] += 1
+                if respuesta is not None:
+                    respuesta.close()
+                time.sleep(espera)
+
+            if not _permitir():
+                respaldo = _leer_respaldo(clave, request) if clave else None
+                if respaldo is not None:
+                    return respaldo
+                raise CircuitoAbierto("Supabase no disponible (circuito abierto).", request=request)
+
+            request.extensions["timeout"] = httpx.Timeout(max(limite - time.monotonic(), 0.1)).as_dict()
+            respuesta, error = None, None
+            try:
+                respuesta = self._transporte.handle_request(request)
+            except httpx.TransportError as exc:
+                if isinstance(exc, httpx.TimeoutException):
+                    with _lock:
+                        _contadores["timeouts"] += 1
+                _registrar_falla(type(exc).__name__)
+                error = exc
+                if not lectura:
+                    # Una escritura pudo aplicarse aunque la respuesta no llegara; no se repite.
+                    break
+                continue
+
+            if respuesta.status_code in ESTADOS_FALLA:
+                _registrar_falla(f"HTTP{respuesta.status_code}")
+            else:
+                # 429 es limite de tasa: Supabase responde y el circuito no se abre.
+                _registrar_exito()
+            if not lectura or respuesta.status_code not in ESTADOS_REINTENTO:
+                if clave is not None and respuesta.status_code < 400 and not _excede_cuerpo(respuesta):
+                    respuesta.read()
+                    _guardar_respaldo(clave, respuesta)
+                return respuesta
+
+        # Intentos o presupuesto agotados: respaldo si existe, si no la ultima respuesta o error.
+        respaldo = _leer_respaldo(clave, request) if clave else None
+        if respaldo is not None:
+            logger.warning("Lectura %s servida desde el respaldo: %s", request.url.path, error or respuesta.status_code)
+            if respuesta is not None:
+                respuesta.close()
+            return respaldo
+        if respuesta is not None:
+            return respuesta
+        raise error
+
+    def close(self) -> None:
+        self._transporte.close()
+
+
+# El lock y el estado del padre no sirven al hijo tras un fork (gunicorn con preload).
+def _reiniciar_tras_fork() -> None:
+    global _lock
+    _lock = threading.Lock()
+    _circuito.update(
+        {
+            "estado": "cerrado",
+            "fallas_consecutivas": 0,
+            "abierto_en": None,
+            "prueba_en_curso": False,
+            "aperturas": 0,
+            "ultimo_error": None,
+        }
+    )
+    _contadores.update({"reintentos": 0, "rechazos": 0, "degradadas": 0, "timeouts": 0})
+    _respaldo.clear()
+    _respaldo_uso["bytes"] = 0
+
+
+# Estado del circuito y contadores de la politica para monitoreo (ver aexfy_admin/salud.py).
+def estado_politica() -> dict:
+    with _lock:
+        abierto_en = _circuito["abierto_en"]
+        return {
+            "circuito": _circuito["estado"],
+            "fallas_consecutivas": _circuito["fallas_consecutivas"],
+            "abierto_hace_segundos": round(time.monotonic() - abierto_en, 1) if abierto_en else None,
+            "aperturas": _circuito["aperturas"],
+            "ultimo_error": _circuito["ultimo_error"],
+            "respaldo_entradas": len(_respaldo),
+            "respaldo_bytes": _respaldo_uso["bytes"],
+            **_contadores,
+        }
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
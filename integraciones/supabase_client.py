@@ -1,5 +1,34 @@
-﻿from django.conf import settings
+﻿import atexit
+import dataclasses
+import os
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from supabase import Client, create_client
+from supabase.lib.client_options import ClientOptions
+
+from integraciones.instrumentacion import TransporteMedido
+from integraciones.politica import TransportePolitica
+
+# Registro de clientes por proceso; cada worker de gunicorn mantiene su propio pool HTTP.
+# Se reinicia tras fork para no compartir sockets abiertos entre procesos.
+_registro_lock = threading.Lock()
+_registro = {
+    "pid": os.getpid(),
+    "iniciado_en": time.time(),
+    "clientes": {},
+}
+# Contadores del registro; se exponen en estado_clientes_supabase().
+_estadisticas = {
+    "creados": 0,
+    "reutilizados": 0,
+    "reinicios_fork": 0,
+    "ultimo_error": None,
+}
+
 
 # Valida que existan credenciales en settings.py; evita fallas silenciosas.
 def _validar_credenciales():
@@ -10,20 +39,191 @@ def _validar_credenciales():
         )
 
 
-# Crea un cliente anonimo para operaciones seguras desde Django.
+# Lee limites del pool y timeouts desde settings.py con valores por defecto seguros.
+def _configuracion_pool() -> dict:
+    return {
+        "timeout": float(getattr(settings, "SUPABASE_HTTP_TIMEOUT", 10)),
+        "max_conexiones": int(getattr(settings, "SUPABASE_POOL_MAX_CONEXIONES", 20)),
+        "max_keepalive": int(getattr(settings, "SUPABASE_POOL_MAX_KEEPALIVE", 10)),
+        "keepalive_segundos": float(getattr(settings, "SUPABASE_POOL_KEEPALIVE_SEGUNDOS", 30)),
+    }
+
+
+# Construye las opciones del cliente; inyecta un httpx.Client propio si la version de supabase lo permite.
+def _crear_opciones(conf: dict) -> ClientOptions:
+    opciones = {
+        "postgrest_client_timeout": conf["timeout"],
+        "auto_refresh_token": False,
+        "persist_session": False,
+    }
+    campos = {campo.name for campo in dataclasses.fields(ClientOptions)}
+    if "httpx_client" in campos:
+        # Cada cliente tiene su propio pool porque postgrest fija base_url y headers sobre el httpx.Client.
+        # El transporte medido registra duracion, bytes y error de cada RPC (integraciones/instrumentacion.py);
+        # los limites van en el transporte porque httpx los ignora cuando se entrega uno propio.
+        # La politica (integraciones/politica.py) envuelve todo: timeout por RPC, reintentos y circuito.
+        opciones["httpx_client"] = httpx.Client(
+            timeout=httpx.Timeout(conf["timeout"]),
+            transport=TransportePolitica(
+                TransporteMedido(
+                    httpx.HTTPTransport(
+                        limits=httpx.Limits(
+                            max_connections=conf["max_conexiones"],
+                            max_keepalive_connections=conf["max_keepalive"],
+                            keepalive_expiry=conf["keepalive_segundos"],
+                        ),
+                    )
+                )
+            ),
+        )
+    return ClientOptions(**opciones)
+
+
+# Descarta los clientes heredados del proceso padre; no se cierran para no cortar sus sockets.
+def _reiniciar_tras_fork():
+    global _registro_lock
+    _registro_lock = threading.Lock()
+    _registro["pid"] = os.getpid()
+    _registro["iniciado_en"] = time.time()
+    _registro["clientes"] = {}
+    _estadisticas["reinicios_fork"] += 1
+
+
+# Devuelve el cliente registrado para la llave dada o lo crea una sola vez por proceso.
+def _obtener_cliente(clave: str, llave_api: str) -> Client:
+    # Respaldo para servidores que hacen fork sin pasar por os.register_at_fork.
+    if _registro["pid"] != os.getpid():
+        _reiniciar_tras_fork()
+
+    entrada = _registro["clientes"].get(clave)
+    if entrada:
+        entrada["usos"] += 1
+        _estadisticas["reutilizados"] += 1
+        return entrada["cliente"]
+
+    with _registro_lock:
+        entrada = _registro["clientes"].get(clave)
+        if entrada:
+            entrada["usos"] += 1
+            _estadisticas["reutilizados"] += 1
+            return entrada["cliente"]
+        try:
+            cliente = create_client(
+                settings.SUPABASE_URL,
+                llave_api,
+                options=_crear_opciones(_configuracion_pool()),
+            )
+        except Exception as exc:
+            _estadisticas["ultimo_error"] = f"{clave}: {exc}"
+            raise
+        _registro["clientes"][clave] = {
+            "cliente": cliente,
+            "creado_en": time.time(),
+            "usos": 1,
+        }
+        _estadisticas["creados"] += 1
+        return cliente
+
+
+# Con SUPABASE_FALSO se usa el cliente en memoria de integraciones/supabase_falso.py (sin red ni credenciales).
+# Se vuelve a validar aqui porque override_settings puede activarlo despues de cargar settings.py:
+# su contrasena unica abre cualquier cuenta, asi que fuera de DEBUG se rechaza.
+def _cliente_falso():
+    if not getattr(settings, "SUPABASE_FALSO", False):
+        return None
+    if not settings.DEBUG:
+        raise ImproperlyConfigured("SUPABASE_FALSO solo se permite con DEBUG activo.")
+    if not getattr(settings, "SUPABASE_FALSO_PASSWORD", ""):
+        raise ImproperlyConfigured("SUPABASE_FALSO requiere definir SUPABASE_FALSO_PASSWORD.")
+    from integraciones.supabase_falso import obtener_cliente_falso
+
+    return obtener_cliente_falso()
+
+
+# Obtiene el cliente anonimo compartido para operaciones seguras desde Django.
 def get_supabase_client() -> Client:
-    # Verifica credenciales antes de crear el cliente que se usa en servicios o vistas.
+    falso = _cliente_falso()
+    if falso is not None:
+        return falso
+    # Verifica credenciales antes de entregar el cliente que se usa en servicios o vistas.
     _validar_credenciales()
-    # create_client crea el cliente HTTP que consumira la API de Supabase.
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+    # El cliente se crea una vez por proceso y reutiliza conexiones keep-alive.
+    return _obtener_cliente("anon", settings.SUPABASE_ANON_KEY)
 
 
-# Crea un cliente con rol de servicio para tareas administrativas controladas.
+# Obtiene el cliente con rol de servicio compartido para tareas administrativas controladas.
 def get_supabase_service_client() -> Client:
+    falso = _cliente_falso()
+    if falso is not None:
+        return falso
     # Usa SUPABASE_SERVICE_KEY si existe; se define junto con SUPABASE_URL en settings.py.
     if not settings.SUPABASE_SERVICE_KEY:
         raise ValueError(
             "Falta SUPABASE_SERVICE_KEY en settings.py/.env para crear el cliente de servicio."
         )
-    # create_client se reutiliza con la llave de servicio para operaciones privilegiadas.
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    # Reutiliza el mismo cliente de servicio en todos los services.py del proceso.
+    return _obtener_cliente("service", settings.SUPABASE_SERVICE_KEY)
+
+
+# Crea un cliente anonimo dedicado para flujos de Auth (login).
+# No se comparte porque sign_in guarda la sesion del usuario dentro del cliente.
+def get_supabase_auth_client() -> Client:
+    falso = _cliente_falso()
+    if falso is not None:
+        return falso
+    _validar_credenciales()
+    return create_client(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_ANON_KEY,
+        options=ClientOptions(
+            postgrest_client_timeout=_configuracion_pool()["timeout"],
+            auto_refresh_token=False,
+            persist_session=False,
+        ),
+    )
+
+
+# Cierra los pools HTTP del proceso actual; se usa al apagar el worker.
+def cerrar_clientes_supabase() -> None:
+    if _registro["pid"] != os.getpid():
+        return
+    with _registro_lock:
+        for entrada in _registro["clientes"].values():
+            cliente = entrada["cliente"]
+            http = getattr(getattr(cliente, "options", None), "httpx_client", None)
+            try:
+                if http is not None:
+                    http.close()
+                elif getattr(cliente, "_postgrest", None) is not None:
+                    cliente._postgrest.session.close()
+            except Exception:
+                # El cierre es best-effort; el proceso esta terminando.
+                pass
+        _registro["clientes"] = {}
+
+
+# Estado del registro para health checks y monitoreo (ver aexfy_admin/salud.py).
+def estado_clientes_supabase() -> dict:
+    ahora = time.time()
+    return {
+        "pid": _registro["pid"],
+        "pid_actual": os.getpid(),
+        "activo_segundos": round(ahora - _registro["iniciado_en"], 1),
+        "config": _configuracion_pool(),
+        "clientes": [
+            {
+                "clave": clave,
+                "edad_segundos": round(ahora - entrada["creado_en"], 1),
+                "usos": entrada["usos"],
+            }
+            for clave, entrada in list(_registro["clientes"].items())
+        ],
+        **_estadisticas,
+    }
+
+
+if hasattr(os, "register_at_fork"):
+    # Gunicorn con preload hace fork despues de importar; el hijo arranca con registro vacio.
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+atexit.register(cerrar_clientes_supabase)
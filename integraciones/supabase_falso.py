@@ -0,0 +1,911 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from django.conf import settings
+from postgrest.exceptions import APIError
+from supabase_auth.errors import AuthApiError
+
+from integraciones.instrumentacion import registrar_llamada
+
+# Cliente Supabase en memoria para medir y probar sin red (SUPABASE_FALSO en settings.py).
+# Imita la superficie que usa el proyecto: rpc(...).execute() de cada services.py, las tablas
+# v_usuarios_login y realtime_events, y auth (sign_in_with_password y auth.admin). Los datos se
+# generan con semilla fija para que dos corridas del benchmark sean comparables.
+
+# Codigo PostgREST de funcion inexistente; integraciones/lotes.py lo reconoce.
+CODIGO_FUNCION_INEXISTENTE = "PGRST202"
+ZONAS = ("NG", "NC", "CT", "SR", "AU")
+ROLES_STAFF = ("Gerente", "Supervisor", "Vendedor", "Capacitador", "Instalador", "Jefe de soporte", "Jefe RRHH")
+NOMBRES = ("Camila", "Diego", "Valentina", "Matias", "Francisca", "Benjamin", "Javiera", "Tomas", "Catalina", "Vicente")
+APELLIDOS = ("Gonzalez", "Munoz", "Rojas", "Diaz", "Perez", "Soto", "Contreras", "Silva", "Martinez", "Sepulveda")
+SEGMENTOS = ("Retail", "Mineria", "Salud", "Educacion", "Construccion", "Logistica", "Agroindustria", "Servicios")
+REGIONES = (
+    ("Arica y Parinacota", "NG"), ("Tarapaca", "NG"), ("Antofagasta", "NG"), ("Atacama", "NC"),
+    ("Coquimbo", "NC"), ("Valparaiso", "CT"), ("Metropolitana", "CT"), ("O'Higgins", "CT"),
+    ("Maule", "CT"), ("Nuble", "SR"), ("Biobio", "SR"), ("La Araucania", "SR"),
+    ("Los Rios", "SR"), ("Los Lagos", "SR"), ("Aysen", "AU"), ("Magallanes", "AU"),
+)
+# Columnas de la vista public.v_usuarios_login.
+COLUMNAS_USUARIOS_LOGIN = ("id", "auth_id", "email", "rut", "estado", "nombres", "apellidos", "zona", "tipo_usuario")
+# Usuario duenio sembrado; permite iniciar sesion en el stand-in con SUPABASE_FALSO_PASSWORD.
+RUT_OWNER = "11.111.111-1"
+EMAIL_OWNER = "aexfytech@gmail.com"
+
+_lock = threading.Lock()
+_estado = {"cliente": None}
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Serializa como lo haria PostgREST: copia independiente y fechas en ISO.
+def _json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _fecha(valor) -> datetime | None:
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+
+
+def _contiene(busqueda: str | None, *valores) -> bool:
+    if not busqueda:
+        return True
+    busqueda = busqueda.lower()
+    return any(busqueda in (valor or "").lower() for valor in valores)
+
+
+def _rut(rng: random.Random) -> str:
+    numero = rng.randint(5_000_000, 25_999_999)
+    cuerpo = f"{numero:,}".replace(",", ".")
+    return f"{cuerpo}-{rng.choice('0123456789K')}"
+
+
+# Error de PostgREST con el mismo formato que devuelve la API real.
+def _error_api(mensaje: str, codigo: str = "P0001") -> APIError:
+    return APIError({"message": mensaje, "code": codigo, "hint": None, "details": None})
+
+
+# Error de Auth compatible con las firmas de supabase_auth (con y sin code).
+def _error_auth(mensaje: str, estado: int = 400) -> AuthApiError:
+    try:
+        return AuthApiError(mensaje, estado, None)
+    except TypeError:
+        return AuthApiError(mensaje, estado)
+
+
+# Latencia inyectada por llamada: base mas variacion uniforme (SUPABASE_FALSO_LATENCIA_MS/VARIACION_MS).
+def _esperar(rng: random.Random) -> None:
+    base = float(getattr(settings, "SUPABASE_FALSO_LATENCIA_MS", 0))
+    variacion = float(getattr(settings, "SUPABASE_FALSO_VARIACION_MS", 0))
+    ms = base + (rng.uniform(0, variacion) if variacion else 0)
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+# Datos en memoria del proceso; cada metodo _rpc_<nombre> replica una funcion de DB_Aexfy.db.
+class _Base:
+    def __init__(self, semilla: int, usuarios: int, empresas: int, solicitudes: int, eventos: int):
+        self.lock = threading.RLock()
+        self.rng = random.Random(semilla)
+        self.usuarios = {}
+        self.roles = {}
+        self.empresas = {}
+        self.solicitudes = {}
+        self.auditoria = {}
+        self.auth = {}
+        self.realtime = []
+        self._realtime_ids = itertools.count(1)
+        # Orden cacheado de cada listado; _version cambia con cada escritura (ver _evento).
+        self._orden = {}
+        self._version = 0
+        self.segmentos = [
+            {"id": i, "nombre": nombre, "descripcion": f"Segmento {nombre}"}
+            for i, nombre in enumerate(SEGMENTOS, 1)
+        ]
+        self.regiones = [
+            {"id": i, "nombre": nombre, "zona": zona}
+            for i, (nombre, zona) in enumerate(REGIONES, 1)
+        ]
+        self._sembrar(usuarios, empresas, solicitudes, eventos)
+
+    # Genera datos con fechas repartidas en el ultimo ano; el owner siempre es el primer usuario.
+    def _sembrar(self, usuarios: int, empresas: int, solicitudes: int, eventos: int) -> None:
+        rng = self.rng
+        inicio = _ahora() - timedelta(days=365)
+
+        def fecha():
+            return inicio + timedelta(seconds=rng.randint(0, 365 * 86400))
+
+        owner = self._insertar_usuario(
+            email=EMAIL_OWNER, nombres="Aexfy", apellidos="Tech", rut=RUT_OWNER,
+            tipo_usuario="staff_aexfy", estado="activo", zona=None, rol="AexfyOwner", creado_en=inicio,
+        )
+        for i in range(1, usuarios):
+            nombres = rng.choice(NOMBRES)
+            apellidos = rng.choice(APELLIDOS)
+            self._insertar_usuario(
+                email=f"{nombres}.{apellidos}.{i}@aexfy.local".lower(),
+                nombres=nombres,
+                apellidos=apellidos,
+                rut=_rut(rng),
+                tipo_usuario=rng.choice(("staff_aexfy", "staff_aexfy", "propietario_cliente", "trabajador_cliente")),
+                estado=rng.choice(("activo", "activo", "activo", "inactivo", "suspendido")),
+                zona=rng.choice(ZONAS),
+                rol=rng.choice(ROLES_STAFF),
+                creado_en=fecha(),
+            )
+        for i in range(empresas):
+            region = rng.choice(self.regiones)
+            empresa_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            self.empresas[empresa_id] = {
+                "id": empresa_id,
+                "rut": _rut(rng),
+                "razon_social": f"Empresa {i} SpA",
+                "nombre_fantasia": f"Fantasia {i}",
+                "giro": "Servicios",
+                "segmento_id": rng.choice(self.segmentos)["id"],
+                "region_id": region["id"],
+                "region": region["nombre"],
+                "ciudad": region["nombre"],
+                "comuna": region["nombre"],
+                "direccion": f"Calle {i}",
+                "telefono": f"9{rng.randint(10_000_000, 99_999_999)}",
+                "email": f"contacto{i}@empresa.local",
+                "estado": rng.choice(("activo", "activo", "inactivo", "suspendido")),
+                "plan": rng.choice(("starter", "pro", "enterprise")),
+                "owner_email": f"owner{i}@empresa.local",
+                "seller_email": EMAIL_OWNER,
+                "company_code": f"AX-{i:06d}",
+                "zona": region["zona"],
+                "creado_en": fecha(),
+            }
+        for _ in range(solicitudes):
+            solicitud_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            self.solicitudes[solicitud_id] = {
+                "id": solicitud_id,
+                "request_type": rng.choice(("company", "staff")),
+                "status": rng.choice(("pendiente", "aprobado", "rechazado")),
+                "created_at": fecha(),
+                "submitted_by": owner["id"],
+                "reviewed_by": None,
+                "decision_note": None,
+                "metadata": {"p_zona": rng.choice(ZONAS), "p_email": f"solicitud{solicitud_id[:8]}@aexfy.local"},
+            }
+        for _ in range(eventos):
+            evento_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            self.auditoria[evento_id] = {
+                "id": evento_id,
+                "actor_id": owner["id"],
+                "actor_email": EMAIL_OWNER,
+                "accion": rng.choice(("usuario_actualizado", "empresa_creada", "empresa_actualizada", "usuario_creado")),
+                "tabla_objetivo": rng.choice(("usuarios", "clientes")),
+                "id_objetivo": None,
+                "registrado_en": fecha(),
+                "severidad": rng.choice(("baja", "media", "media", "alta")),
+                "metadatos": {},
+            }
+
+    def _insertar_usuario(self, *, email, nombres, apellidos, rut, tipo_usuario, estado, zona, rol, creado_en=None, auth_id=None):
+        usuario_id = str(uuid.UUID(int=self.rng.getrandbits(128)))
+        if auth_id is None:
+            auth_id = str(uuid.UUID(int=self.rng.getrandbits(128)))
+            self.auth[auth_id] = {"id": auth_id, "email": email, "user_metadata": {}}
+        usuario = {
+            "id": usuario_id,
+            "auth_id": auth_id,
+            "email": email,
+            "nombres": nombres,
+            "apellidos": apellidos,
+            "segundo_nombre": None,
+            "apellido_materno": None,
+            "rut": rut,
+            "tipo_usuario": tipo_usuario,
+            "estado": estado,
+            "telefono": None,
+            "telefono_emergencia": None,
+            "zona": zona,
+            "metadatos": {},
+            "creado_en": creado_en or _ahora(),
+        }
+        self.usuarios[usuario_id] = usuario
+        self.roles[usuario_id] = [rol] if rol else []
+        return usuario
+
+    # Registra un cambio en public.realtime_events como lo hace emit_realtime_event().
+    def _evento(self, tabla: str, accion: str, entidad_id) -> None:
+        self._version += 1
+        self.realtime.append(
+            {
+                "id": next(self._realtime_ids),
+                "tabla": tabla,
+                "accion": accion,
+                "entidad_id": str(entidad_id) if entidad_id else None,
+                "creado_en": _ahora(),
+            }
+        )
+
+    def _usuario_fila(self, usuario: dict, completo: bool = True) -> dict:
+        fila = {**usuario, "roles": list(self.roles.get(usuario["id"], []))}
+        if completo:
+            fila["invite_link"] = usuario["metadatos"].get("invite_link")
+        else:
+            fila.pop("creado_en")
+            fila.pop("metadatos")
+        return fila
+
+    def _solicitud_fila(self, solicitud: dict) -> dict:
+        enviado = self.usuarios.get(solicitud["submitted_by"] or "") or {}
+        revisado = self.usuarios.get(solicitud["reviewed_by"] or "") or {}
+        return {**solicitud, "submitted_email": enviado.get("email"), "reviewed_email": revisado.get("email")}
+
+    # Registros de una coleccion en orden (fecha, id) desc, como el indice de cada listado.
+    # Se reordena solo despues de una escritura; con 100k filas ordenar en cada pagina mediria al falso.
+    def _ordenados(self, nombre: str, registros: dict, campo_fecha: str) -> list[dict]:
+        version, filas = self._orden.get(nombre, (None, None))
+        if version != self._version:
+            filas = sorted(registros.values(), key=lambda f: (f[campo_fecha], f["id"]), reverse=True)
+            self._orden[nombre] = (self._version, filas)
+        return filas
+
+    # Paginacion por cursor (fecha, id) desc con total opcional; igual contrato que los listar_*_admin.
+    # Recibe los registros ya filtrados y ordenados; solo las filas de la pagina se convierten.
+    @staticmethod
+    def _paginar(filas: list[dict], campo_fecha: str, cursor_fecha, p: dict, convertir) -> list[dict]:
+        limite = int(p.get("p_limit") or 100)
+        cursor_fecha = _fecha(cursor_fecha)
+        cursor_id = p.get("p_cursor_id")
+        if cursor_fecha and cursor_id:
+            clave = (cursor_fecha, str(cursor_id))
+            if p.get("p_antes"):
+                fin = next((i for i, f in enumerate(filas) if (f[campo_fecha], f["id"]) <= clave), len(filas))
+                pagina = filas[max(fin - limite, 0):fin]
+            else:
+                inicio = next((i for i, f in enumerate(filas) if (f[campo_fecha], f["id"]) < clave), len(filas))
+                pagina = filas[inicio:inicio + limite]
+        else:
+            offset = int(p.get("p_offset") or 0)
+            pagina = filas[offset:offset + limite]
+        total, exacto = None, None
+        if p.get("p_contar"):
+            total = len(filas)
+            exacto = total <= int(p.get("p_umbral_exacto") or 10000)
+        return [{**convertir(fila), "total_filas": total, "total_exacto": exacto} for fila in pagina]
+
+    # --- Sesion y autorizacion ---
+
+    def _rpc_contexto_sesion_admin(self, p):
+        usuario = self.usuarios.get(str(p.get("p_usuario_id")))
+        if not usuario:
+            return []
+        return [{
+            "usuario_id": usuario["id"],
+            "roles": list(self.roles.get(usuario["id"], [])),
+            "session_key": usuario["metadatos"].get("session_key"),
+            "zona": usuario["zona"],
+            "estado": usuario["estado"],
+        }]
+
+    def _rpc_obtener_sesion_usuario_admin(self, p):
+        usuario = self.usuarios.get(str(p.get("p_usuario_id"))) or {"metadatos": {}}
+        return {"session_key": usuario["metadatos"].get("session_key")}
+
+    def _rpc_registrar_sesion_usuario_admin(self, p):
+        usuario = self.usuarios.get(str(p.get("p_usuario_id")))
+        if usuario:
+            if p.get("p_session_key"):
+                usuario["metadatos"].update({"session_key": p["p_session_key"], "session_ip": p.get("p_ip")})
+            else:
+                usuario["metadatos"].pop("session_key", None)
+            self._evento("usuarios", "update", usuario["id"])
+        return {"usuario_id": p.get("p_usuario_id"), "session_key": p.get("p_session_key")}
+
+    def _rpc_obtener_roles_usuario_admin(self, p):
+        return [{"roles": list(self.roles.get(str(p.get("p_usuario_id")), []))}]
+
+    def _rpc_buscar_usuario_auth_por_email_admin(self, p):
+        email = (p.get("p_email") or "").strip().lower()
+        return [{"id": u["id"], "email": u["email"]} for u in self.auth.values() if u["email"] == email][:1]
+
+    def _rpc_validar_unicidad_staff(self, p):
+        errores = {}
+        if any(u["rut"] == p.get("p_rut") for u in self.usuarios.values()):
+            errores["rut"] = "El RUT ya esta registrado."
+        email = p.get("p_email")
+        if any(u["email"] == email for u in self.usuarios.values()) or any(u["email"] == email for u in self.auth.values()):
+            errores["email"] = "El correo ya esta registrado."
+        if p.get("p_telefono") and any(u["telefono"] == p["p_telefono"] for u in self.usuarios.values()):
+            errores["telefono"] = "El numero ya esta registrado."
+        return errores
+
+    # --- Usuarios ---
+
+    def _rpc_listar_usuarios_admin(self, p):
+        filas = [
+            u
+            for u in self._ordenados("usuarios", self.usuarios, "creado_en")
+            if (not p.get("p_estado") or u["estado"] == p["p_estado"])
+            and (not p.get("p_tipo") or u["tipo_usuario"] == p["p_tipo"])
+            and (not p.get("p_zona") or u["zona"] == p["p_zona"])
+            and (not p.get("p_rol") or p["p_rol"] in self.roles.get(u["id"], []))
+            and _contiene(p.get("p_busqueda"), u["email"], u["rut"], u["nombres"], u["apellidos"])
+            and not (p.get("p_excluir_owner") and "AexfyOwner" in self.roles.get(u["id"], []))
+        ]
+        return self._paginar(filas, "creado_en", p.get("p_cursor_creado_en"), p, self._usuario_fila)
+
+    def _rpc_obtener_usuario_admin(self, p):
+        usuario = self.usuarios.get(str(p.get("p_usuario_id")))
+        return [self._usuario_fila(usuario, completo=False)] if usuario else []
+
+    def _rpc_obtener_usuarios_admin(self, p):
+        ids = [str(i) for i in p.get("p_usuario_ids") or []]
+        return [self._usuario_fila(self.usuarios[i]) for i in ids if i in self.usuarios]
+
+    def _rpc_resumen_usuarios_admin(self, p):
+        return {
+            clave: [
+                {campo_salida: valor, "total": sum(1 for u in self.usuarios.values() if u[campo] == valor)}
+                for valor in sorted({u[campo] for u in self.usuarios.values()}, key=lambda v: v or "")
+            ]
+            for clave, campo, campo_salida in (("zonas", "zona", "zona"), ("estados", "estado", "estado"), ("tipos", "tipo_usuario", "tipo"))
+        }
+
+    def _rpc_crear_usuario_staff(self, p):
+        usuario = self._insertar_usuario(
+            email=p.get("p_email"), nombres=p.get("p_nombres"), apellidos=p.get("p_apellidos"),
+            rut=p.get("p_rut"), tipo_usuario=p.get("p_tipo_usuario"), estado=p.get("p_estado") or "activo",
+            zona=p.get("p_zona"), rol=p.get("p_rol"), auth_id=p.get("p_auth_id"),
+        )
+        usuario.update(
+            {
+                "segundo_nombre": p.get("p_segundo_nombre"),
+                "apellido_materno": p.get("p_apellido_materno"),
+                "telefono": p.get("p_telefono"),
+                "telefono_emergencia": p.get("p_telefono_emergencia"),
+            }
+        )
+        self._evento("usuarios", "insert", usuario["id"])
+        return {"usuario_id": usuario["id"], "rol_id": None}
+
+    def _rpc_actualizar_usuario_admin(self, p):
+        usuario = self.usuarios.get(str(p.get("p_usuario_id")))
+        if not usuario:
+            raise _error_api("Usuario no encontrado.")
+        for campo in ("email", "nombres", "apellidos", "segundo_nombre", "apellido_materno", "rut",
+                      "tipo_usuario", "estado", "telefono", "telefono_emergencia", "zona"):
+            usuario[campo] = p.get(f"p_{campo}")
+        if p.get("p_rol"):
+            self.roles[usuario["id"]] = [p["p_rol"]]
+        self._evento("usuarios", "update", usuario["id"])
+        return {"usuario_id": usuario["id"], "rol_id": None}
+
+    def _rpc_actualizar_invite_usuario_admin(self, p):
+        usuario = self.usuarios.get(str(p.get("p_usuario_id")))
+        if usuario:
+            usuario["metadatos"]["invite_link"] = p.get("p_invite_link")
+            self._evento("usuarios", "update", usuario["id"])
+        return {"usuario_id": p.get("p_usuario_id"), "invite_link": p.get("p_invite_link")}
+
+    def _rpc_cambios_masivos_usuarios(self, p):
+        campo = {"estado": "estado", "zona": "zona", "rol": None}.get(p.get("p_accion"), "?")
+        if campo == "?":
+            raise _error_api("Accion masiva no soportada.")
+        actualizados = 0
+        for usuario_id in map(str, p.get("p_usuario_ids") or []):
+            if usuario_id not in self.usuarios:
+                continue
+            if campo:
+                self.usuarios[usuario_id][campo] = p.get("p_valor")
+            else:
+                self.roles[usuario_id] = [p.get("p_valor")]
+            self._evento("usuarios", "update", usuario_id)
+            actualizados += 1
+        return actualizados
+
+    def _eliminar_usuario(self, usuario_id: str) -> dict | None:
+        usuario = self.usuarios.pop(usuario_id, None)
+        if usuario:
+            self.roles.pop(usuario_id, None)
+            self.auth.pop(usuario["auth_id"], None)
+            self._evento("usuarios", "delete", usuario_id)
+        return usuario
+
+    def _rpc_eliminar_usuario_admin_text(self, p):
+        usuario = self._eliminar_usuario(str(p.get("p_usuario_id")))
+        if not usuario:
+            raise _error_api("Usuario no encontrado.")
+        return {"usuario_id": usuario["id"], "email": usuario["email"]}
+
+    def _rpc_eliminar_usuarios_masivo_admin(self, p):
+        eliminados, omitidos = [], []
+        for usuario_id in dict.fromkeys(map(str, p.get("p_usuario_ids") or [])):
+            usuario = self.usuarios.get(usuario_id)
+            if not usuario:
+                motivo = "no_encontrado"
+            elif usuario_id == str(p.get("p_actor_id")):
+                motivo = "propio_usuario"
+            elif "AexfyOwner" in self.roles.get(usuario_id, []):
+                motivo = "aexfy_owner"
+            else:
+                self._eliminar_usuario(usuario_id)
+                eliminados.append({"id": usuario_id, "email": usuario["email"]})
+                continue
+            omitidos.append({"id": usuario_id, "motivo": motivo})
+        return {"eliminados": eliminados, "omitidos": omitidos}
+
+    # --- Empresas y catalogos ---
+
+    def _rpc_listar_segmentos_admin(self, p):
+        return sorted(self.segmentos, key=lambda s: s["nombre"])
+
+    def _rpc_listar_regiones_admin(self, p):
+        return list(self.regiones)
+
+    def _rpc_listar_empresas_admin(self, p):
+        filas = [
+            e
+            for e in self._ordenados("empresas", self.empresas, "creado_en")
+            if (not p.get("p_estado") or e["estado"] == p["p_estado"])
+            and (not p.get("p_plan") or e["plan"] == p["p_plan"])
+            and (not p.get("p_zona") or e["zona"] == p["p_zona"])
+            and _contiene(p.get("p_busqueda"), e["rut"], e["razon_social"], e["nombre_fantasia"], e["email"])
+        ]
+        return self._paginar(filas, "creado_en", p.get("p_cursor_creado_en"), p, dict)
+
+    def _rpc_obtener_empresa_admin(self, p):
+        empresa = self.empresas.get(str(p.get("p_empresa_id")))
+        return [{k: v for k, v in empresa.items() if k != "creado_en"}] if empresa else []
+
+    def _rpc_obtener_empresas_admin(self, p):
+        ids = [str(i) for i in p.get("p_empresa_ids") or []]
+        return [{k: v for k, v in self.empresas[i].items() if k != "creado_en"} for i in ids if i in self.empresas]
+
+    def _rpc_resumen_empresas_admin(self, p):
+        return {
+            clave: [
+                {campo: valor, "total": sum(1 for e in self.empresas.values() if e[campo] == valor)}
+                for valor in sorted({e[campo] for e in self.empresas.values()}, key=lambda v: v or "")
+            ]
+            for clave, campo in (("zonas", "zona"), ("estados", "estado"), ("planes", "plan"))
+        }
+
+    def _guardar_empresa(self, empresa_id: str, p: dict) -> dict:
+        empresa = self.empresas.setdefault(
+            empresa_id,
+            {"id": empresa_id, "company_code": f"AX-{len(self.empresas):06d}", "creado_en": _ahora()},
+        )
+        for campo in ("rut", "razon_social", "nombre_fantasia", "giro", "segmento_id", "region_id", "region",
+                      "ciudad", "comuna", "direccion", "telefono", "email", "estado", "plan",
+                      "owner_email", "seller_email", "zona"):
+            empresa[campo] = p.get(f"p_{campo}")
+        return empresa
+
+    def _rpc_crear_empresa_admin(self, p):
+        if any(e["rut"] == p.get("p_rut") for e in self.empresas.values()):
+            raise _error_api("El RUT de empresa ya esta registrado.")
+        empresa = self._guardar_empresa(str(uuid.uuid4()), p)
+        self._evento("clientes", "insert", empresa["id"])
+        return {"empresa_id": empresa["id"], "company_code": empresa["company_code"]}
+
+    def _rpc_crear_empresa_con_owner_admin(self, p):
+        resultado = self._rpc_crear_empresa_admin(p)
+        owner = self._insertar_usuario(
+            email=p.get("p_owner_email"), nombres=p.get("p_owner_primer_nombre"),
+            apellidos=p.get("p_owner_apellido_paterno"), rut=p.get("p_owner_rut"),
+            tipo_usuario=p.get("p_owner_tipo_usuario") or "propietario_cliente", estado="activo",
+            zona=p.get("p_zona"), rol=p.get("p_owner_rol"), auth_id=p.get("p_owner_auth_id"),
+        )
+        self._evento("usuarios", "insert", owner["id"])
+        return {**resultado, "owner_usuario_id": owner["id"]}
+
+    def _rpc_actualizar_empresa_admin(self, p):
+        empresa_id = str(p.get("p_empresa_id"))
+        if empresa_id not in self.empresas:
+            raise _error_api("Empresa no encontrada.")
+        empresa = self._guardar_empresa(empresa_id, p)
+        self._evento("clientes", "update", empresa_id)
+        return {"empresa_id": empresa_id, "company_code": empresa["company_code"]}
+
+    def _rpc_eliminar_empresa_admin(self, p):
+        empresa = self.empresas.pop(str(p.get("p_empresa_id")), None)
+        if not empresa:
+            raise _error_api("Empresa no encontrada.")
+        self._evento("clientes", "delete", empresa["id"])
+        return {"empresa_id": empresa["id"], "rut": empresa["rut"], "email": empresa["email"], "usuarios_eliminados": 0}
+
+    def _rpc_cambios_masivos_empresas(self, p):
+        campo = p.get("p_accion")
+        if campo not in {"estado", "plan", "zona"}:
+            raise _error_api("Accion masiva no soportada.")
+        actualizados = 0
+        for empresa_id in map(str, p.get("p_empresa_ids") or []):
+            if empresa_id in self.empresas:
+                self.empresas[empresa_id][campo] = p.get("p_valor")
+                self._evento("clientes", "update", empresa_id)
+                actualizados += 1
+        return actualizados
+
+    # --- Solicitudes ---
+
+    def _rpc_listar_solicitudes_admin(self, p):
+        filas = [
+            s
+            for s in self._ordenados("solicitudes", self.solicitudes, "created_at")
+            if (not p.get("p_estado") or s["status"] == p["p_estado"])
+            and (not p.get("p_tipo") or s["request_type"] == p["p_tipo"])
+            and (not p.get("p_zona") or (s["metadata"] or {}).get("p_zona") == p["p_zona"])
+        ]
+        return self._paginar(filas, "created_at", p.get("p_cursor_created_at"), p, self._solicitud_fila)
+
+    def _rpc_obtener_solicitud_admin(self, p):
+        solicitud = self.solicitudes.get(str(p.get("p_request_id")))
+        return [self._solicitud_fila(solicitud)] if solicitud else []
+
+    def _crear_solicitud(self, p) -> dict:
+        solicitud_id = str(uuid.uuid4())
+        self.solicitudes[solicitud_id] = {
+            "id": solicitud_id,
+            "request_type": p.get("p_request_type"),
+            "status": p.get("p_status") or "pendiente",
+            "created_at": _ahora(),
+            "submitted_by": p.get("p_submitted_by"),
+            "reviewed_by": None,
+            "decision_note": None,
+            "metadata": p.get("p_metadata") or {},
+        }
+        self._evento("requests", "insert", solicitud_id)
+        return {"request_id": solicitud_id}
+
+    def _rpc_crear_solicitud_admin(self, p):
+        return self._crear_solicitud(p)
+
+    # Solicitud de alta de empresa (empresas_crear_view sin rol owner); misma tabla que las genericas.
+    def _rpc_crear_solicitud_empresa_admin(self, p):
+        return self._crear_solicitud(p)
+
+    def _rpc_actualizar_solicitud_admin(self, p):
+        solicitud = self.solicitudes.get(str(p.get("p_request_id")))
+        if not solicitud:
+            raise _error_api("Solicitud no encontrada.")
+        solicitud.update(
+            {"status": p.get("p_status"), "reviewed_by": p.get("p_reviewer_id"), "decision_note": p.get("p_decision_note")}
+        )
+        self._evento("requests", "update", solicitud["id"])
+        return {"request_id": solicitud["id"], "status": solicitud["status"]}
+
+    # --- Auditoria y realtime ---
+
+    def _rpc_listar_auditoria_admin(self, p):
+        desde, hasta = _fecha(p.get("p_fecha_desde")), _fecha(p.get("p_fecha_hasta"))
+        filas = [
+            e
+            for e in self._ordenados("auditoria", self.auditoria, "registrado_en")
+            if (not p.get("p_severidad") or e["severidad"] == p["p_severidad"])
+            and (desde is None or e["registrado_en"] >= desde)
+            and (hasta is None or e["registrado_en"] <= hasta)
+            and _contiene(p.get("p_busqueda"), e["actor_email"], e["accion"], e["tabla_objetivo"], e["id_objetivo"])
+        ]
+        return self._paginar(filas, "registrado_en", p.get("p_cursor_registrado_en"), p, dict)
+
+    def _rpc_obtener_auditoria_admin(self, p):
+        evento = self.auditoria.get(str(p.get("p_evento_id")))
+        return [dict(evento)] if evento else []
+
+    def _insertar_auditoria(self, evento: dict) -> bool:
+        evento_id = str(evento.get("id") or uuid.uuid4())
+        if evento_id in self.auditoria:
+            return False
+        self.auditoria[evento_id] = {
+            "id": evento_id,
+            "actor_id": evento.get("actor_id") if evento.get("actor_id") in self.usuarios else None,
+            "actor_email": evento.get("actor_email"),
+            "accion": evento.get("accion"),
+            "tabla_objetivo": evento.get("tabla_objetivo"),
+            "id_objetivo": evento.get("id_objetivo"),
+            "registrado_en": _fecha(evento.get("registrado_en")) or _ahora(),
+            "severidad": evento.get("severidad") or "media",
+            "metadatos": evento.get("metadatos") or {},
+        }
+        self._evento("eventos_auditoria", "insert", evento_id)
+        return True
+
+    def _rpc_registrar_evento_auditoria(self, p):
+        evento = {clave[2:]: valor for clave, valor in p.items()}
+        evento_id = str(uuid.uuid4())
+        self._insertar_auditoria({**evento, "id": evento_id})
+        return {"evento_id": evento_id}
+
+    def _rpc_registrar_eventos_auditoria_lote(self, p):
+        return sum(1 for evento in p.get("p_eventos") or [] if self._insertar_auditoria(evento))
+
+    def _rpc_purgar_realtime_events(self, p):
+        limite = _ahora() - timedelta(hours=24)
+        antes = len(self.realtime)
+        self.realtime[:] = [e for e in self.realtime if e["creado_en"] >= limite]
+        return antes - len(self.realtime)
+
+    # Terminal SQL: solo "select * from aexfy.<tabla> [limit n]" sobre los datos en memoria.
+    def _rpc_ejecutar_sql_admin(self, p):
+        colecciones = {
+            "usuarios": self.usuarios,
+            "clientes": self.empresas,
+            "requests": self.solicitudes,
+            "eventos_auditoria": self.auditoria,
+        }
+        coincide = re.fullmatch(
+            r"\s*select\s+\*\s+from\s+(?:aexfy\.)?(\w+)(?:\s+limit\s+(\d+))?\s*;?\s*",
+            p.get("p_sql") or "",
+            re.IGNORECASE,
+        )
+        if not coincide or coincide.group(1).lower() not in colecciones:
+            raise _error_api("El cliente falso solo ejecuta select * from aexfy.<tabla> [limit n].")
+        filas = list(colecciones[coincide.group(1).lower()].values())[: int(coincide.group(2) or 1000)]
+        return {"tipo": "select", "rows": [dict(fila) for fila in filas]}
+
+    # Despachador de lotes; mismo contrato que public.ejecutar_lote_admin.
+    def _rpc_ejecutar_lote_admin(self, p):
+        salidas = []
+        for llamada in p.get("p_llamadas") or []:
+            try:
+                salidas.append({"ok": True, "data": self.llamar(llamada.get("funcion"), llamada.get("parametros") or {})})
+            except APIError as exc:
+                salidas.append({"ok": False, "error": exc.message})
+        return salidas
+
+    # Ejecuta una RPC por nombre; las no implementadas responden como funcion inexistente.
+    def llamar(self, nombre: str, parametros: dict):
+        manejador = getattr(self, f"_rpc_{nombre}", None)
+        if manejador is None:
+            raise _error_api(f"Funcion {nombre} no disponible en el cliente falso.", CODIGO_FUNCION_INEXISTENTE)
+        with self.lock:
+            return manejador(parametros or {})
+
+    # Filas y columnas visibles de una tabla o vista para consultas .table(...); None si no existe.
+    # Se entregan los registros sin copiar; la consulta proyecta solo las filas que pasan los filtros.
+    def tabla(self, nombre: str) -> tuple[list[dict], tuple | None] | None:
+        if nombre == "realtime_events":
+            return list(self.realtime), None
+        if nombre == "v_usuarios_login":
+            return list(self.usuarios.values()), COLUMNAS_USUARIOS_LOGIN
+        return None
+
+
+# Respuesta con atributo data, como postgrest.APIResponse.
+class _Respuesta:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+# Ejecuta una operacion con la latencia configurada y la registra en integraciones/instrumentacion.py.
+def _medir(cliente, nombre: str, carga, operacion):
+    inicio = time.perf_counter()
+    enviados = len(json.dumps(carga, default=_json)) if carga is not None else 0
+    try:
+        _esperar(cliente.rng)
+        data = json.loads(json.dumps(operacion(), default=_json))
+    except Exception as exc:
+        registrar_llamada(nombre, time.perf_counter() - inicio, enviados, 0, type(exc).__name__)
+        raise
+    registrar_llamada(nombre, time.perf_counter() - inicio, enviados, len(json.dumps(data)), None)
+    return data
+
+
+# Resultado de cliente.rpc(nombre, parametros); se ejecuta con execute().
+class _ConsultaRPC:
+    def __init__(self, cliente, nombre: str, parametros: dict):
+        self._cliente = cliente
+        self._nombre = nombre
+        self._parametros = parametros
+
+    def execute(self) -> _Respuesta:
+        base = self._cliente.base
+        return _Respuesta(
+            _medir(self._cliente, f"rpc.{self._nombre}", self._parametros, lambda: base.llamar(self._nombre, self._parametros))
+        )
+
+
+# Consulta encadenable sobre una tabla (select, eq, gt, order, limit) como postgrest.
+class _ConsultaTabla:
+    def __init__(self, cliente, nombre: str):
+        self._cliente = cliente
+        self._nombre = nombre
+        self._columnas = None
+        self._filtros = []
+        self._orden = None
+        self._limite = None
+
+    def select(self, columnas: str = "*", **_):
+        if columnas and columnas.strip() != "*":
+            self._columnas = [c.strip() for c in columnas.split(",")]
+        return self
+
+    def eq(self, columna: str, valor):
+        self._filtros.append(lambda fila: str(fila.get(columna)) == str(valor))
+        return self
+
+    def gt(self, columna: str, valor):
+        self._filtros.append(lambda fila: fila.get(columna) is not None and fila.get(columna) > valor)
+        return self
+
+    def order(self, columna: str, desc: bool = False, **_):
+        self._orden = (columna, desc)
+        return self
+
+    def limit(self, cantidad: int, **_):
+        self._limite = cantidad
+        return self
+
+    def _resolver(self) -> list[dict]:
+        with self._cliente.base.lock:
+            tabla = self._cliente.base.tabla(self._nombre)
+        if tabla is None:
+            raise _error_api(f"Tabla {self._nombre} no disponible en el cliente falso.", "42P01")
+        filas, visibles = tabla
+        filas = [fila for fila in filas if all(filtro(fila) for filtro in self._filtros)]
+        if self._orden:
+            columna, desc = self._orden
+            filas.sort(key=lambda fila: fila.get(columna), reverse=desc)
+        if self._limite is not None:
+            filas = filas[: self._limite]
+        columnas = self._columnas or visibles
+        if columnas:
+            filas = [{columna: fila.get(columna) for columna in columnas} for fila in filas]
+        else:
+            filas = [dict(fila) for fila in filas]
+        return filas
+
+    def execute(self) -> _Respuesta:
+        return _Respuesta(_medir(self._cliente, f"tabla.{self._nombre}", None, self._resolver))
+
+
+# auth.admin: usuarios de Auth en memoria (invitaciones, enlaces y metadatos).
+# Se registran como "auth", igual que el transporte medido agrupa /auth/v1/.
+class _AuthAdmin:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def _usuario(self, registro: dict):
+        return SimpleNamespace(id=registro["id"], email=registro["email"], user_metadata=registro["user_metadata"])
+
+    def _obtener_o_crear(self, email: str) -> dict:
+        auth = self._cliente.base.auth
+        for registro in auth.values():
+            if registro["email"] == email:
+                return registro
+        registro = {"id": str(uuid.uuid4()), "email": email, "user_metadata": {}}
+        auth[registro["id"]] = registro
+        return registro
+
+    def _ejecutar(self, carga, operacion):
+        def _con_lock():
+            with self._cliente.base.lock:
+                return operacion()
+
+        inicio = time.perf_counter()
+        enviados = len(json.dumps(carga, default=_json))
+        try:
+            _esperar(self._cliente.rng)
+            resultado = _con_lock()
+        except Exception as exc:
+            registrar_llamada("auth", time.perf_counter() - inicio, enviados, 0, type(exc).__name__)
+            raise
+        registrar_llamada("auth", time.perf_counter() - inicio, enviados, 0)
+        return resultado
+
+    def invite_user_by_email(self, email: str, opciones=None):
+        return self._ejecutar(
+            {"email": email},
+            lambda: SimpleNamespace(user=self._usuario(self._obtener_o_crear(email.strip().lower()))),
+        )
+
+    def generate_link(self, parametros: dict):
+        def _generar():
+            registro = self._obtener_o_crear(parametros["email"].strip().lower())
+            enlace = f"http://localhost/activar-password/#token={uuid.uuid4().hex}&type={parametros.get('type')}"
+            return SimpleNamespace(user=self._usuario(registro), properties=SimpleNamespace(action_link=enlace))
+
+        return self._ejecutar(parametros, _generar)
+
+    def create_user(self, atributos: dict):
+        def _crear():
+            registro = self._obtener_o_crear(atributos["email"].strip().lower())
+            registro["user_metadata"] = atributos.get("user_metadata") or {}
+            return SimpleNamespace(user=self._usuario(registro))
+
+        return self._ejecutar(atributos, _crear)
+
+    def update_user_by_id(self, usuario_id: str, atributos: dict):
+        def _actualizar():
+            registro = self._cliente.base.auth.get(str(usuario_id))
+            if registro is None:
+                raise _error_auth("User not found", 404)
+            registro["user_metadata"] = atributos.get("user_metadata", registro["user_metadata"])
+            if atributos.get("email"):
+                registro["email"] = atributos["email"].strip().lower()
+            return SimpleNamespace(user=self._usuario(registro))
+
+        return self._ejecutar(atributos, _actualizar)
+
+    def delete_user(self, usuario_id: str, *_):
+        return self._ejecutar({"id": usuario_id}, lambda: self._cliente.base.auth.pop(str(usuario_id), None))
+
+    def list_users(self, *_, **__):
+        return self._ejecutar({}, lambda: [self._usuario(r) for r in self._cliente.base.auth.values()])
+
+
+# auth: login con la contrasena unica del stand-in (SUPABASE_FALSO_PASSWORD).
+class _Auth:
+    def __init__(self, cliente):
+        self._cliente = cliente
+        self.admin = _AuthAdmin(cliente)
+
+    def sign_in_with_password(self, credenciales: dict):
+        def _iniciar():
+            email = (credenciales.get("email") or "").strip().lower()
+            registro = next((r for r in self._cliente.base.auth.values() if r["email"] == email), None)
+            password = getattr(settings, "SUPABASE_FALSO_PASSWORD", "")
+            if registro is None or not password or credenciales.get("password") != password:
+                raise _error_auth("Invalid login credentials")
+            sesion = SimpleNamespace(access_token=f"falso-{uuid.uuid4().hex}", refresh_token=uuid.uuid4().hex)
+            return SimpleNamespace(session=sesion, user=self.admin._usuario(registro))
+
+        return self.admin._ejecutar({"email": credenciales.get("email")}, _iniciar)
+
+
+# Cliente falso con la interfaz de supabase.Client que usa el proyecto.
+class ClienteFalso:
+    def __init__(self, base: _Base):
+        self.base = base
+        # Generador propio para la latencia; no altera la secuencia de datos sembrados.
+        self.rng = random.Random()
+        self.auth = _Auth(self)
+
+    def rpc(self, nombre: str, parametros: dict | None = None, **_):
+        return _ConsultaRPC(self, nombre, parametros or {})
+
+    def schema(self, _nombre: str):
+        return self
+
+    def table(self, nombre: str):
+        return _ConsultaTabla(self, nombre)
+
+    from_ = table
+
+
+# Cliente falso compartido del proceso; los datos se siembran una vez segun settings.py.
+def obtener_cliente_falso() -> ClienteFalso:
+    cliente = _estado["cliente"]
+    if cliente is not None:
+        return cliente
+    with _lock:
+        if _estado["cliente"] is None:
+            _estado["cliente"] = ClienteFalso(
+                _Base(
+                    semilla=int(getattr(settings, "SUPABASE_FALSO_SEMILLA", 1)),
+                    usuarios=int(getattr(settings, "SUPABASE_FALSO_USUARIOS", 2000)),
+                    empresas=int(getattr(settings, "SUPABASE_FALSO_EMPRESAS", 500)),
+                    solicitudes=int(getattr(settings, "SUPABASE_FALSO_SOLICITUDES", 500)),
+                    eventos=int(getattr(settings, "SUPABASE_FALSO_AUDITORIA", 5000)),
+                )
+            )
+        return _estado["cliente"]
+
+
+# Descarta los datos en memoria; el siguiente uso vuelve a sembrar (benchmarks repetibles).
+def reiniciar_cliente_falso() -> None:
+    with _lock:
+        _estado["cliente"] = None
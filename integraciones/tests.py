@@ -0,0 +1,232 @@
+import json
+import logging
+from unittest import mock
+
+import httpx
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+
+from empresas.services import crear_solicitud_empresa_admin
+from integraciones import politica
+from integraciones.instrumentacion import histogramas_llamadas
+from integraciones.lotes import ErrorLoteRPC, LoteRPC
+from integraciones.supabase_client import get_supabase_service_client
+from integraciones.supabase_falso import _Base, obtener_cliente_falso, reiniciar_cliente_falso
+from usuarios.services import listar_usuarios_admin, obtener_usuario_admin
+
+# Cliente Supabase en memoria (integraciones/supabase_falso.py) con un dataset chico y sin latencia.
+CLIENTE_FALSO = override_settings(
+    DEBUG=True,
+    SUPABASE_FALSO=True,
+    SUPABASE_FALSO_PASSWORD="prueba",
+    SUPABASE_FALSO_LATENCIA_MS=0,
+    SUPABASE_FALSO_VARIACION_MS=0,
+    SUPABASE_FALSO_USUARIOS=50,
+    SUPABASE_FALSO_EMPRESAS=10,
+    SUPABASE_FALSO_SOLICITUDES=10,
+    SUPABASE_FALSO_AUDITORIA=10,
+)
+# Politica con umbrales chicos: dos fallas abren el circuito y las lecturas no se reintentan.
+POLITICA_PRUEBA = override_settings(
+    SUPABASE_CIRCUITO_FALLAS=2,
+    SUPABASE_CIRCUITO_ESPERA_SEGUNDOS=60,
+    SUPABASE_REINTENTOS_LECTURA=0,
+    SUPABASE_RESPALDO_SEGUNDOS=300,
+)
+URL_RPC = "https://supabase.test/rest/v1/rpc/"
+
+
+# Llamadas registradas para una RPC en los histogramas del proceso.
+def _llamadas(nombre: str) -> int:
+    return histogramas_llamadas().get(nombre, {}).get("llamadas", 0)
+
+
+@CLIENTE_FALSO
+class ClienteFalsoTests(SimpleTestCase):
+    def setUp(self):
+        reiniciar_cliente_falso()
+
+    def tearDown(self):
+        reiniciar_cliente_falso()
+
+    def test_rechazado_sin_debug(self):
+        with override_settings(DEBUG=False), self.assertRaises(ImproperlyConfigured):
+            get_supabase_service_client()
+
+    def test_rechazado_sin_password(self):
+        with override_settings(SUPABASE_FALSO_PASSWORD=""), self.assertRaises(ImproperlyConfigured):
+            get_supabase_service_client()
+
+    def test_crear_solicitud_empresa(self):
+        base = obtener_cliente_falso().base
+        data = crear_solicitud_empresa_admin(
+            {
+                "p_request_type": "company",
+                "p_status": "pendiente",
+                "p_metadata": {"p_rut": "76.123.456-7"},
+                "p_submitted_by": None,
+            }
+        )
+        solicitud = base.solicitudes[data["request_id"]]
+        self.assertEqual(solicitud["request_type"], "company")
+        self.assertEqual(solicitud["metadata"], {"p_rut": "76.123.456-7"})
+
+
+@CLIENTE_FALSO
+class LoteRPCTests(SimpleTestCase):
+    def setUp(self):
+        reiniciar_cliente_falso()
+        base = obtener_cliente_falso().base
+        self.usuario_ids = sorted(base.usuarios)[:3]
+
+    def tearDown(self):
+        reiniciar_cliente_falso()
+
+    def test_lote_en_una_llamada(self):
+        antes_lote = _llamadas("rpc.ejecutar_lote_admin")
+        antes_individual = _llamadas("rpc.obtener_usuario_admin")
+        with LoteRPC() as lote:
+            resultados = [obtener_usuario_admin(usuario_id, lote=lote) for usuario_id in self.usuario_ids]
+        self.assertEqual([r.valor()["id"] for r in resultados], self.usuario_ids)
+        self.assertEqual(_llamadas("rpc.ejecutar_lote_admin") - antes_lote, 1)
+        self.assertEqual(_llamadas("rpc.obtener_usuario_admin") - antes_individual, 0)
+
+    def test_sin_despachador_vuelve_a_llamadas_individuales(self):
+        antes = _llamadas("rpc.obtener_usuario_admin")
+        # Sin _rpc_ejecutar_lote_admin el cliente falso responde PGRST202, como una BD sin la funcion.
+        with mock.patch.object(_Base, "_rpc_ejecutar_lote_admin", None):
+            with LoteRPC() as lote:
+                resultados = [obtener_usuario_admin(usuario_id, lote=lote) for usuario_id in self.usuario_ids]
+                listado = listar_usuarios_admin({"limit": 5}, lote=lote)
+        self.assertEqual([r.valor()["id"] for r in resultados], self.usuario_ids)
+        self.assertEqual(len(listado.valor()), 5)
+        self.assertEqual(_llamadas("rpc.obtener_usuario_admin") - antes, 3)
+
+    def test_error_de_una_llamada_no_afecta_al_resto(self):
+        with LoteRPC() as lote:
+            valido = obtener_usuario_admin(self.usuario_ids[0], lote=lote)
+            inexistente = lote.rpc("funcion_que_no_existe", {})
+        self.assertEqual(valido.valor()["id"], self.usuario_ids[0])
+        with self.assertRaises(ErrorLoteRPC):
+            inexistente.valor()
+
+
+@POLITICA_PRUEBA
+class PoliticaTests(SimpleTestCase):
+    def setUp(self):
+        politica._reiniciar_tras_fork()
+        # Los cambios de estado del circuito se registran como warning; se silencian en las pruebas.
+        self._nivel_log = politica.logger.level
+        politica.logger.setLevel(logging.ERROR)
+        self.respuestas = []
+        self.llamadas = 0
+        self.transporte = politica.TransportePolitica(httpx.MockTransport(self._responder))
+
+    def tearDown(self):
+        politica.logger.setLevel(self._nivel_log)
+        politica._reiniciar_tras_fork()
+
+    def _responder(self, request: httpx.Request) -> httpx.Response:
+        self.llamadas += 1
+        respuesta = self.respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    def _llamar(self, funcion: str, parametros: dict | None = None) -> httpx.Response:
+        request = httpx.Request("POST", URL_RPC + funcion, content=json.dumps(parametros or {}).encode())
+        respuesta = self.transporte.handle_request(request)
+        respuesta.read()
+        return respuesta
+
+    # Simula que paso la espera del circuito abierto sin dormir la prueba.
+    def _vencer_espera(self):
+        politica._circuito["abierto_en"] -= 61
+
+    def test_abre_tras_fallas_consecutivas_y_falla_rapido(self):
+        self.respuestas = [httpx.Response(503), httpx.ConnectError("sin red")]
+        self.assertEqual(self._llamar("listar_usuarios_admin").status_code, 503)
+        self.assertEqual(politica.estado_politica()["circuito"], "cerrado")
+        with self.assertRaises(httpx.ConnectError):
+            self._llamar("listar_usuarios_admin")
+        self.assertEqual(politica.estado_politica()["circuito"], "abierto")
+        with self.assertRaises(politica.CircuitoAbierto):
+            self._llamar("actualizar_usuario_admin")
+        self.assertEqual(self.llamadas, 2)
+        self.assertEqual(politica.estado_politica()["rechazos"], 1)
+
+    def test_semiabierto_cierra_si_la_prueba_responde(self):
+        self.respuestas = [httpx.Response(500), httpx.Response(500), httpx.Response(200, json=[])]
+        self._llamar("listar_usuarios_admin")
+        self._llamar("listar_usuarios_admin")
+        self._vencer_espera()
+        self.assertEqual(self._llamar("listar_usuarios_admin").status_code, 200)
+        estado = politica.estado_politica()
+        self.assertEqual(estado["circuito"], "cerrado")
+        self.assertEqual(estado["fallas_consecutivas"], 0)
+
+    def test_semiabierto_vuelve_a_abrir_si_la_prueba_falla(self):
+        self.respuestas = [httpx.Response(500), httpx.Response(500), httpx.Response(502)]
+        self._llamar("listar_usuarios_admin")
+        self._llamar("listar_usuarios_admin")
+        self._vencer_espera()
+        self.assertEqual(self._llamar("listar_usuarios_admin").status_code, 502)
+        estado = politica.estado_politica()
+        self.assertEqual(estado["circuito"], "abierto")
+        self.assertEqual(estado["aperturas"], 2)
+        with self.assertRaises(politica.CircuitoAbierto):
+            self._llamar("listar_usuarios_admin")
+
+    def test_semiabierto_deja_pasar_una_sola_prueba(self):
+        self.respuestas = [httpx.Response(500), httpx.Response(500)]
+        self._llamar("listar_usuarios_admin")
+        self._llamar("listar_usuarios_admin")
+        self._vencer_espera()
+        self.assertTrue(politica._permitir())
+        self.assertEqual(politica.estado_politica()["circuito"], "semiabierto")
+        self.assertFalse(politica._permitir())
+
+    def test_429_no_abre_el_circuito(self):
+        self.respuestas = [httpx.Response(429), httpx.Response(429), httpx.Response(429)]
+        for _ in range(3):
+            self._llamar("listar_usuarios_admin")
+        self.assertEqual(politica.estado_politica()["circuito"], "cerrado")
+
+    def test_lectura_servida_desde_respaldo_con_circuito_abierto(self):
+        self.respuestas = [httpx.Response(200, json=[{"id": 1}]), httpx.Response(500), httpx.Response(500)]
+        self._llamar("listar_empresas_admin", {"p_limit": 25})
+        self._llamar("listar_empresas_admin", {"p_limit": 10})
+        self._llamar("listar_empresas_admin", {"p_limit": 10})
+        respuesta = self._llamar("listar_empresas_admin", {"p_limit": 25})
+        self.assertEqual(respuesta.json(), [{"id": 1}])
+        self.assertEqual(respuesta.headers[politica.HEADER_DEGRADADO], "1")
+        with self.assertRaises(politica.CircuitoAbierto):
+            self._llamar("contexto_sesion_admin")
+
+    def test_respaldo_omite_paginas_por_cursor_y_cuerpos_grandes(self):
+        self.respuestas = [
+            httpx.Response(200, json=[{"id": 1}]),
+            httpx.Response(200, content=b"x" * 2048),
+            httpx.Response(200, json=[{"id": 2}]),
+        ]
+        with override_settings(SUPABASE_RESPALDO_MAX_CUERPO=1024):
+            self._llamar("listar_usuarios_admin", {"p_cursor_id": "5c1e4e1e-0000-0000-0000-000000000001"})
+            self._llamar("listar_usuarios_admin", {"p_limit": 500})
+            self._llamar("listar_usuarios_admin", {"p_cursor_id": None})
+        self.assertEqual(politica.estado_politica()["respaldo_entradas"], 1)
+
+    def test_respaldo_acotado_por_bytes(self):
+        self.respuestas = [httpx.Response(200, content=b"x" * 400) for _ in range(4)]
+        with override_settings(SUPABASE_RESPALDO_MAX_BYTES=1000):
+            for pagina in range(4):
+                self._llamar("listar_usuarios_admin", {"p_offset": pagina})
+        estado = politica.estado_politica()
+        self.assertEqual(estado["respaldo_entradas"], 2)
+        self.assertEqual(estado["respaldo_bytes"], 800)
+
+    def test_escrituras_no_se_reintentan(self):
+        self.respuestas = [httpx.ReadTimeout("lento"), httpx.Response(200)]
+        with override_settings(SUPABASE_REINTENTOS_LECTURA=3), self.assertRaises(httpx.ReadTimeout):
+            self._llamar("actualizar_usuario_admin")
+        self.assertEqual(self.llamadas, 1)
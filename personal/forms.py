@@ -2,7 +2,7 @@
 
 from personal.formatos import formatear_nombre, formatear_rut_staff, formatear_telefono
 from cuentas.permisos import puede_asignar_rol_staff
-from personal.services import obtener_roles_disponibles
+from aexfy_admin.catalogos import obtener_roles_disponibles
 
 # Formulario para crear usuarios de staff; valida y formatea campos antes de guardar.
 class CrearStaffForm(forms.Form):
@@ -1,13 +1,9 @@
 import re
-from pathlib import Path
 from django.conf import settings
 from supabase_auth.errors import AuthApiError
 
 from integraciones.supabase_client import get_supabase_service_client
 
-# Cache simple de roles parseados desde roles.txt.
-_roles_cache = None
-
 
 # Extrae un mensaje legible desde AuthApiError (o excepcion similar).
 def extraer_mensaje_auth(exc: Exception) -> str:
@@ -70,47 +66,6 @@ def generar_link_invitacion(email: str, metadata: dict):
                 continue
             raise
 
-# Obtiene roles disponibles desde roles.txt (lineas con ':' que representan roles).
-def obtener_roles_disponibles(include_owner: bool = False):
-    global _roles_cache
-    if _roles_cache is not None:
-        if include_owner and ("AexfyOwner", "AexfyOwner") not in _roles_cache:
-            return [("AexfyOwner", "AexfyOwner")] + _roles_cache
-        return _roles_cache
-
-    ruta = Path("roles.txt")
-    if not ruta.exists():
-        # Fallback si el archivo no existe; permite operar sin bloqueo.
-        _roles_cache = [("AexfyOwner", "AexfyOwner")]
-        return _roles_cache
-
-    roles = []
-    for linea in ruta.read_text(encoding="utf-8").splitlines():
-        linea = linea.strip()
-        if not linea or linea.startswith("#"):
-            continue
-        if ":" in linea:
-            rol = linea.split(":", 1)[0].strip()
-            # Excluye encabezados que no son roles reales.
-            if rol.lower() in {"credenciales", "crea a", "contraseña", "aexfyowner"}:
-                continue
-            if rol:
-                roles.append((rol, rol))
-
-    # Elimina duplicados manteniendo orden.
-    vistos = set()
-    roles_unicos = []
-    for rol in roles:
-        if rol[0] not in vistos:
-            roles_unicos.append(rol)
-            vistos.add(rol[0])
-
-    # Evita lista vacia si el archivo tiene otro formato.
-    _roles_cache = roles_unicos or [("AexfyOwner", "AexfyOwner")]
-    if include_owner and ("AexfyOwner", "AexfyOwner") not in _roles_cache:
-        return [("AexfyOwner", "AexfyOwner")] + _roles_cache
-    return _roles_cache
-
 
 def _normalizar_respuesta_rpc(respuesta):
     # Normaliza la respuesta de RPC para devolver siempre un diccionario o None.
@@ -120,20 +75,20 @@ def _normalizar_respuesta_rpc(respuesta):
     return data
 
 
-# Verifica si existe un usuario en Auth por email.
-def existe_usuario_auth_por_email(email: str) -> bool:
+# Busca un usuario de Auth por email con la RPC indexada de DB_Aexfy.db; None si no existe.
+# Reemplaza el recorrido de auth.admin.list_users(), que solo trae la primera pagina.
+def buscar_usuario_auth_por_email(email: str, lote=None):
+    parametros = {"p_email": (email or "").strip().lower()}
+    if lote is not None:
+        return lote.rpc("buscar_usuario_auth_por_email_admin", parametros, _normalizar_respuesta_rpc)
     cliente = get_supabase_service_client()
-    usuarios = cliente.auth.admin.list_users()
-    if isinstance(usuarios, list):
-        lista = usuarios
-    else:
-        lista = getattr(usuarios, "users", [])
+    respuesta = cliente.rpc("buscar_usuario_auth_por_email_admin", parametros).execute()
+    return _normalizar_respuesta_rpc(respuesta)
 
-    for usuario in lista:
-        if getattr(usuario, "email", None) == email:
-            return True
 
-    return False
+# Verifica si existe un usuario en Auth por email.
+def existe_usuario_auth_por_email(email: str) -> bool:
+    return buscar_usuario_auth_por_email(email) is not None
 
 
 # Valida unicidad de rut, email y telefono antes de crear un usuario.
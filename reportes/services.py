@@ -10,14 +10,19 @@ def _normalizar_data(respuesta):
 
 
 # Obtiene resumen de empresas por zona/estado/plan.
-def obtener_resumen_empresas():
+# Con lote se encola la RPC y se devuelve un resultado diferido (integraciones/lotes.py).
+def obtener_resumen_empresas(lote=None):
+    if lote is not None:
+        return lote.rpc("resumen_empresas_admin", {}, _normalizar_data)
     cliente = get_supabase_service_client()
     respuesta = cliente.rpc("resumen_empresas_admin", {}).execute()
     return _normalizar_data(respuesta)
 
 
 # Obtiene resumen de usuarios por zona/estado/tipo.
-def obtener_resumen_usuarios():
+def obtener_resumen_usuarios(lote=None):
+    if lote is not None:
+        return lote.rpc("resumen_usuarios_admin", {}, _normalizar_data)
     cliente = get_supabase_service_client()
     respuesta = cliente.rpc("resumen_usuarios_admin", {}).execute()
     return _normalizar_data(respuesta)
@@ -3,6 +3,7 @@ import logging
 from django.shortcuts import render
 
 from cuentas.decorators import permiso_requerido, sesion_requerida
+from integraciones.lotes import LoteRPC
 from reportes.services import obtener_resumen_empresas, obtener_resumen_usuarios
 
 # Logger para errores del modulo de reportes.
@@ -16,13 +17,19 @@ def reportes_listado_view(request):
     resumen_empresas = {"zonas": [], "estados": [], "planes": []}
     resumen_usuarios = {"zonas": [], "estados": [], "tipos": []}
 
+    # Ambos resumenes son independientes; se piden en una sola ida y vuelta.
+    lote = LoteRPC()
+    empresas_diferido = obtener_resumen_empresas(lote=lote)
+    usuarios_diferido = obtener_resumen_usuarios(lote=lote)
+    lote.ejecutar()
+
     try:
-        resumen_empresas = obtener_resumen_empresas()
+        resumen_empresas = empresas_diferido.valor()
     except Exception as exc:
         logger.warning("Error al obtener resumen de empresas: %s", exc)
 
     try:
-        resumen_usuarios = obtener_resumen_usuarios()
+        resumen_usuarios = usuarios_diferido.valor()
     except Exception as exc:
         logger.warning("Error al obtener resumen de usuarios: %s", exc)
 
@@ -26,26 +26,18 @@ def obtener_cliente_servicio():
 
 
 def buscar_usuario_por_email(cliente, email):
-    # Busca usuarios existentes por email usando el Admin API.
-    usuarios = cliente.auth.admin.list_users()
-    if isinstance(usuarios, list):
-        lista = usuarios
-    else:
-        # Algunas versiones retornan un objeto con atributo users.
-        lista = getattr(usuarios, "users", [])
-
-    for usuario in lista:
-        if getattr(usuario, "email", None) == email:
-            return usuario
+    # Busca por email con la RPC indexada de personal/services.py (no depende de la paginacion
+    # de list_users); retorna un dict con id y email, o None.
+    from personal.services import buscar_usuario_auth_por_email
 
-    return None
+    return buscar_usuario_auth_por_email(email)
 
 
 def borrar_usuario_por_email(cliente, email):
     # Elimina el usuario si existe para evitar conflicto por email.
     usuario = buscar_usuario_por_email(cliente, email)
     if usuario:
-        cliente.auth.admin.delete_user(usuario.id)
+        cliente.auth.admin.delete_user(usuario["id"])
         return True
 
     return False
@@ -103,7 +95,7 @@ def main():
     # Busca usuario existente para decidir crear o actualizar.
     existente = buscar_usuario_por_email(cliente, email)
     if existente:
-        usuario = actualizar_usuario_owner(cliente, existente.id, email, password)
+        usuario = actualizar_usuario_owner(cliente, existente["id"], email, password)
         eliminado = False
         creado = False
     else:
@@ -6,7 +6,7 @@ def _normalizar_data(respuesta):
     return getattr(respuesta, "data", None)
 
 
-# Lista solicitudes con filtros de estado y tipo.
+# Lista solicitudes con filtros de estado, tipo y zona, paginadas por cursor.
 def listar_solicitudes_admin(filtros: dict):
     cliente = get_supabase_service_client()
     respuesta = cliente.rpc(
@@ -16,6 +16,15 @@ def listar_solicitudes_admin(filtros: dict):
             "p_tipo": filtros.get("tipo"),
             "p_limit": filtros.get("limit", 100),
             "p_offset": filtros.get("offset", 0),
+            # Total opcional en la misma llamada (aexfy_admin/paginacion.py filtros_conteo).
+            "p_contar": bool(filtros.get("contar")),
+            "p_umbral_exacto": filtros.get("umbral_exacto"),
+            # Cursor (created_at, id) de aexfy_admin/paginacion.py y exportacion.py; sin cursor se parte desde el inicio.
+            "p_cursor_created_at": filtros.get("cursor_creado_en"),
+            "p_cursor_id": filtros.get("cursor_id"),
+            "p_antes": bool(filtros.get("antes")),
+            # Zona de metadata.p_zona filtrada en el servidor (idx_requests_zona).
+            "p_zona": filtros.get("zona") or None,
         },
     ).execute()
     return _normalizar_data(respuesta) or []
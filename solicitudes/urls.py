@@ -6,5 +6,7 @@ from solicitudes import views
 urlpatterns = [
     path("solicitudes/", views.solicitudes_listado_view, name="solicitudes_listado"),
     path("solicitudes/<uuid:solicitud_id>/", views.solicitud_detalle_view, name="solicitud_detalle"),
+    path("solicitudes/<uuid:solicitud_id>/fila/", views.solicitudes_fila_view, name="solicitudes_fila"),
     path("solicitudes/exportar/", views.solicitudes_exportar_view, name="solicitudes_exportar"),
+    path("solicitudes/exportar/trabajo/", views.solicitudes_exportar_trabajo_view, name="solicitudes_exportar_trabajo"),
 ]
@@ -1,10 +1,13 @@
-﻿import csv
-import logging
+﻿import logging
 
 from django.http import HttpResponse
 from django.shortcuts import redirect, render
+from django.views.decorators.cache import never_cache
 from supabase_auth.errors import AuthApiError
 
+from aexfy_admin.exportacion import recorrer_por_cursor, respuesta_csv
+from aexfy_admin.trabajos_exportacion import encolar_exportacion, registrar_exportacion
+from aexfy_admin.paginacion import filtros_pagina, resolver_pagina
 from cuentas.decorators import permiso_requerido, sesion_requerida
 from cuentas.permisos import puede_asignar_rol_staff
 from cuentas.zonas import obtener_zona_sesion, requiere_restriccion_zona
@@ -30,26 +33,28 @@ ROL_OWNER_CLIENTE = "OwnerCliente"
 @permiso_requerido("solicitudes")
 def solicitudes_listado_view(request):
     form = SolicitudesFiltroForm(request.GET or None)
-    filtros = {"estado": "", "tipo": ""}
+    filtros = {"estado": "", "tipo": "", "zona": ""}
     if form.is_valid():
         filtros.update(form.cleaned_data)
 
-    solicitudes = []
-    try:
-        solicitudes = listar_solicitudes_admin(filtros)
-    except Exception as exc:
-        logger.warning("Error al listar solicitudes: %s", exc)
+    # Paginacion por cursor (created_at, id), igual que usuarios y empresas.
+    page, filtros_cursor = filtros_pagina(request)
+    filtros.update(filtros_cursor)
 
-    # Filtra por zona en memoria usando metadata cuando el rol lo exige.
+    # La zona (metadata.p_zona) se filtra en la RPC cuando el rol lo exige.
     roles_sesion = request.session.get("roles") or []
     if requiere_restriccion_zona(roles_sesion):
-        zona_sesion = obtener_zona_sesion(request.session)
-        if zona_sesion:
-            solicitudes = [
-                s
-                for s in solicitudes
-                if (s.get("metadata") or {}).get("p_zona") == zona_sesion
-            ]
+        filtros["zona"] = obtener_zona_sesion(request.session) or ""
+
+    filas = []
+    try:
+        filas = listar_solicitudes_admin(filtros)
+    except Exception as exc:
+        logger.warning("Error al listar solicitudes: %s", exc)
+    solicitudes, paginacion = resolver_pagina(filas, page, filtros, campo_fecha="created_at")
+    qs_base = request.GET.copy()
+    qs_base.pop("page", None)
+    qs_base.pop("cursor", None)
 
     mensaje = request.session.pop("solicitud_mensaje", None)
 
@@ -60,64 +65,87 @@ def solicitudes_listado_view(request):
             "form_filtros": form,
             "solicitudes": solicitudes,
             "mensaje": mensaje,
+            **paginacion,
+            "qs_base": qs_base,
         },
     )
 
 
-# Exporta solicitudes a CSV respetando filtros y restricciones de zona.
+# Fila del listado para actualizaciones en vivo (realtime_sse.js); una sola RPC por evento.
+# Responde 204 si la solicitud ya no existe o su metadata.p_zona no es la zona de la sesion.
 @sesion_requerida
 @permiso_requerido("solicitudes")
-def solicitudes_exportar_view(request):
-    form = SolicitudesFiltroForm(request.GET or None)
-    filtros = {"estado": "", "tipo": "", "limit": 5000, "offset": 0}
-    if form.is_valid():
-        filtros.update(form.cleaned_data)
-
-    solicitudes = []
+@never_cache
+def solicitudes_fila_view(request, solicitud_id):
     try:
-        solicitudes = listar_solicitudes_admin(filtros)
+        solicitud = obtener_solicitud_admin(str(solicitud_id))
     except Exception as exc:
-        logger.warning("Error al listar solicitudes para exportar: %s", exc)
+        logger.warning("Error al obtener fila de solicitud: %s", exc)
+        return HttpResponse(status=503)
 
+    if not solicitud:
+        return HttpResponse(status=204)
     roles_sesion = request.session.get("roles") or []
     if requiere_restriccion_zona(roles_sesion):
         zona_sesion = obtener_zona_sesion(request.session)
-        if zona_sesion:
-            solicitudes = [
-                s for s in solicitudes if (s.get("metadata") or {}).get("p_zona") == zona_sesion
-            ]
-
-    respuesta = HttpResponse(content_type="text/csv; charset=utf-8")
-    respuesta["Content-Disposition"] = "attachment; filename=solicitudes.csv"
-    respuesta.write("﻿")
-
-    writer = csv.writer(respuesta, delimiter=';')
-    writer.writerow(
-        [
-            "Fecha",
-            "Tipo",
-            "Estado",
-            "Solicitante",
-            "Revisor",
-            "Nota",
-            "Zona",
-        ]
+        if zona_sesion and (solicitud.get("metadata") or {}).get("p_zona") != zona_sesion:
+            return HttpResponse(status=204)
+
+    return render(request, "solicitudes/_fila.html", {"solicitud": solicitud})
+
+
+# Columnas del CSV de solicitudes; las comparten la descarga directa y la exportacion en segundo plano.
+ENCABEZADOS_EXPORTACION = ["Fecha", "Tipo", "Estado", "Solicitante", "Revisor", "Nota", "Zona"]
+
+
+# Filtros de exportacion; zona queda fijada cuando el rol de la sesion la exige.
+def _filtros_exportacion(request) -> dict:
+    form = SolicitudesFiltroForm(request.GET or None)
+    filtros = {"estado": "", "tipo": "", "zona": ""}
+    if form.is_valid():
+        filtros.update(form.cleaned_data)
+
+    roles_sesion = request.session.get("roles") or []
+    if requiere_restriccion_zona(roles_sesion):
+        filtros["zona"] = obtener_zona_sesion(request.session) or ""
+    return filtros
+
+
+# Recorre todas las paginas por cursor; la zona ya viene en los filtros de la RPC.
+def _filas_exportacion(filtros: dict, roles_sesion: list[str]):
+    return recorrer_por_cursor(listar_solicitudes_admin, filtros, "created_at")
+
+
+def _valores_exportacion(solicitud: dict) -> list:
+    return [
+        solicitud.get("created_at"),
+        solicitud.get("request_type"),
+        solicitud.get("status"),
+        solicitud.get("submitted_email"),
+        solicitud.get("reviewed_email"),
+        solicitud.get("decision_note"),
+        (solicitud.get("metadata") or {}).get("p_zona"),
+    ]
+
+
+# Exporta solicitudes a CSV respetando filtros y restricciones de zona.
+@sesion_requerida
+@permiso_requerido("solicitudes")
+def solicitudes_exportar_view(request):
+    roles_sesion = request.session.get("roles") or []
+    return respuesta_csv(
+        "solicitudes.csv",
+        ENCABEZADOS_EXPORTACION,
+        _filas_exportacion(_filtros_exportacion(request), roles_sesion),
+        _valores_exportacion,
     )
-    for solicitud in solicitudes:
-        metadata = solicitud.get("metadata") or {}
-        writer.writerow(
-            [
-                solicitud.get("created_at"),
-                solicitud.get("request_type"),
-                solicitud.get("status"),
-                solicitud.get("submitted_email"),
-                solicitud.get("reviewed_email"),
-                solicitud.get("decision_note"),
-                metadata.get("p_zona"),
-            ]
-        )
-
-    return respuesta
+
+
+# Encola la exportacion en segundo plano (CSV comprimido) para listados muy grandes.
+@sesion_requerida
+@permiso_requerido("solicitudes")
+def solicitudes_exportar_trabajo_view(request):
+    return encolar_exportacion(request, "solicitudes", _filtros_exportacion(request))
 
 
 # Detalle de una solicitud con opcion de aprobar o rechazar.
@@ -355,3 +383,6 @@ def solicitud_detalle_view(request, solicitud_id):
             "form": form,
         },
     )
+
+
+registrar_exportacion("solicitudes", ENCABEZADOS_EXPORTACION, _filas_exportacion, _valores_exportacion)
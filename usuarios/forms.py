@@ -2,7 +2,7 @@ from django import forms
 
 from personal.formatos import formatear_nombre, formatear_rut_staff, formatear_telefono
 from cuentas.permisos import puede_asignar_rol_staff
-from usuarios.roles import obtener_roles_disponibles
+from aexfy_admin.catalogos import obtener_roles_disponibles
 
 # Formulario de filtros para listar usuarios.
 class UsuariosFiltroForm(forms.Form):
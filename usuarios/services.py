@@ -7,40 +7,78 @@ def _normalizar_data(respuesta):
     return data
 
 
-# Lista usuarios aplicando filtros y paginacion basica.
-def listar_usuarios_admin(filtros: dict):
-    cliente = get_supabase_service_client()
-    respuesta = cliente.rpc(
-        "listar_usuarios_admin",
-        {
-            "p_busqueda": filtros.get("busqueda"),
-            "p_estado": filtros.get("estado"),
-            "p_tipo": filtros.get("tipo_usuario"),
-            "p_zona": filtros.get("zona"),
-            "p_rol": filtros.get("rol"),
-            "p_limit": filtros.get("limit", 100),
-            "p_offset": filtros.get("offset", 0),
-        },
-    ).execute()
-    data = _normalizar_data(respuesta)
-    return data or []
+# Normaliza listas de RPC; se usa directo o como normalizador de integraciones/lotes.py.
+def _normalizar_lista(respuesta):
+    return _normalizar_data(respuesta) or []
 
 
-# Obtiene un usuario especifico para editarlo.
-def obtener_usuario_admin(usuario_id: str):
-    cliente = get_supabase_service_client()
-    respuesta = cliente.rpc(
-        "obtener_usuario_admin",
-        {
-            "p_usuario_id": usuario_id,
-        },
-    ).execute()
+# Normaliza RPC que devuelven una fila; retorna el primer registro o None.
+def _normalizar_registro(respuesta):
     data = _normalizar_data(respuesta)
     if isinstance(data, list):
         return data[0] if data else None
     return data
 
 
+# Lista usuarios aplicando filtros y paginacion por cursor.
+# Con lote se encola la RPC y se devuelve un resultado diferido (integraciones/lotes.py).
+def listar_usuarios_admin(filtros: dict, lote=None):
+    parametros = {
+        "p_busqueda": filtros.get("busqueda"),
+        "p_estado": filtros.get("estado"),
+        "p_tipo": filtros.get("tipo_usuario"),
+        "p_zona": filtros.get("zona"),
+        "p_rol": filtros.get("rol"),
+        "p_limit": filtros.get("limit", 100),
+        "p_offset": filtros.get("offset", 0),
+        # Cursor (creado_en, id) de aexfy_admin/paginacion.py; sin cursor se parte desde el inicio.
+        "p_cursor_creado_en": filtros.get("cursor_creado_en"),
+        "p_cursor_id": filtros.get("cursor_id"),
+        "p_antes": bool(filtros.get("antes")),
+        # Total opcional en la misma llamada (aexfy_admin/paginacion.py filtros_conteo).
+        "p_contar": bool(filtros.get("contar")),
+        "p_umbral_exacto": filtros.get("umbral_exacto"),
+        # Oculta AexfyOwner en la base para que la pagina y total_filas coincidan con lo visible.
+        "p_excluir_owner": bool(filtros.get("excluir_owner")),
+    }
+    if lote is not None:
+        return lote.rpc("listar_usuarios_admin", parametros, _normalizar_lista)
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("listar_usuarios_admin", parametros).execute()
+    return _normalizar_lista(respuesta)
+
+
+# Obtiene un usuario especifico para editarlo.
+def obtener_usuario_admin(usuario_id: str, lote=None):
+    parametros = {
+        "p_usuario_id": usuario_id,
+    }
+    if lote is not None:
+        return lote.rpc("obtener_usuario_admin", parametros, _normalizar_registro)
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("obtener_usuario_admin", parametros).execute()
+    return _normalizar_registro(respuesta)
+
+
+# Indexa por id (str) las filas de una RPC en bloque.
+def _indexar_por_id(respuesta):
+    return {str(fila.get("id")): fila for fila in _normalizar_lista(respuesta)}
+
+
+# Obtiene varios usuarios en una sola RPC; devuelve un dict por id (str) con los encontrados.
+def obtener_usuarios_admin(usuario_ids: list[str], lote=None) -> dict:
+    parametros = {
+        "p_usuario_ids": [str(usuario_id) for usuario_id in usuario_ids if usuario_id],
+    }
+    if lote is not None:
+        return lote.rpc("obtener_usuarios_admin", parametros, _indexar_por_id)
+    if not parametros["p_usuario_ids"]:
+        return {}
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc("obtener_usuarios_admin", parametros).execute()
+    return _indexar_por_id(respuesta)
+
+
 # Actualiza un usuario existente con validaciones en el servidor.
 def actualizar_usuario_admin(datos: dict):
     cliente = get_supabase_service_client()
@@ -91,3 +129,30 @@ def eliminar_usuario_admin(usuario_id: str):
     if not data:
         raise ValueError("No se pudo eliminar el usuario.")
     return data
+
+
+# Elimina varios usuarios en una sola transaccion; la RPC aplica las reglas de omision
+# (propio usuario, AexfyOwner, zona y rol) y devuelve {"eliminados": [...], "omitidos": [...]}.
+def eliminar_usuarios_masivo_admin(
+    usuario_ids: list[str],
+    actor_id: str | None,
+    roles_actor: list[str],
+    zona_actor: str | None,
+) -> dict:
+    cliente = get_supabase_service_client()
+    respuesta = cliente.rpc(
+        "eliminar_usuarios_masivo_admin",
+        {
+            "p_usuario_ids": [str(usuario_id) for usuario_id in usuario_ids if usuario_id],
+            "p_actor_id": str(actor_id) if actor_id else None,
+            "p_roles_actor": list(roles_actor or []),
+            "p_zona_actor": zona_actor or None,
+        },
+    ).execute()
+    data = _normalizar_data(respuesta)
+    if not isinstance(data, dict):
+        raise ValueError("No se pudo eliminar los usuarios seleccionados.")
+    return {
+        "eliminados": data.get("eliminados") or [],
+        "omitidos": data.get("omitidos") or [],
+    }
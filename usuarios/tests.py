@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore
+from django.test import Client, SimpleTestCase
+from django.test.utils import override_settings
+
+from integraciones.supabase_falso import RUT_OWNER, obtener_cliente_falso, reiniciar_cliente_falso
+from usuarios.services import listar_usuarios_admin
+
+# Usuarios sembrados en el cliente falso; caben en una sola pagina del listado (25 filas).
+USUARIOS_SEMBRADOS = 20
+
+
+@override_settings(
+    DEBUG=True,
+    SUPABASE_FALSO=True,
+    SUPABASE_FALSO_PASSWORD="prueba",
+    SUPABASE_FALSO_LATENCIA_MS=0,
+    SUPABASE_FALSO_VARIACION_MS=0,
+    SUPABASE_FALSO_USUARIOS=USUARIOS_SEMBRADOS,
+    SUPABASE_FALSO_EMPRESAS=5,
+    SUPABASE_FALSO_SOLICITUDES=5,
+    SUPABASE_FALSO_AUDITORIA=5,
+    SESSION_ENGINE="django.contrib.sessions.backends.cache",
+    ALLOWED_HOSTS=["testserver"],
+)
+class ListadoSinOwnerTests(SimpleTestCase):
+    def setUp(self):
+        reiniciar_cliente_falso()
+        self.addCleanup(reiniciar_cliente_falso)
+        base = obtener_cliente_falso().base
+        with base.lock:
+            self.owner_id = next(u["id"] for u in base.usuarios.values() if u["rut"] == RUT_OWNER)
+            self.gerente = next(u for u in base.usuarios.values() if u["rut"] != RUT_OWNER)
+            base.roles[self.gerente["id"]] = ["Gerente"]
+
+    # Sesion de un Gerente como la deja login_view (token y usuario).
+    def _cliente_gerente(self) -> Client:
+        sesion = SessionStore()
+        sesion["supabase_access_token"] = "prueba"
+        sesion["usuario"] = {"id": self.gerente["id"], "email": self.gerente["email"], "rut": self.gerente["rut"]}
+        sesion.create()
+        cliente = Client()
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = sesion.session_key
+        return cliente
+
+    def test_total_excluye_owner_en_la_rpc(self):
+        filtros = {"limit": 26, "offset": 0, "contar": True, "umbral_exacto": 10000}
+        todos = listar_usuarios_admin(filtros)
+        visibles = listar_usuarios_admin({**filtros, "excluir_owner": True})
+        self.assertEqual(todos[0]["total_filas"], USUARIOS_SEMBRADOS)
+        self.assertEqual(visibles[0]["total_filas"], USUARIOS_SEMBRADOS - 1)
+        self.assertNotIn(self.owner_id, {fila["id"] for fila in visibles})
+
+    def test_listado_de_no_owner_cuenta_solo_filas_visibles(self):
+        respuesta = self._cliente_gerente().get("/usuarios/")
+        self.assertEqual(respuesta.status_code, 200)
+        usuarios = respuesta.context["usuarios"]
+        self.assertNotIn(self.owner_id, {str(usuario["id"]) for usuario in usuarios})
+        self.assertEqual(len(usuarios), USUARIOS_SEMBRADOS - 1)
+        self.assertEqual((respuesta.context["desde"], respuesta.context["hasta"]), (1, len(usuarios)))
+        self.assertEqual(respuesta.context["total"], len(usuarios))
@@ -10,5 +10,7 @@ urlpatterns = [
     path("usuarios/<uuid:usuario_id>/editar/", views.usuarios_editar_view, name="usuarios_editar"),
     path("usuarios/<uuid:usuario_id>/invitar/", views.usuarios_invitar_view, name="usuarios_invitar"),
     path("usuarios/<uuid:usuario_id>/eliminar/", views.usuarios_eliminar_view, name="usuarios_eliminar"),
+    path("usuarios/<uuid:usuario_id>/fila/", views.usuarios_fila_view, name="usuarios_fila"),
     path("usuarios/exportar/", views.usuarios_exportar_view, name="usuarios_exportar"),
+    path("usuarios/exportar/trabajo/", views.usuarios_exportar_trabajo_view, name="usuarios_exportar_trabajo"),
 ]
@@ -1,4 +1,3 @@
-import csv
 import logging
 
 from django.conf import settings
@@ -7,6 +6,9 @@ from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from supabase_auth.errors import AuthApiError
 
+from aexfy_admin.exportacion import recorrer_por_cursor, respuesta_csv
+from aexfy_admin.trabajos_exportacion import encolar_exportacion, registrar_exportacion
+from aexfy_admin.paginacion import filtros_pagina, resolver_pagina
 from cuentas.decorators import permiso_requerido, sesion_requerida
 from cuentas.permisos import (
     puede_accion_masiva_usuarios,
@@ -31,8 +33,10 @@ from usuarios.services import (
     actualizar_invite_usuario_admin,
     cambios_masivos_usuarios,
     eliminar_usuario_admin,
+    eliminar_usuarios_masivo_admin,
     listar_usuarios_admin,
     obtener_usuario_admin,
+    obtener_usuarios_admin,
 )
 
 # Logger para registrar errores del modulo de usuarios.
@@ -135,49 +139,25 @@ def usuarios_listado_view(request):
             else:
                 usuario_sesion = request.session.get("usuario") or {}
                 zona_sesion = obtener_zona_sesion(request.session)
-                eliminados_detalle = []
-                omitidos_detalle = []
-                eliminados = 0
-                omitidos = 0
                 errores = 0
-                for usuario_id in seleccionados:
-                    try:
-                        usuario = obtener_usuario_admin(str(usuario_id))
-                        if not usuario:
-                            omitidos_detalle.append({"id": str(usuario_id), "motivo": "no_encontrado"})
-                            omitidos += 1
-                            continue
-                        detalle = _resumen_usuario_auditoria(usuario)
-                        if str(usuario_sesion.get("id")) == str(usuario_id):
-                            detalle["motivo"] = "propio_usuario"
-                            omitidos_detalle.append(detalle)
-                            omitidos += 1
-                            continue
-                        if _es_aexfy_owner(usuario):
-                            # Nunca se elimina AexfyOwner desde acciones masivas.
-                            detalle["motivo"] = "aexfy_owner"
-                            omitidos_detalle.append(detalle)
-                            omitidos += 1
-                            continue
-                        if requiere_restriccion_zona(roles_sesion):
-                            if zona_sesion and usuario.get("zona") and usuario.get("zona") != zona_sesion:
-                                detalle["motivo"] = "zona_no_autorizada"
-                                omitidos_detalle.append(detalle)
-                                omitidos += 1
-                                continue
-                            rol_objetivo = _obtener_rol_principal(usuario)
-                            if rol_objetivo and not puede_asignar_rol_staff(roles_sesion, rol_objetivo):
-                                detalle["motivo"] = "rol_no_autorizado"
-                                omitidos_detalle.append(detalle)
-                                omitidos += 1
-                                continue
-                        eliminar_usuario_admin(str(usuario_id))
-                        eliminados_detalle.append(detalle)
-                        eliminados += 1
-                    except Exception as exc:
-                        errores += 1
-                        logger.warning("Error al eliminar usuario masivo: %s", exc)
-                        omitidos_detalle.append({"id": str(usuario_id), "motivo": "error"})
+                # Una sola RPC transaccional: aplica las reglas de omision y elimina los elegibles.
+                try:
+                    resultado = eliminar_usuarios_masivo_admin(
+                        seleccionados,
+                        usuario_sesion.get("id"),
+                        roles_sesion,
+                        zona_sesion,
+                    )
+                    eliminados_detalle = resultado["eliminados"]
+                    omitidos_detalle = resultado["omitidos"]
+                except Exception as exc:
+                    # La transaccion se revierte completa; ningun seleccionado queda eliminado.
+                    logger.warning("Error al eliminar usuarios masivo: %s", exc)
+                    eliminados_detalle = []
+                    omitidos_detalle = [{"id": str(usuario_id), "motivo": "error"} for usuario_id in seleccionados]
+                    errores = len(seleccionados)
+                eliminados = len(eliminados_detalle)
+                omitidos = len(omitidos_detalle) - errores
                 if eliminados:
                     mensaje = f"Usuarios eliminados: {eliminados}."
                 else:
@@ -216,6 +196,7 @@ def usuarios_listado_view(request):
                     zona_sesion = obtener_zona_sesion(request.session)
                     if zona_sesion:
                         filtros["zona"] = zona_sesion
+                filtros["excluir_owner"] = "AexfyOwner" not in roles_sesion
                 usuarios = listar_usuarios_admin(filtros)
                 usuarios = _filtrar_aexfy_owner(usuarios, roles_sesion)
                 return render(
@@ -232,8 +213,9 @@ def usuarios_listado_view(request):
             try:
                 detalles = []
                 seleccionados_validos = []
+                usuarios_por_id = obtener_usuarios_admin(seleccionados)
                 for usuario_id in seleccionados:
-                    usuario = obtener_usuario_admin(str(usuario_id))
+                    usuario = usuarios_por_id.get(str(usuario_id))
                     if not usuario:
                         continue
                     if _es_aexfy_owner(usuario):
@@ -279,15 +261,9 @@ def usuarios_listado_view(request):
     if form_filtros.is_valid():
         filtros.update(form_filtros.cleaned_data)
 
-    # Paginacion simple para reducir carga.
-    per_page = 25
-    try:
-        page = int(request.GET.get("page", 1) or 1)
-    except ValueError:
-        page = 1
-    page = max(page, 1)
-    filtros["limit"] = per_page
-    filtros["offset"] = (page - 1) * per_page
+    # Paginacion por cursor (creado_en, id); la pagina 400 cuesta lo mismo que la 1.
+    page, filtros_cursor = filtros_pagina(request)
+    filtros.update(filtros_cursor)
 
     # Limita el listado a la zona del usuario si su rol lo exige.
     roles_sesion = request.session.get("roles") or []
@@ -297,12 +273,15 @@ def usuarios_listado_view(request):
             filtros["zona"] = zona_sesion
             aplicar_zona_formulario(form_filtros, zona_sesion)
 
-    usuarios = listar_usuarios_admin(filtros)
+    # AexfyOwner se excluye en la RPC para sesiones sin ese rol: la pagina trae 25 filas visibles y
+    # desde/hasta/total no cuentan cuentas ocultas. El filtro en Python queda como resguardo.
     es_owner = "AexfyOwner" in roles_sesion
+    filtros["excluir_owner"] = not es_owner
+    usuarios, paginacion = resolver_pagina(listar_usuarios_admin(filtros), page, filtros)
     usuarios = _filtrar_aexfy_owner(usuarios, roles_sesion)
-    has_next = len(usuarios) >= per_page
     qs_base = request.GET.copy()
     qs_base.pop("page", None)
+    qs_base.pop("cursor", None)
 
     usuario_sesion = request.session.get("usuario") or {}
     usuario_actual_id = usuario_sesion.get("id")
@@ -318,18 +297,46 @@ def usuarios_listado_view(request):
             "mensaje": mensaje,
             "usuario_actual_id": usuario_actual_id,
             "es_owner": es_owner,
-            "page": page,
-            "has_next": has_next,
+            **paginacion,
             "qs_base": qs_base,
         },
     )
 
 
-# Exporta usuarios a CSV respetando filtros y restricciones de zona.
+# Fila del listado para actualizaciones en vivo (realtime_sse.js); una sola RPC por evento.
+# Responde 204 si el usuario ya no existe o quedo fuera de lo visible para la sesion.
 @sesion_requerida
 @permiso_requerido("usuarios")
-def usuarios_exportar_view(request):
-    # Reutiliza los mismos filtros que el listado.
+@never_cache
+def usuarios_fila_view(request, usuario_id):
+    try:
+        usuario = obtener_usuario_admin(str(usuario_id))
+    except Exception as exc:
+        logger.warning("Error al obtener fila de usuario: %s", exc)
+        return HttpResponse(status=503)
+
+    roles_sesion = request.session.get("roles") or []
+    if not usuario or not _filtrar_aexfy_owner([usuario], roles_sesion):
+        return HttpResponse(status=204)
+    if requiere_restriccion_zona(roles_sesion):
+        zona_sesion = obtener_zona_sesion(request.session)
+        if zona_sesion and usuario.get("zona") != zona_sesion:
+            return HttpResponse(status=204)
+
+    usuario_actual_id = str((request.session.get("usuario") or {}).get("id") or "")
+    return render(
+        request,
+        "usuarios/_fila.html",
+        {"usuario": usuario, "usuario_actual_id": usuario_actual_id},
+    )
+
+
+# Columnas del CSV de usuarios; las comparten la descarga directa y la exportacion en segundo plano.
+ENCABEZADOS_EXPORTACION = ["RUT", "Nombres", "Apellidos", "Email", "Telefono", "Estado", "Tipo", "Zona", "Roles"]
+
+
+# Filtros de exportacion: los mismos del listado mas la zona de la sesion si su rol la exige.
+def _filtros_exportacion(request) -> dict:
     roles_sesion = request.session.get("roles") or []
     form_filtros = UsuariosFiltroForm(request.GET or None, roles_sesion=roles_sesion)
     filtros = {
@@ -338,58 +345,61 @@ def usuarios_exportar_view(request):
         "tipo_usuario": "",
         "zona": "",
         "rol": "",
-        "limit": 5000,
-        "offset": 0,
     }
     if form_filtros.is_valid():
         filtros.update(form_filtros.cleaned_data)
 
     # Respeta la restriccion de zona si aplica.
-    roles_sesion = request.session.get("roles") or []
     if requiere_restriccion_zona(roles_sesion):
         zona_sesion = obtener_zona_sesion(request.session)
         if zona_sesion:
             filtros["zona"] = zona_sesion
+    filtros["excluir_owner"] = "AexfyOwner" not in roles_sesion
+    return filtros
 
-    usuarios = listar_usuarios_admin(filtros)
-    usuarios = _filtrar_aexfy_owner(usuarios, roles_sesion)
 
-    # Respuesta CSV con BOM para compatibilidad con Excel.
-    respuesta = HttpResponse(content_type="text/csv; charset=utf-8")
-    respuesta["Content-Disposition"] = "attachment; filename=usuarios.csv"
-    respuesta.write("?")
-
-    writer = csv.writer(respuesta, delimiter=';')
-    writer.writerow(
-        [
-            "RUT",
-            "Nombres",
-            "Apellidos",
-            "Email",
-            "Telefono",
-            "Estado",
-            "Tipo",
-            "Zona",
-            "Roles",
-        ]
+# Recorre todas las paginas por cursor; AexfyOwner ya se excluye en la RPC y se vuelve a ocultar
+# fila a fila como en el listado.
+def _filas_exportacion(filtros: dict, roles_sesion: list[str]):
+    return (
+        usuario
+        for usuario in recorrer_por_cursor(listar_usuarios_admin, filtros, "creado_en")
+        if _filtrar_aexfy_owner([usuario], roles_sesion)
     )
-    for usuario in usuarios:
-        roles = usuario.get("roles") or []
-        writer.writerow(
-            [
-                usuario.get("rut"),
-                usuario.get("nombres"),
-                usuario.get("apellidos"),
-                usuario.get("email"),
-                usuario.get("telefono"),
-                usuario.get("estado"),
-                usuario.get("tipo_usuario"),
-                usuario.get("zona"),
-                ", ".join(roles),
-            ]
-        )
 
-    return respuesta
+
+def _valores_exportacion(usuario: dict) -> list:
+    return [
+        usuario.get("rut"),
+        usuario.get("nombres"),
+        usuario.get("apellidos"),
+        usuario.get("email"),
+        usuario.get("telefono"),
+        usuario.get("estado"),
+        usuario.get("tipo_usuario"),
+        usuario.get("zona"),
+        ", ".join(usuario.get("roles") or []),
+    ]
+
+
+# Exporta usuarios a CSV respetando filtros y restricciones de zona.
+@sesion_requerida
+@permiso_requerido("usuarios")
+def usuarios_exportar_view(request):
+    roles_sesion = request.session.get("roles") or []
+    return respuesta_csv(
+        "usuarios.csv",
+        ENCABEZADOS_EXPORTACION,
+        _filas_exportacion(_filtros_exportacion(request), roles_sesion),
+        _valores_exportacion,
+    )
+
+
+# Encola la exportacion en segundo plano (CSV comprimido) para listados muy grandes.
+@sesion_requerida
+@permiso_requerido("usuarios")
+def usuarios_exportar_trabajo_view(request):
+    return encolar_exportacion(request, "usuarios", _filtros_exportacion(request))
 
 
 # Crea usuarios de staff y envia invitacion para crear contrasena.
@@ -862,3 +872,4 @@ def usuarios_eliminar_view(request, usuario_id):
     return redirect("usuarios_listado")
 
 
+registrar_exportacion("usuarios", ENCABEZADOS_EXPORTACION, _filas_exportacion, _valores_exportacion)